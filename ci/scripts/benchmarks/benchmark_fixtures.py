@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+"""
+Synthetic fixtures for the global-workflow benchmarks
+
+Every fixture is generated from a seeded random number generator, so that runs
+of the benchmarks on different branches or machines process identical data.
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import netCDF4
+import numpy as np
+
+NTILES = 6
+
+# Increment variables added by the atmospheric analysis
+FV3_INCVARS = ['ua', 'va', 't', 'delp', 'sphum', 'liq_wat', 'ice_wat', 'o3mr']
+
+# GOCART tracers appended to the initial conditions by aerosol_init
+AEROSOL_TRACERS = ['so4', 'bc1', 'bc2', 'oc1', 'oc2',
+                   'dust1', 'dust2', 'dust3', 'dust4', 'dust5',
+                   'seas1', 'seas2', 'seas3', 'seas4', 'seas5']
+
+
+def resolution_npx(case: str) -> int:
+    """
+    Return the number of grid cells along a tile edge of a resolution, e.g. 96 for C96
+    """
+    return int(case.lstrip('Cc'))
+
+
+def _create_tile(path: str, nlev: int, npx: int, variables: List[str], rng: np.random.Generator,
+                 scale: float = 1., dtype: str = 'f8') -> None:
+    """
+    Write a restart-like tile with (Time, zaxis_1, yaxis_1, xaxis_1) variables
+    """
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('xaxis_1', npx)
+        nc.createDimension('yaxis_1', npx)
+        nc.createDimension('zaxis_1', nlev)
+        nc.createDimension('Time', None)
+        for vname in variables:
+            var = nc.createVariable(vname, dtype, ('Time', 'zaxis_1', 'yaxis_1', 'xaxis_1'))
+            var[0, ...] = scale * rng.standard_normal((nlev, npx, npx))
+            var.checksum = 'ffffffffffffffff'
+
+
+def create_fv3_increments(workdir: str, case: str, nlev: int = 127, incvars: List[str] = None) -> Dict[str, str]:
+    """
+    Write the six cubed-sphere tiles of a background and of an increment
+
+    Parameters
+    ----------
+    workdir : str
+        directory of the fixture
+    case : str
+        resolution, e.g. C96
+    nlev : int
+        number of model levels
+    incvars : List[str]
+        increment variables, FV3_INCVARS by default
+
+    Returns
+    -------
+    fixture : Dict[str, str]
+        inc_file_tmpl and bkg_file_tmpl, templates of the tiles as expected by Analysis.add_fv3_increments
+    """
+    incvars = incvars or FV3_INCVARS
+    npx = resolution_npx(case)
+    rng = np.random.default_rng(seed=npx)
+    os.makedirs(workdir, exist_ok=True)
+
+    fixture = {'inc_file_tmpl': os.path.join(workdir, 'atminc.tile{tilenum}.nc'),
+               'bkg_file_tmpl': os.path.join(workdir, 'fv_core.res.tile{tilenum}.nc')}
+    for itile in range(1, NTILES + 1):
+        _create_tile(fixture['inc_file_tmpl'].format(tilenum=itile), nlev, npx, incvars, rng, scale=1.e-3)
+        _create_tile(fixture['bkg_file_tmpl'].format(tilenum=itile), nlev, npx, incvars, rng)
+    return fixture
+
+
+def create_aerosol_tile(workdir: str, case: str, nlev: int = 127, tracers: List[str] = None) -> Dict[str, str]:
+    """
+    Write the files of one tile that merge_fv3_aerosol_tile.merge_tile reads:
+    the initial conditions, the control file, the dycore coefficients,
+    the restart pressure thicknesses and the aerosol tracers
+
+    Parameters
+    ----------
+    workdir : str
+        directory of the fixture
+    case : str
+        resolution, e.g. C96
+    nlev : int
+        number of model levels
+    tracers : List[str]
+        tracers to append, AEROSOL_TRACERS by default
+
+    Returns
+    -------
+    fixture : Dict[str, str]
+        paths of base_file, ctrl_file, core_file, rest_file and append_file
+    """
+    tracers = tracers or AEROSOL_TRACERS
+    npx = resolution_npx(case)
+    rng = np.random.default_rng(seed=npx)
+    os.makedirs(workdir, exist_ok=True)
+
+    fixture = {name: os.path.join(workdir, filename) for name, filename in
+               (('base_file', 'gfs_data.tile1.nc'), ('ctrl_file', 'gfs_ctrl.nc'), ('core_file', 'fv_core.res.nc'),
+                ('rest_file', 'fv_core.res.tile1.nc'), ('append_file', 'fv_tracer.res.tile1.nc'))}
+
+    # hybrid coefficients from the model top (1 hPa) to the surface
+    ak = np.linspace(100., 0., nlev + 1)
+    bk = np.linspace(0., 1., nlev + 1)
+    psfc = 1.e5 + 1.e3 * rng.standard_normal((npx, npx))
+
+    with netCDF4.Dataset(fixture['base_file'], 'w') as nc:
+        nc.createDimension('lon', npx)
+        nc.createDimension('lat', npx)
+        nc.createDimension('levp', nlev + 1)
+        nc.createDimension('ntracer', 7)
+        nc.createVariable('ps', 'f4', ('lat', 'lon'))[:] = psfc
+        nc.createVariable('sphum', 'f4', ('levp', 'lat', 'lon'))[:] = 1.e-3 * rng.random((nlev + 1, npx, npx))
+
+    with netCDF4.Dataset(fixture['ctrl_file'], 'w') as nc:
+        nc.createDimension('nvcoord', 2)
+        nc.createDimension('levsp', nlev + 2)
+        nc.createVariable('vcoord', 'f4', ('nvcoord', 'levsp'))[:] = np.stack([np.append(0., ak), np.append(0., bk)])
+
+    with netCDF4.Dataset(fixture['core_file'], 'w') as nc:
+        nc.createDimension('xaxis_1', nlev + 1)
+        nc.createDimension('Time', None)
+        nc.createVariable('ak', 'f8', ('Time', 'xaxis_1'))[0, :] = ak
+        nc.createVariable('bk', 'f8', ('Time', 'xaxis_1'))[0, :] = bk
+
+    dp = (ak[1:] - ak[:-1])[:, None, None] + psfc * (bk[1:] - bk[:-1])[:, None, None]
+    _create_tile(fixture['rest_file'], nlev, npx, [], rng)
+    with netCDF4.Dataset(fixture['rest_file'], 'a') as nc:
+        nc.createVariable('delp', 'f8', ('Time', 'zaxis_1', 'yaxis_1', 'xaxis_1'))[0, ...] = dp * (1. + 1.e-3 * rng.standard_normal(dp.shape))
+
+    _create_tile(fixture['append_file'], nlev, npx, tracers, rng, scale=1.e-9, dtype='f4')
+    return fixture
+
+
+def create_archive_tree(workdir: str, nfiles: int, file_size: int) -> Dict[str, List[str]]:
+    """
+    Write a ROTDIR-like tree of forecast output files and the required and optional globs
+    of an archive set covering them, as in the parm/archive YAMLs
+
+    Parameters
+    ----------
+    workdir : str
+        directory of the fixture, the ROTDIR
+    nfiles : int
+        number of files
+    file_size : int
+        size of each file in bytes
+
+    Returns
+    -------
+    atardir_set : Dict[str, List[str]]
+        required and optional globs
+    """
+    rng = np.random.default_rng(seed=nfiles)
+    comdir = os.path.join(workdir, 'gfs.20210323', '12', 'model', 'atmos', 'history')
+    os.makedirs(comdir, exist_ok=True)
+
+    required = []
+    for ifile in range(nfiles):
+        path = os.path.join(comdir, f"gfs.t12z.atmf{ifile:04d}.nc")
+        with open(path, 'wb') as fh:
+            fh.write(rng.bytes(file_size))
+        # half of the files are listed one by one, the rest by a glob
+        if ifile % 2 == 0:
+            required.append(path)
+    required.append(os.path.join(comdir, 'gfs.t12z.atmf???[13579].nc'))
+    optional = [os.path.join(comdir, 'gfs.t12z.sfcf*.nc'), os.path.join(comdir, 'gfs.t12z.atm.logf*.txt')]
+    return {'required': required, 'optional': optional}
+
+
+def workflow_task_dicts(ntasks: int, nfhrs: int) -> List[Dict]:
+    """
+    Return the task dictionaries of a synthetic workflow for rocoto.create_task:
+    a chain of ntasks tasks, and a metatask of nfhrs product tasks depending on the last one
+    """
+    resources = {'account': 'fv3-cpu', 'queue': 'batch', 'partition': 'hera',
+                 'walltime': '00:20:00', 'nodes': 2, 'ppn': 40, 'threads': 1, 'native': '--export=NONE'}
+    envars = ['<envar><name>RUN_ENVIR</name><value>emc</value></envar>',
+              '<envar><name>HOMEgfs</name><value>&HOMEgfs;</value></envar>',
+              '<envar><name>CDATE</name><value><cyclestr>@Y@m@d@H</cyclestr></value></envar>']
+
+    task_dicts = []
+    for itask in range(ntasks):
+        dependency = [] if itask == 0 else [f'<taskdep task="gfs_task{itask - 1:03d}"/>']
+        task_dicts.append({'task_name': f'gfs_task{itask:03d}', 'resources': dict(resources),
+                           'dependency': dependency, 'envars': list(envars), 'cycledef': 'gfs',
+                           'command': f'&JOBS_DIR;/task{itask:03d}.sh', 'job_name': f'&PSLOT;_gfs_task{itask:03d}_@H',
+                           'log': f'&ROTDIR;/logs/@Y@m@d@H/gfs_task{itask:03d}.log', 'maxtries': '&MAXTRIES;'})
+
+    fhrs = ' '.join(f'f{fhr:03d}' for fhr in range(0, 3 * nfhrs, 3))
+    task_dicts.append({'task_name': 'gfs_atmos_prod', 'var_dict': {'fhr_label': fhrs},
+                       'task_dict': {'task_name': 'gfs_atmos_prod_#fhr_label#', 'resources': dict(resources),
+                                     'dependency': [f'<taskdep task="gfs_task{ntasks - 1:03d}"/>'],
+                                     'envars': list(envars) + ['<envar><name>FHR3</name><value>#fhr_label#</value></envar>'],
+                                     'cycledef': 'gfs', 'command': '&JOBS_DIR;/atmos_products.sh',
+                                     'job_name': '&PSLOT;_gfs_atmos_prod_#fhr_label#_@H',
+                                     'log': '&ROTDIR;/logs/@Y@m@d@H/gfs_atmos_prod_#fhr_label#.log', 'maxtries': '&MAXTRIES;'}})
+    return task_dicts
+
+
+def create_workflow(workdir: str, task_xml: List[str], ncycles: int, ntasks: int, nfhrs: int) -> Dict[str, str]:
+    """
+    Write a Rocoto workflow document and a Rocoto database in which all the tasks
+    of the cycles have run, the last cycle being in progress
+
+    Parameters
+    ----------
+    workdir : str
+        directory of the fixture
+    task_xml : List[str]
+        XML of the tasks, from rocoto.create_task
+    ncycles : int
+        number of 6-hourly cycles
+    ntasks : int
+        number of tasks of the chain
+    nfhrs : int
+        number of tasks of the product metatask
+
+    Returns
+    -------
+    fixture : Dict[str, str]
+        paths of workflow_file and database_file
+    """
+    os.makedirs(workdir, exist_ok=True)
+    sdate = datetime(2021, 3, 23, 12)
+    edate = sdate + timedelta(hours=6 * (ncycles - 1))
+    fixture = {'workflow_file': os.path.join(workdir, 'bench.xml'),
+               'database_file': os.path.join(workdir, 'bench.db')}
+
+    entities = {'PSLOT': 'bench', 'HOMEgfs': workdir, 'EXPDIR': workdir, 'ROTDIR': workdir,
+                'JOBS_DIR': os.path.join(workdir, 'jobs'), 'MAXTRIES': 2}
+    with open(fixture['workflow_file'], 'w') as fh:
+        fh.write('<?xml version="1.0"?>\n<!DOCTYPE workflow\n[\n')
+        fh.writelines(f'\t<!ENTITY {key} "{value}">\n' for key, value in entities.items())
+        fh.write(']>\n\n<workflow realtime="F" scheduler="slurm" cyclethrottle="3" taskthrottle="25">\n\n')
+        fh.write(f'\t<log verbosity="10"><cyclestr>{workdir}/logs/@Y@m@d@H.log</cyclestr></log>\n\n')
+        fh.write(f'\t<cycledef group="gfs">{sdate:%Y%m%d%H%M} {edate:%Y%m%d%H%M} 06:00:00</cycledef>\n\n')
+        fh.writelines(task_xml)
+        fh.write('</workflow>\n')
+
+    tasknames = [f'gfs_task{itask:03d}' for itask in range(ntasks)]
+    tasknames += [f'gfs_atmos_prod_f{fhr:03d}' for fhr in range(0, 3 * nfhrs, 3)]
+
+    rng = np.random.default_rng(seed=ncycles)
+    if os.path.exists(fixture['database_file']):
+        os.remove(fixture['database_file'])
+    with sqlite3.connect(fixture['database_file']) as db:
+        db.execute('CREATE TABLE cycledef (id INTEGER PRIMARY KEY, groupname VARCHAR(64), cycledef VARCHAR(256), position DATETIME)')
+        db.execute('CREATE TABLE cycles (id INTEGER PRIMARY KEY, cycle DATETIME, activated DATETIME, expired DATETIME, '
+                   'done DATETIME, draining DATETIME)')
+        db.execute('CREATE TABLE jobs (id INTEGER PRIMARY KEY, jobid VARCHAR(64), taskname VARCHAR(64), cycle DATETIME, '
+                   'cores INTEGER, state VARCHAR(64), native_state VARCHAR[64], exit_status INTEGER, tries INTEGER, '
+                   'nunknowns INTEGER, duration REAL)')
+        db.execute('INSERT INTO cycledef VALUES (1, ?, ?, ?)',
+                   ('gfs', f'{sdate:%Y%m%d%H%M} {edate:%Y%m%d%H%M} 06:00:00', int(edate.timestamp())))
+
+        jobid = 1000000
+        for icycle in range(ncycles):
+            cycle = int((sdate + timedelta(hours=6 * icycle)).timestamp())
+            last = icycle == ncycles - 1
+            db.execute('INSERT INTO cycles VALUES (?, ?, ?, 0, ?, 0)', (icycle + 1, cycle, cycle, 0 if last else cycle + 21600))
+            # in the last cycle, only the first half of the tasks have run
+            for taskname in tasknames[:len(tasknames) // 2] if last else tasknames:
+                jobid += 1
+                failed = rng.random() < 0.02
+                db.execute('INSERT INTO jobs (jobid, taskname, cycle, cores, state, native_state, exit_status, tries, '
+                           'nunknowns, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?)',
+                           (str(jobid), taskname, cycle, 80, 'DEAD' if failed else 'SUCCEEDED',
+                            'FAILED' if failed else 'COMPLETED', 1 if failed else 0, 2 if failed else 1,
+                            float(rng.integers(30, 1800))))
+    return fixture
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks of the pygfs and workflow hot paths on synthetic fixtures
+
+Times Analysis.add_fv3_increments and merge_fv3_aerosol_tile.merge_tile on
+cubed-sphere tiles, Archive._create_fileset and Archive._create_tarball on a
+ROTDIR-like tree, rocoto.create_task, rocoto_viewer.get_tasklist and
+rocoto_viewer.get_rocoto_stat on a workflow document and Rocoto database,
+and the sourcing of the configs of an experiment by AppConfig.
+The fixtures are generated in a scratch directory; the timings are written as
+JSON, optionally compared with those of a previous run.
+
+    run_benchmarks.py --resolutions C48 C96 C192 --output results.json
+    run_benchmarks.py --output branch.json --baseline results.json
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+_here = os.path.dirname(os.path.abspath(__file__))
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+for path in ('workflow', 'ush', os.path.join('ush', 'python')):
+    sys.path.append(os.path.join(HOMEgfs, path))
+
+import benchmark_fixtures as fixtures
+
+BENCHMARKS = ['add_fv3_increments', 'merge_tile', 'archive', 'rocoto', 'app_config']
+
+
+def result_id(name: str, params: Dict[str, Any]) -> str:
+    """
+    Return the identifier of a result, by which runs are compared, e.g. add_fv3_increments[case=C96,nlev=127]
+    """
+    return f"{name}[{','.join(f'{key}={value}' for key, value in sorted(params.items()))}]"
+
+
+def skipped(name: str, params: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    """
+    Return the result of a benchmark that could not run
+    """
+    print(f"SKIPPED {result_id(name, params)}: {reason}")
+    return {'id': result_id(name, params), 'name': name, 'params': params, 'status': 'skipped', 'reason': reason}
+
+
+def measure(name: str, params: Dict[str, Any], func: Callable[[], Any], repeat: int,
+            setup: Optional[Callable[[], Any]] = None) -> Dict[str, Any]:
+    """
+    Time repeated calls of a function
+
+    Parameters
+    ----------
+    name : str
+        name of the benchmark
+    params : Dict[str, Any]
+        size parameters of the benchmark
+    func : Callable
+        function to time
+    repeat : int
+        number of calls
+    setup : Callable
+        function called, untimed, before each call, e.g. to restore a fixture
+
+    Returns
+    -------
+    result : Dict[str, Any]
+        the wall times of the calls and their minimum, median and mean, in seconds
+    """
+    times = []
+    try:
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    except (Exception, SystemExit) as ee:
+        print(f"FAILED {result_id(name, params)}: {ee!r}")
+        return {'id': result_id(name, params), 'name': name, 'params': params, 'status': 'failed', 'reason': repr(ee)}
+
+    result = {'id': result_id(name, params), 'name': name, 'params': params, 'status': 'ok', 'repeat': repeat,
+              'times_s': [round(tt, 6) for tt in times], 'min_s': round(min(times), 6),
+              'median_s': round(statistics.median(times), 6), 'mean_s': round(statistics.mean(times), 6)}
+    print(f"{result['id']:<72} median {result['median_s']:10.4f} s  min {result['min_s']:10.4f} s")
+    return result
+
+
+def _size(paths: List[str]) -> int:
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def bench_add_fv3_increments(args, workdir: str) -> List[Dict[str, Any]]:
+    """
+    Analysis.add_fv3_increments: add the increments of all the variables to the six tiles of a background
+    """
+    results = []
+    try:
+        from wxflow import AttrDict
+        from pygfs.task.analysis import Analysis
+    except ImportError as ee:
+        return [skipped('add_fv3_increments', {'case': case, 'nlev': args.nlev}, repr(ee)) for case in args.resolutions]
+
+    # add_fv3_increments only uses the number of tiles of the task configuration
+    analysis = SimpleNamespace(task_config=AttrDict(ntiles=fixtures.NTILES))
+    for case in args.resolutions:
+        params = {'case': case, 'nlev': args.nlev}
+        fixture = fixtures.create_fv3_increments(os.path.join(workdir, f'fv3_increments_{case}'), case, args.nlev)
+        result = measure('add_fv3_increments', params,
+                         lambda: Analysis.add_fv3_increments(analysis, fixture['inc_file_tmpl'], fixture['bkg_file_tmpl'],
+                                                             fixtures.FV3_INCVARS),
+                         args.repeat)
+        result['nbytes'] = _size([fixture['inc_file_tmpl'].format(tilenum=itile) for itile in range(1, fixtures.NTILES + 1)])
+        results.append(result)
+        shutil.rmtree(os.path.join(workdir, f'fv3_increments_{case}'))
+    return results
+
+
+def bench_merge_tile(args, workdir: str) -> List[Dict[str, Any]]:
+    """
+    merge_fv3_aerosol_tile.merge_tile: append the aerosol tracers to the initial conditions of a tile
+    """
+    missing = [cmd for cmd in ('ncks', 'ncatted') if shutil.which(cmd) is None]
+    try:
+        import merge_fv3_aerosol_tile
+    except ImportError as ee:
+        missing.append(repr(ee))
+    if missing:
+        return [skipped('merge_tile', {'case': case, 'nlev': args.nlev, 'ntracers': len(fixtures.AEROSOL_TRACERS)},
+                        f"missing {', '.join(missing)}")
+                for case in args.resolutions]
+
+    results = []
+    for case in args.resolutions:
+        params = {'case': case, 'nlev': args.nlev, 'ntracers': len(fixtures.AEROSOL_TRACERS)}
+        fixture = fixtures.create_aerosol_tile(os.path.join(workdir, f'aerosol_{case}'), case, args.nlev)
+        out_file = os.path.join(workdir, f'aerosol_{case}', 'gfs_data.merged.tile1.nc')
+
+        def merge():
+            # merge_tile prints a summary of the mass of each tracer
+            with contextlib.redirect_stdout(io.StringIO()):
+                merge_fv3_aerosol_tile.merge_tile(out_file, fixture['ctrl_file'], fixture['core_file'], fixture['rest_file'],
+                                                  fixture['append_file'], fixtures.AEROSOL_TRACERS)
+
+        # the tile is modified in place, start each call from the initial conditions
+        results.append(measure('merge_tile', params, merge, args.repeat,
+                               setup=lambda: shutil.copyfile(fixture['base_file'], out_file)))
+        shutil.rmtree(os.path.join(workdir, f'aerosol_{case}'))
+    return results
+
+
+def bench_archive(args, workdir: str) -> List[Dict[str, Any]]:
+    """
+    Archive._create_fileset and Archive._create_tarball: expand the globs of an archive set, tar the files
+    """
+    try:
+        from wxflow import AttrDict, rm_p
+        from pygfs.task.archive import Archive
+    except ImportError as ee:
+        return [skipped('archive', {'nfiles': nfiles, 'file_size': file_size}, repr(ee))
+                for nfiles, file_size in args.archive_sizes]
+
+    results = []
+    for nfiles, file_size in args.archive_sizes:
+        params = {'nfiles': nfiles, 'file_size': file_size}
+        rotdir = os.path.join(workdir, f'archive_{nfiles}')
+        atardir_set = AttrDict(fixtures.create_archive_tree(rotdir, nfiles, file_size))
+        target = os.path.join(workdir, f'archive_{nfiles}.tar')
+
+        fileset = []
+        results.append(measure('create_fileset', params,
+                               lambda: fileset.__setitem__(slice(None), Archive._create_fileset(atardir_set)), args.repeat))
+        results.append(measure('create_tarball', params, lambda: Archive._create_tarball(target, fileset), args.repeat,
+                               setup=lambda: rm_p(target)))
+        rm_p(target)
+        shutil.rmtree(rotdir)
+    return results
+
+
+def bench_rocoto(args, workdir: str) -> List[Dict[str, Any]]:
+    """
+    rocoto.create_task: write the XML of the tasks of a workflow;
+    rocoto_viewer.get_tasklist and get_rocoto_stat: read the workflow and the status of its jobs
+    """
+    try:
+        from rocoto.rocoto import create_task
+    except ImportError as ee:
+        return [skipped('rocoto', {'ncycles': ncycles}, repr(ee)) for ncycles in args.workflow_cycles]
+
+    results = []
+    params = {'ntasks': args.ntasks, 'nfhrs': args.nfhrs}
+    task_dicts = []
+    task_xml = []
+
+    def create_tasks():
+        task_xml[:] = [create_task(task_dict) for task_dict in task_dicts]
+
+    # create_task consumes the nested task dictionaries, start each call from new ones
+    results.append(measure('create_task', params, create_tasks, args.repeat,
+                           setup=lambda: task_dicts.__setitem__(slice(None), fixtures.workflow_task_dicts(args.ntasks, args.nfhrs))))
+
+    try:
+        import rocoto_viewer
+    except ImportError as ee:
+        return results + [skipped('rocoto_viewer', {'ncycles': ncycles, **params}, repr(ee)) for ncycles in args.workflow_cycles]
+
+    # run the viewer functions as the viewer does without its curses interface
+    rocoto_viewer.PACKAGE = 'gfs'
+    rocoto_viewer.use_multiprocessing = False
+    for ncycles in args.workflow_cycles:
+        fixture = fixtures.create_workflow(os.path.join(workdir, f'rocoto_{ncycles}'), task_xml,
+                                           ncycles, args.ntasks, args.nfhrs)
+        tasklist = []
+        results.append(measure('get_tasklist', {'ncycles': ncycles, **params},
+                               lambda: tasklist.__setitem__(slice(None), rocoto_viewer.get_tasklist(fixture['workflow_file'])),
+                               args.repeat))
+        if not tasklist:
+            continue
+        stat_params = (fixture['workflow_file'], fixture['database_file'], *tasklist)
+        results.append(measure('get_rocoto_stat', {'ncycles': ncycles, **params},
+                               lambda: rocoto_viewer.get_rocoto_stat(stat_params, None), args.repeat))
+        shutil.rmtree(os.path.join(workdir, f'rocoto_{ncycles}'))
+    return results
+
+
+def bench_app_config(args, workdir: str) -> List[Dict[str, Any]]:
+    """
+    AppConfig: source config.base and the configs of every task of a forecast-only experiment,
+    created with setup_expt.py
+    """
+    results = []
+    for app in args.apps:
+        params = {'app': app, 'case': args.resolutions[0]}
+        try:
+            from wxflow import Configuration
+            from applications.application_factory import app_config_factory
+        except ImportError as ee:
+            results.append(skipped('app_config', params, repr(ee)))
+            continue
+
+        rundir = os.path.join(workdir, f'expt_{app}')
+        pslot = f"{args.resolutions[0]}_{app}"
+        with open(os.path.join(workdir, f'setup_expt_{app}.log'), 'w') as log:
+            setup_expt = subprocess.run([sys.executable, os.path.join(HOMEgfs, 'workflow', 'setup_expt.py'),
+                                         'gfs', 'forecast-only', '--pslot', pslot, '--app', app,
+                                         '--resdetatmos', str(fixtures.resolution_npx(args.resolutions[0])),
+                                         '--comroot', rundir, '--expdir', rundir,
+                                         '--idate', '2021032312', '--edate', '2021032312', '--overwrite'],
+                                        stdout=log, stderr=subprocess.STDOUT)
+        if setup_expt.returncode != 0:
+            results.append(skipped('app_config', params, f"setup_expt.py failed, see {log.name}"))
+            continue
+
+        def create_app_config():
+            # AppConfig announces the XML it configures
+            with contextlib.redirect_stdout(io.StringIO()):
+                conf = Configuration(os.path.join(rundir, pslot))
+                base = conf.parse_config('config.base')
+                app_config_factory.create(f"{base['NET']}_{base['MODE']}", conf)
+
+        results.append(measure('app_config', params, create_app_config, args.repeat))
+    return results
+
+
+def metadata() -> Dict[str, Any]:
+    """
+    Return a description of the machine and of the code benchmarked
+    """
+    try:
+        commit = subprocess.run(['git', '-C', HOMEgfs, 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    versions = {}
+    for module in ('numpy', 'netCDF4', 'wxflow'):
+        try:
+            versions[module] = getattr(__import__(module), '__version__', None)
+        except ImportError:
+            versions[module] = None
+
+    return {'date': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'host': platform.node(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'versions': versions,
+            'commit': commit}
+
+
+def compare(results: List[Dict[str, Any]], baseline_file: str, threshold: float) -> None:
+    """
+    Add the median time of the baseline and the ratio of the median times to each result,
+    and flag the results slower than the baseline by more than the threshold
+    """
+    with open(baseline_file) as fh:
+        baseline = {result['id']: result for result in json.load(fh)['results'] if result['status'] == 'ok'}
+
+    print(f"\n{'benchmark':<72} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in results:
+        if result['status'] != 'ok' or result['id'] not in baseline:
+            continue
+        result['baseline_median_s'] = baseline[result['id']]['median_s']
+        result['ratio'] = round(result['median_s'] / result['baseline_median_s'], 4) if result['baseline_median_s'] else None
+        result['regression'] = result['ratio'] is not None and result['ratio'] > 1. + threshold
+        print(f"{result['id']:<72} {result['baseline_median_s']:10.4f} {result['median_s']:10.4f} "
+              f"{result['ratio'] or 0.:7.3f}{'  SLOWER' if result['regression'] else ''}")
+
+
+def input_args(*argv):
+    """
+    Method to collect user arguments for `run_benchmarks.py`
+    """
+
+    def archive_size(value):
+        nfiles, _, file_size = value.partition('x')
+        return int(nfiles), int(file_size)
+
+    parser = ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--benchmarks', help='benchmarks to run', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--resolutions', help='resolutions of the cubed-sphere tiles, C48 to C768', nargs='+',
+                        default=['C48', 'C96'])
+    parser.add_argument('--nlev', help='number of model levels of the tiles', type=int, default=127)
+    parser.add_argument('--archive_sizes', help='number of files and size of each file (bytes) of the archive sets, NFILESxSIZE',
+                        nargs='+', type=archive_size, default=[(100, 1048576), (2000, 16384)])
+    parser.add_argument('--workflow_cycles', help='number of cycles of the Rocoto databases', nargs='+', type=int,
+                        default=[4, 16])
+    parser.add_argument('--ntasks', help='number of tasks of the workflow, besides the product metatask', type=int, default=40)
+    parser.add_argument('--nfhrs', help='number of forecast hours of the product metatask', type=int, default=81)
+    parser.add_argument('--apps', help='applications of the experiments sourced by AppConfig', nargs='+', default=['ATM'])
+    parser.add_argument('--repeat', help='number of timed calls of each benchmark', type=int, default=3)
+    parser.add_argument('--workdir', help='scratch directory of the fixtures (default: a temporary directory)', type=str)
+    parser.add_argument('--output', help='JSON results file', type=str, default='benchmark_results.json')
+    parser.add_argument('--baseline', help='JSON results file of a previous run to compare with', type=str)
+    parser.add_argument('--threshold', help='relative slowdown flagged as a regression', type=float, default=0.1)
+
+    return parser.parse_args(argv[0][0] if len(argv[0]) else None)
+
+
+def main(*argv):
+
+    user_inputs = input_args(argv)
+
+    workdir = user_inputs.workdir or tempfile.mkdtemp(prefix='gw_benchmarks.')
+    os.makedirs(workdir, exist_ok=True)
+
+    results = []
+    try:
+        for name in user_inputs.benchmarks:
+            results += globals()[f'bench_{name}'](user_inputs, workdir)
+    finally:
+        if not user_inputs.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if user_inputs.baseline:
+        compare(results, user_inputs.baseline, user_inputs.threshold)
+
+    with open(user_inputs.output, 'w') as fh:
+        json.dump({'metadata': metadata(), 'results': results}, fh, indent=2)
+    print(f"\nResults written to {user_inputs.output}")
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,100 @@
+import sys
+import os
+import stat
+import tarfile
+import types
+from datetime import datetime
+import pytest
+from wxflow import AttrDict
+
+_here = os.path.dirname(__file__)
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+sys.path.append(os.path.join(HOMEgfs, 'ush', 'python'))
+
+# pygfs needs netCDF4, and imports the JEDI configuration builder that the archive task does not use
+pytest.importorskip('netCDF4')
+try:
+    import jcb
+except ImportError:
+    sys.modules['jcb'] = types.SimpleNamespace(render=None)
+from pygfs.task.archive import Archive
+from pygfs.utils import hpss_utils
+
+HPSSDIR = "/NCEPDEV/emc-global/1year/gfs_test/2021032312"
+
+
+def _archive(tmp_path):
+    """Return an Archive task creating its tarballs with LocalHsi/LocalHtar, as configure does with ARCH_HPSS_STANDIN"""
+    rotdir = os.path.join(tmp_path, 'ROTDIR')
+    os.makedirs(rotdir)
+    archive = Archive({'PDY': datetime(2021, 3, 23), 'cyc': 12, 'assim_freq': 6, 'ROTDIR': rotdir, 'ARCH_NTHREADS_TAR': 2})
+    archive.tar_cmd = "htar"
+    archive.hsi = hpss_utils.LocalHsi(os.path.join(tmp_path, 'HPSS'))
+    archive.htar = hpss_utils.LocalHtar(os.path.join(tmp_path, 'HPSS'))
+    archive.cvf = archive.htar.cvf
+    archive.rm_cmd = archive.hsi.rm
+    archive.chgrp_cmd = archive.hsi.chgrp
+    archive.chmod_cmd = archive.hsi.chmod
+    return archive
+
+
+def _fileset(tmp_path, name, nfiles):
+    fileset = []
+    for ii in range(nfiles):
+        filename = os.path.join(tmp_path, 'ROTDIR', f"{name}.{ii}.txt")
+        with open(filename, 'w') as fh:
+            fh.write(name * (ii + 1))
+        fileset.append(filename)
+    return fileset
+
+
+def test_execute_backup_datasets(tmp_path, monkeypatch):
+
+    # the rstprod group does not exist here, record the group changes instead
+    groups = {}
+    monkeypatch.setattr(hpss_utils, 'chgrp', lambda group, path: groups.__setitem__(path, group))
+
+    archive = _archive(tmp_path)
+    atardir_sets = [AttrDict(target=f"{HPSSDIR}/gfsa.tar", fileset=_fileset(tmp_path, 'gfsa', 3), has_rstprod=False),
+                    AttrDict(target=f"{HPSSDIR}/gfs_restricted.tar", fileset=_fileset(tmp_path, 'restricted', 2),
+                             has_rstprod=True),
+                    AttrDict(target=f"{HPSSDIR}/gfs_empty.tar", fileset=[], has_rstprod=False)]
+
+    archive.execute_backup_datasets(atardir_sets)
+
+    for name, nfiles in (('gfsa', 3), ('gfs_restricted', 2)):
+        tarball = archive.hsi.path(f"{HPSSDIR}/{name}.tar")
+        with tarfile.open(tarball) as tar:
+            assert len(tar.getnames()) == nfiles
+        assert os.path.isfile(f"{tarball}.idx")
+    assert not os.path.exists(archive.hsi.path(f"{HPSSDIR}/gfs_empty.tar"))
+
+    # only the restricted tarball is protected
+    restricted = archive.hsi.path(f"{HPSSDIR}/gfs_restricted.tar")
+    assert groups == {restricted: 'rstprod'}
+    assert stat.S_IMODE(os.stat(restricted).st_mode) == 0o640
+    assert stat.S_IMODE(os.stat(archive.hsi.path(f"{HPSSDIR}/gfsa.tar")).st_mode) != 0o640
+
+
+def test_execute_backup_datasets_failing_set(tmp_path, monkeypatch):
+
+    groups = {}
+    monkeypatch.setattr(hpss_utils, 'chgrp', lambda group, path: groups.__setitem__(path, group))
+
+    archive = _archive(tmp_path)
+    missing = os.path.join(tmp_path, 'ROTDIR', 'missing.txt')
+    atardir_sets = [AttrDict(target=f"{HPSSDIR}/gfsa.tar", fileset=_fileset(tmp_path, 'gfsa', 2), has_rstprod=False),
+                    AttrDict(target=f"{HPSSDIR}/gfs_restricted.tar", fileset=_fileset(tmp_path, 'restricted', 2),
+                             has_rstprod=True),
+                    AttrDict(target=f"{HPSSDIR}/gdas_restricted.tar",
+                             fileset=_fileset(tmp_path, 'gdas', 1) + [missing], has_rstprod=True)]
+
+    with pytest.raises(RuntimeError, match='gdas_restricted.tar'):
+        archive.execute_backup_datasets(atardir_sets)
+
+    # the restricted tarball that failed is deleted, the others are created and protected
+    assert not os.path.exists(archive.hsi.path(f"{HPSSDIR}/gdas_restricted.tar"))
+    assert os.path.isfile(archive.hsi.path(f"{HPSSDIR}/gfsa.tar"))
+    restricted = archive.hsi.path(f"{HPSSDIR}/gfs_restricted.tar")
+    assert groups == {restricted: 'rstprod'}
+    assert stat.S_IMODE(os.stat(restricted).st_mode) == 0o640
@@ -0,0 +1,48 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+_here = os.path.dirname(__file__)
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+sys.path.append(os.path.join(HOMEgfs, 'ush', 'python', 'pygfs', 'utils'))
+
+from cache_utils import config_key
+
+
+def _static_b_key(fix_dir, cycle, jobid, ocnres='500'):
+    """Return the static B-matrix cache key of a cycle, as MarineBMat._static_b_cache_key computes it"""
+    window_begin, window_end = cycle - timedelta(hours=3), cycle + timedelta(hours=3)
+    datajob = f"/stmp/RUNDIRS/test/gdasmarineanalysis.{cycle:%Y%m%d%H}"
+    data = f"{datajob}/{jobid}"
+    aprefix = f"gdas.t{cycle:%H}z."
+    configs = {'gridgen': {'geometry': {'rossby file': f"{data}/rossrad.nc", 'mom6_input_nml': './inputnml'},
+                           'output': f"{data}/soca_gridspec.nc"},
+               'soca_setcorscales': {'date': f"{window_end:%Y-%m-%dT%H:%M:%SZ}", 'output': {'datadir': './'}},
+               'soca_parameters_diffusion_hz': {'background': {'date': f"{window_begin:%Y-%m-%dT%H:%M:%SZ}",
+                                                               'ocn_filename': f"{aprefix}ocean.bkg.f009.nc"},
+                                                'output': f"{data}/staticb/hz_ocean.nc"}}
+
+    cycle_strings = [aprefix]
+    for date in (window_begin, cycle, window_end):
+        cycle_strings += [date.strftime(fmt) for fmt in ('%Y-%m-%dT%H:%M:%SZ', '%Y%m%d.%H%M%S', '%Y%m%d%H')]
+    return config_key(configs, {'@CYCLE@': cycle_strings, '@RUNDIR@': [data, datajob, jobid]},
+                      fix_dir=fix_dir, extra=[ocnres])
+
+
+def test_config_key_stable_across_cycles(tmp_path):
+
+    fix_dir = os.path.join(tmp_path, 'soca_fix')
+    os.makedirs(fix_dir)
+    with open(os.path.join(fix_dir, 'MOM_input'), 'w') as fh:
+        fh.write('MOM6 parameters')
+
+    # two cycles run by jobs with different process IDs
+    key1 = _static_b_key(fix_dir, datetime(2021, 3, 23, 18), 'marinebmat.12345')
+    key2 = _static_b_key(fix_dir, datetime(2021, 3, 24, 0), 'marinebmat.67890')
+    assert key1 == key2
+
+    # another resolution or other fix files do not share the key
+    assert _static_b_key(fix_dir, datetime(2021, 3, 23, 18), 'marinebmat.12345', ocnres='100') != key1
+    with open(os.path.join(fix_dir, 'MOM_input'), 'w') as fh:
+        fh.write('other MOM6 parameters')
+    assert _static_b_key(fix_dir, datetime(2021, 3, 23, 18), 'marinebmat.12345') != key1
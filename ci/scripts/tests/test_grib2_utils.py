@@ -0,0 +1,57 @@
+import sys
+import os
+import numpy as np
+
+_here = os.path.dirname(__file__)
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+sys.path.append(os.path.join(HOMEgfs, 'ush', 'python', 'pygfs', 'utils'))
+
+from grib2_utils import UNDEFINED, record_key, match_records, ensemble_mean_spread
+
+
+def test_record_key():
+
+    line = "12:345678:d=2021032312:HGT:1000 mb:6 hour fcst:ENS=+1"
+    assert record_key(line) == "d=2021032312:HGT:1000 mb:6 hour fcst"
+    assert record_key("1:0:d=2021032312:TMP:2 m above ground:6 hour fcst:ENS=low-res ctl") == \
+        "d=2021032312:TMP:2 m above ground:6 hour fcst"
+
+
+def test_match_records():
+
+    control = ["1:0:d=2021032312:HGT:1000 mb:6 hour fcst:ENS=low-res ctl",
+               "2:100:d=2021032312:TMP:1000 mb:6 hour fcst:ENS=low-res ctl",
+               "3:200:d=2021032312:TMP:1000 mb:6 hour fcst:ENS=low-res ctl"]
+    # messages in another order, a repeated field and a field missing
+    member1 = ["1:0:d=2021032312:TMP:1000 mb:6 hour fcst:ENS=+1",
+               "2:110:d=2021032312:HGT:1000 mb:6 hour fcst:ENS=+1",
+               "3:220:d=2021032312:TMP:1000 mb:6 hour fcst:ENS=+1",
+               "4:330:d=2021032312:UGRD:1000 mb:6 hour fcst:ENS=+1"]
+    member2 = ["1:0:d=2021032312:TMP:1000 mb:6 hour fcst:ENS=+2"]
+
+    records = match_records([control, member1, member2])
+
+    # fields in the order of the first inventory, fields missing from it ignored
+    assert records == [[control[0], member1[1], None],
+                       [control[1], member1[0], member2[0]],
+                       [control[2], member1[2], None]]
+
+
+def test_ensemble_mean_spread():
+
+    members = np.array([[1., 2., 3., 4.],
+                        [3., 2., np.nan, 4.],
+                        [5., 2., UNDEFINED, np.nan]], dtype=np.float32)
+
+    mean, spread = ensemble_mean_spread(members, min_members=2)
+
+    assert mean.dtype == np.float32 and spread.dtype == np.float32
+    np.testing.assert_allclose(mean[[0, 1, 3]], [3., 2., 4.])
+    # standard deviation normalized by the number of members with a value minus one
+    np.testing.assert_allclose(spread[[0, 1, 3]], [2., 0., 0.])
+    # a single member has a value
+    assert mean[2] == UNDEFINED and spread[2] == UNDEFINED
+
+    mean, spread = ensemble_mean_spread(members, min_members=3)
+    np.testing.assert_allclose(mean[:2], [3., 2.])
+    assert np.all(mean[2:] == UNDEFINED) and np.all(spread[2:] == UNDEFINED)
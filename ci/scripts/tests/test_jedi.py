@@ -0,0 +1,87 @@
+import sys
+import os
+import tarfile
+from wxflow import parse_j2yaml
+
+_here = os.path.dirname(__file__)
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+sys.path.append(os.path.join(HOMEgfs, 'ush', 'python', 'pygfs', 'utils'))
+
+from jedi_utils import extract_tar, referenced_files
+
+GPREFIX = "gdas.t18z."
+APREFIX = "gdas.t00z."
+
+# bias correction part of the observers of the atmospheric variational analysis, as rendered by jcb
+OBSERVER_TMPL = """
+obs space:
+  name: {{ sensor }}
+  obsdatain:
+    engine:
+      type: H5File
+      obsfile: "{{ DATA }}/obs/{{ APREFIX }}{{ sensor }}.nc"
+obs bias:
+  input file: "{{ DATA }}/obs/{{ GPREFIX }}{{ sensor }}.satbias.nc"
+  output file: "{{ DATA }}/bc/{{ APREFIX }}{{ sensor }}.satbias.nc"
+  variational bc:
+    predictors:
+    - name: constant
+    - name: lapseRate
+      order: 2
+      tlapse: "{{ DATA }}/obs/{{ GPREFIX }}{{ sensor }}.tlapse.txt"
+  covariance:
+    minimal required obs number: 20
+    prior:
+      input file: "{{ DATA }}/obs/{{ GPREFIX }}{{ sensor }}.satbias_cov.nc"
+    output file: "{{ DATA }}/bc/{{ APREFIX }}{{ sensor }}.satbias_cov.nc"
+"""
+
+
+def _rad_varbc_params_tar(bc_dir, tar_file, sensors):
+    """Write a rad_varbc_params.tar of the previous cycle as AtmAnalysis.finalize does"""
+    os.makedirs(bc_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(tar_file), exist_ok=True)
+    with tarfile.open(tar_file, 'w') as radbcor:
+        for sensor in sensors:
+            for suffix in ('satbias.nc', 'satbias_cov.nc', 'tlapse.txt'):
+                bcfile = os.path.join(bc_dir, f"{GPREFIX}{sensor}.{suffix}")
+                with open(bcfile, 'w') as fh:
+                    fh.write(sensor)
+                radbcor.add(bcfile, arcname=os.path.basename(bcfile))
+
+
+def _atmanlvar(tmp_path, sensors):
+    """Return a rendered atmanlvar config with the observers of the sensors"""
+    tmpl = os.path.join(tmp_path, 'observer.yaml.j2')
+    with open(tmpl, 'w') as fh:
+        fh.write(OBSERVER_TMPL)
+    observers = [parse_j2yaml(tmpl, {'DATA': str(tmp_path), 'GPREFIX': GPREFIX, 'APREFIX': APREFIX, 'sensor': sensor})
+                 for sensor in sensors]
+    return {'cost function': {'observations': {'observers': observers}}}
+
+
+def test_referenced_files_match_rad_varbc_params(tmp_path):
+
+    tar_file = os.path.join(tmp_path, 'obs', f"{GPREFIX}rad_varbc_params.tar")
+    _rad_varbc_params_tar(os.path.join(tmp_path, 'bc_prev'), tar_file, ['amsua_n19', 'atms_n20', 'iasi_metop-c'])
+
+    # iasi_metop-c is in the tarball but not assimilated
+    referenced = referenced_files(_atmanlvar(tmp_path, ['amsua_n19', 'atms_n20']))
+    with tarfile.open(tar_file) as tarball:
+        names = tarball.getnames()
+    matched = sorted(name for name in names if name in referenced)
+    assert matched == sorted(f"{GPREFIX}{sensor}.{suffix}" for sensor in ['amsua_n19', 'atms_n20']
+                             for suffix in ('satbias.nc', 'satbias_cov.nc', 'tlapse.txt'))
+
+    extract_tar(tar_file, referenced)
+    assert sorted(ff for ff in os.listdir(os.path.join(tmp_path, 'obs')) if not ff.endswith('.tar')) == matched
+
+
+def test_extract_tar_without_referenced_files(tmp_path):
+
+    tar_file = os.path.join(tmp_path, 'obs', f"{GPREFIX}rad_varbc_params.tar")
+    _rad_varbc_params_tar(os.path.join(tmp_path, 'bc_prev'), tar_file, ['amsua_n19'])
+
+    # no member is referenced, everything is extracted
+    extract_tar(tar_file, {'unrelated.nc'})
+    assert len([ff for ff in os.listdir(os.path.join(tmp_path, 'obs')) if not ff.endswith('.tar')]) == 3
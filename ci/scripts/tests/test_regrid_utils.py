@@ -0,0 +1,81 @@
+import sys
+import os
+import numpy as np
+import pytest
+from wxflow import which, chdir
+
+_here = os.path.dirname(__file__)
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+sys.path.append(os.path.join(HOMEgfs, 'ush', 'python', 'pygfs', 'utils'))
+
+nc = pytest.importorskip('netCDF4')
+from regrid_utils import ConservativeRemap, MISSING_VALUE
+
+# FRE-NCtools, to create the mosaics and run fregrid
+TOOLS = {tool: which(tool) for tool in ('make_hgrid', 'make_solo_mosaic', 'fregrid')}
+RES_IN, RES_OUT, NTILES = 12, 6, 6
+
+
+def _make_mosaic(res):
+    TOOLS['make_hgrid']('--grid_type', 'gnomonic_ed', '--nlon', str(2 * res), '--grid_name', f"C{res}_grid")
+    tile_files = ','.join(f"C{res}_grid.tile{tile}.nc" for tile in range(1, NTILES + 1))
+    TOOLS['make_solo_mosaic']('--num_tiles', str(NTILES), '--dir', './', '--mosaic_name', f"C{res}_mosaic",
+                              '--tile_file', tile_files)
+
+
+def _write_tiles(prefix, name, data):
+    """Write one file per tile, with the layout of the sfc_data restarts"""
+    for tile in range(1, NTILES + 1):
+        with nc.Dataset(f"{prefix}.tile{tile}.nc", mode='w') as ncf:
+            for dim, axis, size in (('xaxis_1', 'X', data.shape[2]), ('yaxis_1', 'Y', data.shape[1])):
+                ncf.createDimension(dim, size)
+                var = ncf.createVariable(dim, np.float64, (dim,))
+                var.cartesian_axis = axis
+                var[:] = np.arange(1, size + 1)
+            ncf.createDimension('Time', None)
+            time = ncf.createVariable('Time', np.float64, ('Time',))
+            time.cartesian_axis = 'T'
+            time[:] = [1.]
+            var = ncf.createVariable(name, np.float64, ('Time', 'yaxis_1', 'xaxis_1'))
+            var[:] = data[tile - 1][np.newaxis, ...]
+
+
+@pytest.mark.skipif(not all(TOOLS.values()), reason="FRE-NCtools (make_hgrid, make_solo_mosaic, fregrid) not found")
+def test_conservative_remap_matches_fregrid(tmp_path):
+
+    with chdir(tmp_path):
+        _make_mosaic(RES_IN)
+        _make_mosaic(RES_OUT)
+
+        rng = np.random.default_rng(0)
+        shape_in = (NTILES, RES_IN, RES_IN)
+        snodl = rng.uniform(0., 500., shape_in)
+        # land fraction weights, with whole output cells covered only by zero weights
+        lsm_frac = rng.uniform(0., 1., shape_in)
+        lsm_frac[0, :4, :4] = 0.
+        lsm_frac[rng.uniform(size=shape_in) < 0.2] = 0.
+        _write_tiles('input', 'snodl', snodl)
+        _write_tiles('weight', 'lsm_frac', lsm_frac)
+
+        TOOLS['fregrid']('--input_mosaic', f"C{RES_IN}_mosaic.nc", '--input_file', 'input',
+                         '--scalar_field', 'snodl', '--output_mosaic', f"C{RES_OUT}_mosaic.nc",
+                         '--output_file', 'output', '--interp_method', 'conserve_order1',
+                         '--weight_file', 'weight', '--weight_field', 'lsm_frac', '--remap_file', 'remap')
+
+        expected = []
+        for tile in range(1, NTILES + 1):
+            with nc.Dataset(f"output.tile{tile}.nc") as ncf:
+                var = ncf.variables['snodl']
+                var.set_auto_mask(False)
+                values = np.squeeze(var[:]).astype(np.float64)
+                missing = getattr(var, 'missing_value', MISSING_VALUE)
+                expected.append(np.where(values == missing, MISSING_VALUE, values))
+        expected = np.stack(expected)
+
+        remap = ConservativeRemap.from_remap_files([f"remap.tile{tile}.nc" for tile in range(1, NTILES + 1)],
+                                                   shape_in, (NTILES, RES_OUT, RES_OUT), weights=list(lsm_frac))
+        result = remap.regrid(snodl)
+
+    np.testing.assert_array_equal(result == MISSING_VALUE, expected == MISSING_VALUE)
+    defined = expected != MISSING_VALUE
+    np.testing.assert_allclose(result[defined], expected[defined], rtol=1.e-5)
@@ -0,0 +1,36 @@
+import sys
+import os
+import pytest
+
+_here = os.path.dirname(__file__)
+HOMEgfs = os.sep.join(_here.split(os.sep)[:-3])
+sys.path.append(os.path.join(HOMEgfs, 'workflow'))
+
+from resource_advisor import resource_key
+
+
+@pytest.mark.parametrize('task_name, expected', [
+    # plain tasks
+    ('gfs_fcst_seg0', ('gfs', 'fcst')),
+    ('enkfgdas_atmensanlfv3inc', ('enkfgdas', 'atmensanlfv3inc')),
+    ('arch', ('', 'arch')),
+    # forecast hour groups
+    ('gfs_atmos_prod_f006', ('gfs', 'atmos_products')),
+    ('gdas_atmupp_f003', ('gdas', 'upp')),
+    ('gdas_ocean_prod_f009', ('gdas', 'oceanice_products')),
+    ('gfs_wave_post_grid_f012', ('gfs', 'wavepostsbs')),
+    ('gfs_gempak_f012', ('gfs', 'gempak')),
+    ('gfs_gempakgrb2spec_f012', ('gfs', 'gempak')),
+    ('gfs_awips_20km_1p0deg_f012', ('gfs', 'awips')),
+    ('gefs_atmos_ensstat_f006', ('gefs', 'atmos_ensstat')),
+    # members and member groups
+    ('gefs_fcst_mem000', ('gefs', 'fcst')),
+    ('gefs_fcst_mem003', ('gefs', 'efcs')),
+    ('enkfgdas_fcst_mem001', ('enkfgdas', 'efcs')),
+    ('gefs_atmos_prod_mem001_f006', ('gefs', 'atmos_products')),
+    ('enkfgdas_ecen000', ('enkfgdas', 'ecen')),
+    ('enkfgdas_earc00', ('enkfgdas', 'earc')),
+])
+def test_resource_key(task_name, expected):
+
+    assert resource_key(task_name) == expected
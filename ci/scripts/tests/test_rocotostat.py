@@ -1,5 +1,8 @@
 import sys
 import os
+import sqlite3
+from calendar import timegm
+from datetime import datetime
 from shutil import rmtree
 import wget
 
@@ -7,6 +10,7 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.join(os.path.dirname(script_dir), 'utils'))
 
 from rocotostat import rocoto_statcount, rocotostat_summary, is_done, is_stalled, CommandNotFoundError
+from rocotostat import rocoto_db_statcount, rocoto_db_summary, rocoto_xml_cycles
 from wxflow import which
 
 test_data_url = 'https://noaa-nws-global-pds.s3.amazonaws.com/data/CI/'
@@ -52,6 +56,24 @@ def test_rocoto_summary():
     assert result['CYCLES_DONE'] == 1
 
 
+def test_rocoto_db_statcount():
+
+    result = rocoto_db_statcount(os.path.join(testdata_full_path, 'database.db'))
+
+    assert result == rocoto_statcount(rocotostat_cmd)
+    assert result['SUCCEEDED'] == 20
+    assert result['DEAD'] == 0
+
+
+def test_rocoto_db_summary():
+
+    result = rocoto_db_summary(os.path.join(testdata_full_path, 'database.db'),
+                               os.path.join(testdata_full_path, 'workflow.xml'))
+
+    assert result == rocotostat_summary(rocotostat_cmd)
+    assert is_done(result)
+
+
 def test_rocoto_done():
 
     result = rocotostat_summary(rocotostat_cmd)
@@ -86,4 +108,84 @@ def test_rocoto_stalled():
     assert result['SUCCEEDED'] == 11
     assert is_stalled(result)
 
+    result = rocoto_db_statcount(db)
+
+    assert result['SUCCEEDED'] == 11
+    assert is_stalled(result)
+
     rmtree(testdata_full_path)
+
+
+def _epoch(cycle):
+    return timegm(datetime.strptime(cycle, '%Y%m%d%H').timetuple())
+
+
+def _rocoto_files(tmp_path, cycles, jobs):
+    """
+    Write a workflow with four 6-hourly cycles and a database with the activated cycles
+    (cycle, done) and the jobs (taskname, cycle, state) given
+    """
+    xml = os.path.join(tmp_path, 'workflow.xml')
+    with open(xml, 'w') as fh:
+        fh.write('<?xml version="1.0"?>\n'
+                 '<!DOCTYPE workflow [<!ENTITY SDATE "202103231800">]>\n'
+                 '<workflow realtime="F" scheduler="slurm">\n'
+                 '  <cycledef group="gdas_half">&SDATE; &SDATE; 06:00:00</cycledef>\n'
+                 '  <cycledef group="gdas">&SDATE; 202103241200 06:00:00</cycledef>\n'
+                 '</workflow>\n')
+
+    db = os.path.join(tmp_path, 'database.db')
+    with sqlite3.connect(db) as connection:
+        connection.execute("CREATE TABLE cycles (id INTEGER PRIMARY KEY, cycle DATETIME, activated DATETIME, "
+                           "expired DATETIME, done DATETIME)")
+        connection.execute("CREATE TABLE jobs (id INTEGER PRIMARY KEY, jobid VARCHAR(64), taskname VARCHAR(64), "
+                           "cycle DATETIME, cores INTEGER, state VARCHAR(64), native_state VARCHAR(64), "
+                           "exit_status INTEGER, tries INTEGER, nunknowns INTEGER, duration REAL)")
+        connection.executemany("INSERT INTO cycles (cycle, activated, expired, done) VALUES (?, 1, 0, ?)",
+                               [(_epoch(cycle), done) for cycle, done in cycles])
+        connection.executemany("INSERT INTO jobs (jobid, taskname, cycle, cores, state, tries) VALUES ('1', ?, ?, 1, ?, 1)",
+                               [(task, _epoch(cycle), state) for task, cycle, state in jobs])
+    connection.close()
+    return xml, db
+
+
+def test_rocoto_db_summary_partially_activated(tmp_path):
+
+    xml, db = _rocoto_files(tmp_path, [('2021032318', 1), ('2021032400', 1)],
+                            [('gdasfcst', '2021032318', 'SUCCEEDED'), ('gdasfcst', '2021032400', 'SUCCEEDED')])
+
+    assert len(rocoto_xml_cycles(xml)) == 4
+    result = rocoto_db_summary(db, xml)
+
+    # the cycles not activated yet are counted
+    assert result == {'CYCLES_TOTAL': 4, 'CYCLES_DONE': 2}
+    assert not is_done(result)
+
+
+def test_rocoto_db_statcount_failed_retried(tmp_path):
+
+    xml, db = _rocoto_files(tmp_path, [('2021032318', 0)],
+                            [('gdasfcst', '2021032318', 'FAILED'), ('gdasanal', '2021032318', 'SUCCEEDED')])
+
+    result = rocoto_db_statcount(db)
+
+    # a try that failed and will be retried is not a failure of the workflow
+    assert result['FAIL'] == 0
+    assert result['DEAD'] == 0
+    assert result['SUCCEEDED'] == 1
+    assert is_stalled(result)
+
+
+def test_rocoto_db_statcount_dead_and_queued(tmp_path):
+
+    xml, db = _rocoto_files(tmp_path, [('2021032318', 0), ('2021032400', 0)],
+                            [('gdasfcst', '2021032318', 'DEAD'), ('gdasanal', '2021032318', 'SUCCEEDED'),
+                             ('gdasprep', '2021032400', 'QUEUED'), ('gdasfcst', '2021032400', 'QUEUED')])
+
+    result = rocoto_db_statcount(db)
+
+    assert result['DEAD'] == 1
+    assert result['QUEUED'] == 2
+    assert result['SUCCEEDED'] == 1
+    assert not is_stalled(result)
+    assert rocoto_db_summary(db, xml) == {'CYCLES_TOTAL': 4, 'CYCLES_DONE': 0}
@@ -3,6 +3,11 @@
 import sys
 import os
 import copy
+import sqlite3
+import xml.etree.ElementTree as ET
+from calendar import timegm
+from datetime import datetime, timedelta
+from functools import partial
 from time import sleep
 
 from wxflow import which, Logger, CommandNotFoundError, ProcessError
@@ -12,6 +17,18 @@ from collections import Counter
 
 logger = Logger(level=os.environ.get("LOGGING_LEVEL", "DEBUG"), colored_log=False)
 
+STATUS_CASES = ['SUCCEEDED', 'FAIL', 'DEAD', 'RUNNING', 'SUBMITTING', 'QUEUED', 'UNAVAILABLE', 'UNKNOWN']
+
+# Columns of the Rocoto database tables used to compute the status without rocotostat
+ROCOTO_DB_SCHEMA = {'jobs': {'taskname', 'cycle', 'state'},
+                    'cycles': {'cycle', 'done'}}
+
+
+class UnknownSchemaError(Exception):
+    """
+    Raised when a Rocoto database does not have the expected tables and columns
+    """
+
 
 def attempt_multiple_times(expression, max_attempts, sleep_duration=0, exception_class=Exception):
     """
@@ -80,6 +97,7 @@ def input_args():
     parser.add_argument('--verbose', action='store_true', help='List the states and the number of jobs that are in each', required=False)
     parser.add_argument('-v', action='store_true', help='List the states and the number of jobs that are in each', required=False)
     parser.add_argument('--export', action='store_true', help='create and export list of the status values for bash', required=False)
+    parser.add_argument('--cli', action='store_true', help='use the rocotostat command instead of reading the database directly', required=False)
 
     args = parser.parse_args()
 
@@ -136,16 +154,133 @@ def rocoto_statcount(rocotostat):
     rocotostat_output = [line.split()[0:4] for line in rocotostat_output]
     rocotostat_output = [line for line in rocotostat_output if len(line) != 1]
 
-    status_cases = ['SUCCEEDED', 'FAIL', 'DEAD', 'RUNNING', 'SUBMITTING', 'QUEUED', 'UNAVAILABLE', 'UNKNOWN']
-
     rocoto_status = {}
     status_counts = Counter(case for sublist in rocotostat_output for case in sublist)
-    for case in status_cases:
+    for case in STATUS_CASES:
+        rocoto_status[case] = status_counts[case]
+
+    return rocoto_status
+
+
+def rocoto_db_connect(database_file):
+    """
+    rocoto_db_connect Open a Rocoto database read-only and check its schema.
+
+    Input:
+    database_file - Path to the Rocoto database file.
+
+    Output:
+    connection - A read-only sqlite3 connection.
+
+    Raises:
+    UnknownSchemaError - If the database lacks the tables or columns of ROCOTO_DB_SCHEMA.
+    """
+
+    connection = sqlite3.connect(f"file:{os.path.abspath(database_file)}?mode=ro", uri=True, timeout=30)
+    try:
+        for table, columns in ROCOTO_DB_SCHEMA.items():
+            found = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+            if not columns.issubset(found):
+                raise UnknownSchemaError(f"Rocoto database table '{table}' is missing columns {sorted(columns - found)}")
+    except Exception:
+        connection.close()
+        raise
+
+    return connection
+
+
+def rocoto_db_statcount(database_file):
+    """
+    rocoto_db_statcount Count the jobs in each state from the Rocoto database.
+
+    rocoto_db_statcount(database_file) returns the same dictionary as rocoto_statcount,
+    querying the jobs table directly instead of running rocotostat --all.
+
+    Input:
+    database_file - Path to the Rocoto database file.
+
+    Output:
+    rocoto_status - A dictionary with the count of each status case.
+    """
+
+    connection = rocoto_db_connect(database_file)
+    try:
+        status_counts = Counter(dict(connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")))
+    finally:
+        connection.close()
+
+    # as with rocotostat, states other than STATUS_CASES (e.g. FAILED tries being retried) are not counted
+    rocoto_status = {}
+    for case in STATUS_CASES:
         rocoto_status[case] = status_counts[case]
 
     return rocoto_status
 
 
+def rocoto_xml_cycles(workflow_file):
+    """
+    rocoto_xml_cycles List the cycles defined by the cycledefs of a Rocoto workflow.
+
+    Only cycledefs given as start, end and interval are supported.
+
+    Input:
+    workflow_file - Path to the Rocoto workflow XML.
+
+    Output:
+    cycles - A set of the cycles, in seconds since the epoch as stored in the Rocoto database.
+
+    Raises:
+    UnknownSchemaError - If a cycledef is not given as start, end and interval.
+    """
+
+    cycles = set()
+    for cycledef in ET.parse(workflow_file).getroot().iter('cycledef'):
+        fields = cycledef.text.split()
+        if len(fields) != 3:
+            raise UnknownSchemaError(f"Unsupported cycledef '{cycledef.text.strip()}'")
+        start, end = (datetime.strptime(field, '%Y%m%d%H%M') for field in fields[:2])
+        # interval as [[dd:]hh:]mm:ss or seconds
+        parts = [int(part) for part in fields[2].split(':')]
+        interval = timedelta(seconds=sum(part * unit for part, unit in zip(reversed(parts), (1, 60, 3600, 86400))))
+        if interval <= timedelta(0):
+            raise UnknownSchemaError(f"Unsupported cycledef '{cycledef.text.strip()}'")
+        while start <= end:
+            cycles.add(timegm(start.timetuple()))
+            start += interval
+
+    return cycles
+
+
+def rocoto_db_summary(database_file, workflow_file):
+    """
+    rocoto_db_summary Count the total and done cycles from the Rocoto database.
+
+    rocoto_db_summary(database_file, workflow_file) returns the same dictionary as rocotostat_summary,
+    querying the cycles table directly instead of running rocotostat --summary.
+    Rocoto only adds a cycle to the database when it activates it, so the total also counts
+    the cycles defined in the workflow that are not activated yet.
+
+    Input:
+    database_file - Path to the Rocoto database file.
+    workflow_file - Path to the Rocoto workflow XML.
+
+    Output:
+    rocoto_status - A dictionary with the total number of cycles and the number of cycles marked as 'Done'.
+    """
+
+    connection = rocoto_db_connect(database_file)
+    try:
+        activated = dict(connection.execute("SELECT cycle, done FROM cycles"))
+    finally:
+        connection.close()
+
+    rocoto_status = {
+        'CYCLES_TOTAL': len(rocoto_xml_cycles(workflow_file) | set(activated)),
+        'CYCLES_DONE': sum(1 for done in activated.values() if done)
+    }
+    return rocoto_status
+
+
 def is_done(rocoto_status):
     """
     is_done Check if all cycles are done.
@@ -197,16 +332,29 @@ if __name__ == '__main__':
 
     args = input_args()
 
-    try:
+    database_file = os.path.abspath(args.d.name)
+
+    use_cli = args.cli
+    if not use_cli:
+        try:
+            rocoto_status = rocoto_db_statcount(database_file)
+            rocoto_status.update(rocoto_db_summary(database_file, os.path.abspath(args.w.name)))
+            statcount = partial(rocoto_db_statcount, database_file)
+        except (UnknownSchemaError, sqlite3.Error, ET.ParseError, ValueError) as ee:
+            logger.warning(f"Unable to read {database_file} directly ({ee}), falling back to rocotostat")
+            use_cli = True
+
+    if use_cli:
         rocotostat = which("rocotostat")
-    except CommandNotFoundError:
-        logger.exception("rocotostat not found in PATH")
-        raise CommandNotFoundError("rocotostat not found in PATH")
+        if not rocotostat:
+            logger.error("rocotostat not found in PATH")
+            raise CommandNotFoundError("rocotostat not found in PATH")
 
-    rocotostat.add_default_arg(['-w', os.path.abspath(args.w.name), '-d', os.path.abspath(args.d.name)])
+        rocotostat.add_default_arg(['-w', os.path.abspath(args.w.name), '-d', database_file])
 
-    rocoto_status = rocoto_statcount(rocotostat)
-    rocoto_status.update(rocotostat_summary(rocotostat))
+        rocoto_status = rocoto_statcount(rocotostat)
+        rocoto_status.update(rocotostat_summary(rocotostat))
+        statcount = partial(rocoto_statcount, rocotostat)
 
     error_return = 0
     if is_done(rocoto_status):
@@ -215,7 +363,7 @@ if __name__ == '__main__':
         error_return = rocoto_status['FAIL'] + rocoto_status['DEAD']
         rocoto_state = 'FAIL'
     elif rocoto_status['UNAVAILABLE'] > 0 or rocoto_status['UNKNOWN'] > 0:
-        rocoto_status = attempt_multiple_times(lambda: rocoto_statcount(rocotostat), 2, 120, ProcessError)
+        rocoto_status = attempt_multiple_times(statcount, 2, 120, (ProcessError, sqlite3.Error))
         error_return = 0
         rocoto_state = 'RUNNING'
         if rocoto_status['UNAVAILABLE'] > 0:
@@ -225,7 +373,7 @@ if __name__ == '__main__':
             error_return += rocoto_status['UNKNOWN']
             rocoto_state = 'UNKNOWN'
     elif is_stalled(rocoto_status):
-        rocoto_status = attempt_multiple_times(lambda: rocoto_statcount(rocotostat), 2, 120, ProcessError)
+        rocoto_status = attempt_multiple_times(statcount, 2, 120, (ProcessError, sqlite3.Error))
         if is_stalled(rocoto_status):
             error_return = 3
             rocoto_state = 'STALLED'
@@ -15,6 +15,8 @@ if (( status != 0 )); then exit "${status}"; fi
 export job="atmos_ensstat"
 export jobid="${job}.$$"
 
+# FHRLST lists the forecast hours of the group, which are all processed by the JJOB
+export FHRLST="${FHRLST:-f${FHR3}}"
 export FORECAST_HOUR=$(( 10#${FHR3} ))
 
 ###############################################################
@@ -15,13 +15,21 @@ if (( status != 0 )); then exit "${status}"; fi
 export job="atmos_products"
 export jobid="${job}.$$"
 
-# Negatation needs to be before the base
-fhr3_base="10#${FHR3}"
-export FORECAST_HOUR=$(( ${fhr3_base/10#-/-10#} ))
+# Process each forecast hour of the group, e.g. FHRLST=f000_f001_f002
+# shellcheck disable=SC2153
+fhrlst=$(echo "${FHRLST:-f${FHR3}}" | sed -e 's/_/ /g; s/f/ /g; s/,/ /g')
 
 ###############################################################
 # Execute the JJOB
 ###############################################################
-"${HOMEgfs}/jobs/JGLOBAL_ATMOS_PRODUCTS"
+for FHR3 in ${fhrlst}; do
+  export FHR3
+  # Negatation needs to be before the base
+  fhr3_base="10#${FHR3}"
+  export FORECAST_HOUR=$(( ${fhr3_base/10#-/-10#} ))
+  "${HOMEgfs}/jobs/JGLOBAL_ATMOS_PRODUCTS"
+  status=$?
+  if (( status != 0 )); then exit "${status}"; fi
+done
 
-exit $?
+exit 0
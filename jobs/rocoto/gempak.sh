@@ -9,8 +9,16 @@ export job="gempak"
 export jobid="${job}.$$"
 
 
+# Process each forecast hour of the group, e.g. FHRLST=f000_f001_f002
+# shellcheck disable=SC2153
+fhrlst=$(echo "${FHRLST:-f${FHR3}}" | sed -e 's/_/ /g; s/f/ /g; s/,/ /g')
+
 # Execute the JJOB
-"${HOMEgfs}/jobs/J${RUN^^}_ATMOS_GEMPAK"
+for FHR3 in ${fhrlst}; do
+  export FHR3
+  "${HOMEgfs}/jobs/J${RUN^^}_ATMOS_GEMPAK"
+  status=$?
+  if (( status != 0 )); then exit "${status}"; fi
+done
 
-status=$?
-exit "${status}"
+exit 0
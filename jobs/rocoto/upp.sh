@@ -44,11 +44,19 @@ fi
 export job="upp"
 export jobid="${job}.$$"
 
-export FORECAST_HOUR=$(( 10#${FHR3} ))
+# Process each forecast hour of the group, e.g. FHRLST=f000_f001_f002
+# shellcheck disable=SC2153
+fhrlst=$(echo "${FHRLST:-f${FHR3}}" | sed -e 's/_/ /g; s/f/ /g; s/,/ /g')
 
 ###############################################################
 # Execute the JJOB
 ###############################################################
-"${HOMEgfs}/jobs/JGLOBAL_ATMOS_UPP"
+for FHR3 in ${fhrlst}; do
+  export FHR3
+  export FORECAST_HOUR=$(( 10#${FHR3} ))
+  "${HOMEgfs}/jobs/JGLOBAL_ATMOS_UPP"
+  status=$?
+  if (( status != 0 )); then exit "${status}"; fi
+done
 
-exit $?
+exit 0
@@ -12,10 +12,17 @@ status=$?
 export job="wavepostsbs"
 export jobid="${job}.$$"
 
+# Process each forecast hour of the group, e.g. FHRLST=f000_f001_f002
+# shellcheck disable=SC2153
+fhrlst=$(echo "${FHRLST:-f${FHR3}}" | sed -e 's/_/ /g; s/f/ /g; s/,/ /g')
+
 ###############################################################
 # Execute the JJOB
-${HOMEgfs}/jobs/JGLOBAL_WAVE_POST_SBS
-status=$?
-[[ ${status} -ne 0 ]] && exit ${status}
+for FHR3 in ${fhrlst}; do
+  export FHR3
+  ${HOMEgfs}/jobs/JGLOBAL_WAVE_POST_SBS
+  status=$?
+  [[ ${status} -ne 0 ]] && exit ${status}
+done
 
 exit 0
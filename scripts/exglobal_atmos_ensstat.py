@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+
+import os
+
+from wxflow import Logger, cast_strdict_as_dtypedict
+from pygfs.task.atmos_ensstat import AtmosEnsStat
+
+# initialize root logger
+logger = Logger(level=os.environ.get("LOGGING_LEVEL", "DEBUG"), colored_log=True)
+
+
+if __name__ == '__main__':
+
+    # Take configuration from environment and cast it as python dictionary
+    config = cast_strdict_as_dtypedict(os.environ)
+
+    # Instantiate the ensemble statistics task
+    ensstat = AtmosEnsStat(config)
+
+    # Compute the mean and spread of all forecast hours and grids
+    ensstat.execute()
+
+    # Copy the products to COMOUT
+    ensstat.finalize()
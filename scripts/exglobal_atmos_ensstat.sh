@@ -2,14 +2,17 @@
 
 source "${HOMEgfs}/ush/preamble.sh"
 
-fhr3=$(printf "%03d" "${FORECAST_HOUR}")
+# Forecast hours to process, e.g. FHRLST=f000_f003_f006
+fhrlst=$(echo "${FHRLST:-f$(printf "%03d" "${FORECAST_HOUR}")}" | sed -e 's/_/ /g; s/f/ /g; s/,/ /g')
 
 if [[ -a mpmd_script ]]; then rm -Rf mpmd_script; fi
 
 {
-    for grid in '0p25' '0p50' '1p00'; do
-        echo "${USHgfs}/atmos_ensstat.sh ${grid} ${fhr3}"
-        # echo "${USHgfs}/atmos_ensstat.sh ${grid} ${fhr3} b"
+    for fhr3 in ${fhrlst}; do
+        for grid in '0p25' '0p50' '1p00'; do
+            echo "${USHgfs}/atmos_ensstat.sh ${grid} ${fhr3}"
+            # echo "${USHgfs}/atmos_ensstat.sh ${grid} ${fhr3} b"
+        done
     done
 } > mpmd_script
 
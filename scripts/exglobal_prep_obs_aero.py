@@ -18,6 +18,9 @@ if __name__ == '__main__':
     config = cast_strdict_as_dtypedict(os.environ)
 
     AeroObs = AerosolObsPrep(config)
-    AeroObs.initialize()
-    AeroObs.runConverter()
+    if AeroObs.task_config.get('PREPOBSAERO_PIPELINE', False):
+        AeroObs.runPipeline()
+    else:
+        AeroObs.initialize()
+        AeroObs.runConverter()
     AeroObs.finalize()
@@ -6,8 +6,8 @@ grid=${1}
 fhr3=${2}
 grid_type=${3:-''}
 
-mkdir "${grid}${grid_type}"
-cd "${grid}${grid_type}" || exit 2
+mkdir -p "${grid}${grid_type}/f${fhr3}"
+cd "${grid}${grid_type}/f${fhr3}" || exit 2
 
 # Collect input grib files
 input_files=()
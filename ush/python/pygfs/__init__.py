@@ -12,8 +12,14 @@ from .task.snow_analysis import SnowAnalysis
 from .task.snowens_analysis import SnowEnsAnalysis
 from .task.upp import UPP
 from .task.oceanice_products import OceanIceProducts
+from .task.atmos_ensstat import AtmosEnsStat
 from .task.gfs_forecast import GFSForecast
 from .utils import marine_da_utils
+from .utils import transfer_utils
+from .utils import cache_utils
+from .utils import grib2_utils
+from .utils import hpss_utils
+from .utils import jedi_utils
 
 __docformat__ = "restructuredtext"
 __version__ = "0.1.0"
@@ -1 +1,2 @@
 from .jedi import Jedi
+from .jedi_dag import JediDAG
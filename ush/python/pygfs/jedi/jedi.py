@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 import os
-import tarfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from pprint import pformat
 from jcb import render
 from wxflow import (AttrDict, FileHandler, Task, Executable,
@@ -11,6 +12,8 @@ from wxflow import (AttrDict, FileHandler, Task, Executable,
                     parse_j2yaml, save_as_yaml,
                     logit,
                     WorkflowException)
+from pygfs.utils import timing_utils
+from pygfs.utils.jedi_utils import extract_tar, referenced_files
 
 logger = getLogger(__name__.split('.')[-1])
 
@@ -18,6 +21,7 @@ required_jedi_keys = ['rundir', 'exe_src', 'mpi_cmd']
 optional_jedi_keys = ['jedi_args', 'jcb_base_yaml', 'jcb_algo', 'jcb_algo_yaml']
 
 
+@timing_utils.instrument(methods=['initialize', 'execute'], label=lambda jedi: jedi.jedi_config.yaml_name)
 class Jedi:
     """
     Class for initializing and executing JEDI applications
@@ -103,30 +107,39 @@ class Jedi:
         self.link_exe()
 
     @logit(logger)
-    def execute(self) -> None:
+    def execute(self, mpi_cmd: Optional[str] = None, cwd: Optional[str] = None) -> None:
         """Execute JEDI application
 
         Parameters
         ----------
-        None
+        mpi_cmd (optional) : str
+            MPI command to launch the application with, overriding jedi_config.mpi_cmd
+        cwd (optional) : str
+            directory to launch the application in, leaving the working directory of the
+            process unchanged; by default the process changes directory to jedi_config.rundir
 
         Returns
         ----------
         None
         """
 
-        chdir(self.jedi_config.rundir)
+        if cwd is None:
+            chdir(self.jedi_config.rundir)
 
-        exec_cmd = Executable(self.jedi_config.mpi_cmd)
+        exec_cmd = Executable(mpi_cmd if mpi_cmd is not None else self.jedi_config.mpi_cmd)
         exec_cmd.add_default_arg(self.jedi_config.exe)
         if self.jedi_config.jedi_args is not None:
             for arg in self.jedi_config.jedi_args:
                 exec_cmd.add_default_arg(arg)
         exec_cmd.add_default_arg(self.jedi_config.yaml)
 
-        logger.info(f"Executing {exec_cmd}")
+        logger.info(f"Executing {exec_cmd}" + (f" in {cwd}" if cwd is not None else ""))
         try:
-            exec_cmd()
+            if cwd is None:
+                exec_cmd()
+            else:
+                # wxflow.Executable always runs in the working directory of the process
+                subprocess.run(exec_cmd.exe, cwd=cwd, check=True)
         except OSError:
             logger.error(f"FATAL ERROR: Failed to execute {exec_cmd}")
             raise OSError(f"FATAL ERROR: Failed to execute {exec_cmd}")
@@ -273,31 +286,67 @@ class Jedi:
             Input list but with redundancies removed
         """
 
+        # Compare elements by hash; lists such as FileHandler [src, dest] pairs are compared as tuples
+        def hashable(item):
+            return tuple(hashable(ii) for ii in item) if isinstance(item, list) else item
+
+        seen = set()
         output_list = []
         for item in input_list:
-            if item not in output_list:
+            key = hashable(item)
+            if key not in seen:
+                seen.add(key)
                 output_list.append(item)
 
         return output_list
 
+    @logit(logger)
+    def referenced_files(self) -> Optional[Set[str]]:
+        """Return the names of the files referenced by the rendered JEDI config
+
+        Every string of the rendered JEDI input config is considered as a possible
+        file path, e.g. the bias correction files of the observers.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        filenames : Set[str]
+            Basenames of the strings of the JEDI input config, or None if the application is not initialized
+        """
+
+        if self.jedi_config.input_config is None:
+            return None
+
+        return referenced_files(self.jedi_config.input_config)
+
     @staticmethod
     @logit(logger)
-    def extract_tar_from_filehandler_dict(filehandler_dict) -> None:
+    def extract_tar_from_filehandler_dict(filehandler_dict, members: Optional[Set[str]] = None,
+                                          max_workers: int = 1) -> None:
         """Extract tarballs from FileHandler input dictionary
 
         This method extracts files from tarballs specified in a FileHander
-        input dictionary for the 'copy' action.
+        input dictionary for the 'copy' action.  Each tarball is extracted once,
+        up to max_workers tarballs at a time.
 
         Parameters
         ----------
         filehandler_dict
             Input dictionary for FileHandler
+        members (optional) : Set[str]
+            Basenames of the files to extract, e.g. from Jedi.referenced_files(); all files by default
+        max_workers (optional) : int
+            Maximum number of tarballs extracted concurrently
 
         Returns
         ----------
         None
         """
 
+        tar_files = []
         for item in filehandler_dict['copy']:
             # Use the filename from the destination entry if it's a file path
             # Otherwise, it's a directory, so use the source entry filename
@@ -309,44 +358,13 @@ class Jedi:
             # Check if file is a tar ball
             if os.path.splitext(filename)[1] == '.tar':
                 tar_file = f"{os.path.dirname(item[1])}/{filename}"
+                if tar_file not in tar_files:
+                    tar_files.append(tar_file)
 
-                # Extract tarball
-                logger.info(f"Extract files from {tar_file}")
-                extract_tar(tar_file)
-
-
-@logit(logger)
-def extract_tar(tar_file: str) -> None:
-    """Extract files from a tarball
+        if len(tar_files) == 0:
+            return
 
-    This method extract files from a tarball
-
-    Parameters
-    ----------
-    tar_file
-        path/name of tarball
-
-    Returns
-    ----------
-    None
-    """
-
-    # extract files from tar file
-    tar_path = os.path.dirname(tar_file)
-    try:
-        with tarfile.open(tar_file, "r") as tarball:
-            tarball.extractall(path=tar_path)
-            logger.info(f"Extract {tarball.getnames()}")
-    except tarfile.FileExistsError as err:
-        logger.exception(f"FATAL ERROR: {tar_file} does not exist")
-        raise tarfile.FileExistsError(f"FATAL ERROR: {tar_file} does not exist")
-    except tarfile.ReadError as err:
-        if tarfile.is_tarfile(tar_file):
-            logger.error(f"FATAL ERROR: tar archive {tar_file} could not be read")
-            raise tarfile.ReadError(f"FATAL ERROR: tar archive {tar_file} could not be read")
-        else:
-            logger.error(f"FATAL ERROR: {tar_file} is not a tar archive")
-            raise tarfile.ReadError(f"FATAL ERROR: {tar_file} is not a tar archive")
-    except tarfile.ExtractError as err:
-        logger.exception(f"FATAL ERROR: unable to extract from {tar_file}")
-        raise tarfile.ExtractError("FATAL ERROR: unable to extract from {tar_file}")
+        # Extract tarballs
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tar_files)))) as executor:
+            for future in [executor.submit(extract_tar, tar_file, members) for tar_file in tar_files]:
+                future.result()
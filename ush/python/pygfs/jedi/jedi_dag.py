@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+import glob
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import combinations
+from logging import getLogger
+from typing import Callable, Dict, List, Optional, Union
+
+from wxflow import AttrDict, logit, mkdir_p, WorkflowException
+
+from .jedi import Jedi
+
+logger = getLogger(__name__.split('.')[-1])
+
+# suffix of the directories of the steps run concurrently, next to their run directory
+NODE_SUFFIX = 'jedi_dag'
+
+
+class JediDAG:
+    """
+    Class for executing a chain of JEDI applications (and other steps) as a
+    directed acyclic graph, running independent steps concurrently
+
+    Each step declares the products it needs (inputs) and the products it creates (outputs).
+    A step runs as soon as all of its inputs have been created by the steps that output them.
+    Products are names used only to order the steps; inputs that no step outputs are
+    assumed to be available before execution.
+    MPI tasks of the job are divided among the JEDI applications that can run concurrently.
+
+    When steps run concurrently, each JEDI application is launched in a private directory
+    next to its run directory, so that applications writing files with the same names
+    (parameter docs, log files, restarts, ...) do not overwrite each other.
+    The private directory holds symbolic links to the shared entries of the run directory
+    and to the declared inputs of the step, and an empty directory for each other
+    directory of the run directory. Only the declared outputs of the step are moved
+    to its run directory once it completes, everything else is discarded.
+    Inputs and outputs of JEDI applications are therefore paths relative to the run directory,
+    glob patterns being allowed.
+    """
+
+    @logit(logger, name="JediDAG")
+    def __init__(self, ntasks: int, max_concurrent: Optional[int] = None,
+                 step_opt: str = '', shared: Optional[List[str]] = None) -> None:
+        """Constructor for JediDAG objects
+
+        Parameters
+        ----------
+        ntasks: int
+            total number of MPI tasks available to the job
+        max_concurrent: int (optional)
+            maximum number of steps running at the same time, unlimited by default;
+            with 1, steps run serially in the order they were added with all MPI tasks
+        step_opt: str (optional)
+            option of the MPI launcher making concurrent launches share the allocation,
+            e.g. "--exact" for srun, added to the MPI command of the JEDI applications run concurrently
+        shared: List[str] (optional)
+            entries of the run directory staged before execution and only read by the
+            JEDI applications, linked in the directory of each application run concurrently
+
+        Returns
+        ----------
+        None
+        """
+        self.ntasks = ntasks
+        self.max_concurrent = max_concurrent
+        self.step_opt = step_opt
+        self.shared = list(shared or [])
+        self.steps = {}
+
+    def add(self, name: str, step: Union[Jedi, Callable[[], None]],
+            inputs: Optional[List[str]] = None, outputs: Optional[List[str]] = None) -> None:
+        """Add a step to the graph
+
+        Parameters
+        ----------
+        name: str
+            name of the step
+        step: Jedi or Callable
+            JEDI application to execute, or function to call with no arguments
+        inputs: List[str] (optional)
+            products needed by the step, paths relative to the run directory for JEDI applications
+        outputs: List[str] (optional)
+            products created by the step, paths relative to the run directory for JEDI applications
+
+        Returns
+        ----------
+        None
+        """
+        if name in self.steps:
+            raise WorkflowException(f"FATAL ERROR: Step '{name}' was already added")
+        self.steps[name] = AttrDict(step=step, inputs=list(inputs or []), outputs=list(outputs or []))
+
+    @logit(logger)
+    def dependencies(self) -> Dict[str, List[str]]:
+        """Return the steps each step depends on, checking the graph is acyclic
+
+        Returns
+        ----------
+        deps: Dict[str, List[str]]
+            names of the steps that create the inputs of each step
+        """
+        producers = {}
+        for name, step in self.steps.items():
+            for product in step.outputs:
+                if product in producers:
+                    raise WorkflowException(f"FATAL ERROR: '{product}' is output by both '{producers[product]}' and '{name}'")
+                producers[product] = name
+
+        deps = {name: sorted({producers[pp] for pp in step.inputs if pp in producers} - {name})
+                for name, step in self.steps.items()}
+
+        # ancestors of each step, which also detects cycles
+        self._ancestors = {}
+        visiting = set()
+
+        def ancestors(name):
+            if name not in self._ancestors:
+                if name in visiting:
+                    raise WorkflowException(f"FATAL ERROR: Step '{name}' depends on itself")
+                visiting.add(name)
+                self._ancestors[name] = set(deps[name]).union(*(ancestors(dd) for dd in deps[name]))
+                visiting.discard(name)
+            return self._ancestors[name]
+
+        for name in self.steps:
+            ancestors(name)
+        return deps
+
+    def _unrelated(self, name1: str, name2: str) -> bool:
+        """Return True if neither step depends on the other, so they may run concurrently
+        """
+        return name1 != name2 and name1 not in self._ancestors[name2] and name2 not in self._ancestors[name1]
+
+    def _mpi_cmd(self, name: str) -> Optional[str]:
+        """Return the MPI command for a JEDI application, with its share of the MPI tasks
+
+        The share is the MPI tasks divided by the largest number of JEDI applications,
+        including this one, that could run at the same time.
+        Since every application that may run concurrently with this one gets at most the
+        same share, the applications running together never use more than the MPI tasks of the job.
+        The command is the MPI command of the application, with its number of tasks replaced
+        and the option sharing the allocation added.
+        None is returned when steps run serially, to launch the application with its own command.
+        """
+        if self.max_concurrent == 1:
+            return None
+
+        width = 1
+        others = [nn for nn, step in self.steps.items()
+                  if isinstance(step.step, Jedi) and self._unrelated(name, nn)]
+        # graphs are small, find the largest set of mutually unrelated applications by brute force
+        for size in range(len(others), 0, -1):
+            if any(all(self._unrelated(aa, bb) for aa, bb in combinations(group, 2))
+                   for group in combinations(others, size)):
+                width = size + 1
+                break
+        width = min(width, self.max_concurrent or width)
+
+        mpi_cmd = self.steps[name].step.jedi_config.mpi_cmd
+        ntasks = max(1, self.ntasks // width)
+        mpi_cmd, nsubs = re.subn(r'(\s(?:-n|-np|--ntasks|--np))([\s=])\d+', rf'\g<1>\g<2>{ntasks}', f" {mpi_cmd}")
+        if nsubs == 0:
+            raise WorkflowException(f"FATAL ERROR: No number of tasks to replace in the MPI command of '{name}'")
+        return f"{mpi_cmd.strip()} {self.step_opt}".strip()
+
+    def _node_rundir(self, name: str, rundir: str) -> str:
+        """Create the private directory of a JEDI application run as a step
+
+        The directory is created next to the run directory, so that paths relative to the
+        run directory pointing to its siblings (e.g. ../ensdata) still resolve.
+        """
+        rundir = os.path.normpath(rundir)
+        node_dir = f"{rundir}.{NODE_SUFFIX}.{name}"
+        shutil.rmtree(node_dir, ignore_errors=True)
+        mkdir_p(node_dir)
+
+        # shared entries, and empty directories in place of the others
+        for entry in os.listdir(rundir):
+            src, dst = os.path.join(rundir, entry), os.path.join(node_dir, entry)
+            if entry in self.shared:
+                os.symlink(src, dst)
+            elif os.path.isdir(src):
+                mkdir_p(dst)
+
+        # declared inputs
+        for pattern in self.steps[name].inputs:
+            for src in glob.glob(os.path.join(rundir, pattern)):
+                dst = os.path.join(node_dir, os.path.relpath(src, rundir))
+                if os.path.lexists(dst):
+                    continue
+                mkdir_p(os.path.dirname(dst))
+                os.symlink(src, dst)
+        return node_dir
+
+    def _collect(self, name: str, node_dir: str, rundir: str) -> None:
+        """Move the declared outputs of a step from its private directory to its run directory
+        """
+        for pattern in self.steps[name].outputs:
+            matches = glob.glob(os.path.join(node_dir, pattern))
+            if not matches:
+                raise WorkflowException(f"FATAL ERROR: Step '{name}' did not create '{pattern}'")
+            # links are shared entries or inputs, already in the run directory
+            for src in [mm for mm in matches if not os.path.islink(mm)]:
+                dst = os.path.join(rundir, os.path.relpath(src, node_dir))
+                mkdir_p(os.path.dirname(dst))
+                if os.path.isdir(dst) and not os.path.islink(dst):
+                    shutil.rmtree(dst)
+                shutil.move(src, dst)
+        shutil.rmtree(node_dir)
+
+    def _run(self, name: str) -> None:
+        """Run a single step
+        """
+        step = self.steps[name].step
+        logger.info(f"Starting step '{name}'")
+        if isinstance(step, Jedi) and self.max_concurrent != 1:
+            rundir = step.jedi_config.rundir
+            node_dir = self._node_rundir(name, rundir)
+            step.execute(mpi_cmd=self._mpi_cmd(name), cwd=node_dir)
+            self._collect(name, node_dir, rundir)
+        elif isinstance(step, Jedi):
+            step.execute()
+        else:
+            step()
+        logger.info(f"Completed step '{name}'")
+
+    @logit(logger)
+    def execute(self) -> None:
+        """Execute all steps, running each as soon as the steps it depends on have completed
+
+        Returns
+        ----------
+        None
+        """
+        deps = self.dependencies()
+        pending = dict(deps)
+        done = set()
+        running = {}
+        max_workers = self.max_concurrent or max(len(self.steps), 1)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                # steps are started in the order they were added
+                for name in [nn for nn in pending if set(pending[nn]) <= done]:
+                    if len(running) >= max_workers:
+                        break
+                    del pending[name]
+                    running[executor.submit(self._run, name)] = name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        logger.error(f"FATAL ERROR: Step '{name}' failed, waiting for running steps to finish")
+                        wait(running)
+                        raise
+                    done.add(name)
@@ -17,10 +17,12 @@ from wxflow import (AttrDict,
                     YAMLFile, parse_j2yaml,
                     logit)
 from pygfs.jedi import Jedi
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class AerosolAnalysis(Task):
     """
     Class for JEDI-based global aerosol analysis tasks
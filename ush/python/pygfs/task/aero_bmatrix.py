@@ -8,10 +8,12 @@ from wxflow import (AttrDict, FileHandler,
                     add_to_datetime, to_timedelta,
                     parse_j2yaml, logit, Task)
 from pygfs.jedi import Jedi
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class AerosolBMatrix(Task):
     """
     Class for global aerosol BMatrix tasks
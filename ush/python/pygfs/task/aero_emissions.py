@@ -14,10 +14,12 @@ from wxflow import (AttrDict,
                     add_to_datetime, to_timedelta,
                     WorkflowException,
                     Executable, which)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class AerosolEmissions(Task):
     """Aerosol Emissions pre-processing Task
     """
@@ -3,20 +3,24 @@
 import os
 import glob
 import gzip
+import io
 import tarfile
 import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from logging import getLogger
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Tuple, Union
 
 from wxflow import (AttrDict, FileHandler, rm_p, rmdir,
                     Task, add_to_datetime, to_timedelta, to_datetime,
                     datetime_to_YMD,
                     chdir, Executable, WorkflowException,
                     parse_j2yaml, save_as_yaml, logit)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class AerosolObsPrep(Task):
     """
     Class for preparing and managing aerosol observations
@@ -51,25 +55,76 @@ class AerosolObsPrep(Task):
         Generate corresponding YAML file.
         Run IODA converter.
         """
+        self._prep_obs_dir()
+        self.link_obsconvexe()
+
+        self.task_config.prepaero_yaml = []
+        for sensor in self.task_config.sensors:
+            self.task_config.prepaero_yaml.append(self.prep_sensor(sensor))
+
+    @logit(logger)
+    def runPipeline(self) -> None:
+        """
+        Stage the raw obs and run the IODA converter with the sensors pipelined.
+        The raw obs of a sensor are listed, copied and its converter YAML rendered while
+        the converter runs on the previous sensors.  Up to PREPOBSAERO_NCONVERTERS converters
+        run concurrently, each on one of the `ntasks` tasks of the job.
+        """
+        self._prep_obs_dir()
+        self.link_obsconvexe()
+        chdir(self.task_config.DATA)
+
+        nslots = max(1, min(int(self.task_config.get('PREPOBSAERO_NCONVERTERS', 1)),
+                            int(self.task_config.get('ntasks', 1))))
+        logger.info(f"Pipelining {len(self.task_config.sensors)} sensors with up to {nslots} concurrent converters")
+
+        self.task_config.prepaero_yaml = []
+        with ThreadPoolExecutor(max_workers=nslots) as executor:
+            futures = []
+            for sensor in self.task_config.sensors:
+                prepaero_yaml = self.prep_sensor(sensor)
+                self.task_config.prepaero_yaml.append(prepaero_yaml)
+                futures.append(executor.submit(self._run_converter_yaml, prepaero_yaml))
+            # re-raise the first failure, if any
+            for future in futures:
+                future.result()
+
+    @logit(logger)
+    def _prep_obs_dir(self) -> None:
+        """
+        Create a clean $DATA/obs directory for the raw obs files.
+        """
         self.task_config.DATA_OBS = os.path.join(self.task_config.DATA, 'obs')
         if os.path.exists(self.task_config.DATA_OBS):
             rmdir(self.task_config.DATA_OBS)
         FileHandler({'mkdir': [self.task_config.DATA_OBS]}).sync()
 
-        self.task_config.prepaero_yaml = []
-        for sensor in self.task_config.sensors:
-            raw_files = self.list_raw_files(sensor)
-            self.task_config.input_files = self.copy_obs(raw_files)
-            self.link_obsconvexe()
-            self.task_config.prepaero_config = self.get_obsproc_config(sensor)
-
-            # generate converter YAML file
-            template = f"{self.task_config.RUN}.t{self.task_config['cyc']:02d}z.prepaero_viirs_{sensor}.yaml"
-            _prepaero_yaml = os.path.join(self.task_config.DATA, template)
-            self.task_config.prepaero_yaml.append(_prepaero_yaml)
-            logger.debug(f"Generate PrepAeroObs YAML file: {_prepaero_yaml}")
-            save_as_yaml(self.task_config.prepaero_config, _prepaero_yaml)
-            logger.info(f"Wrote PrepAeroObs YAML to: {_prepaero_yaml}")
+    @logit(logger)
+    def prep_sensor(self, sensor) -> str:
+        """
+        List and copy the raw obs files of a sensor to $DATA/obs and generate its converter YAML file.
+
+        Parameters
+        ----------
+        sensor : str
+            name of the sensor, e.g. npp, n20
+        Returns
+        ----------
+        prepaero_yaml : str
+            path to the rendered converter YAML file
+        """
+        raw_files = self.list_raw_files(sensor)
+        input_files = self.copy_obs(raw_files)
+        prepaero_config = self.get_obsproc_config(sensor, input_files)
+
+        # generate converter YAML file
+        template = f"{self.task_config.RUN}.t{self.task_config['cyc']:02d}z.prepaero_viirs_{sensor}.yaml"
+        prepaero_yaml = os.path.join(self.task_config.DATA, template)
+        logger.debug(f"Generate PrepAeroObs YAML file: {prepaero_yaml}")
+        save_as_yaml(prepaero_config, prepaero_yaml)
+        logger.info(f"Wrote PrepAeroObs YAML to: {prepaero_yaml}")
+
+        return prepaero_yaml
 
     @logit(logger)
     def list_raw_files(self, sensor) -> List[str]:
@@ -126,20 +181,27 @@ class AerosolObsPrep(Task):
         return destlist
 
     @logit(logger)
-    def get_obsproc_config(self, sensor) -> Dict[str, Any]:
+    def get_obsproc_config(self, sensor, input_files) -> Dict[str, Any]:
         """
         Compile a dictionary of obs proc configuration from OBSPROCYAML template file
         Parameters
         ----------
+        sensor : str
+            name of the sensor, e.g. npp, n20
+        input_files : List[str]
+            raw obs files of the sensor in $DATA/obs
         Returns
         ----------
         obsproc_config : Dict
             a dictionary containing the fully rendered obs proc yaml configuration
         """
-        self.task_config.sensor = sensor
+        # render with a copy of task_config, so that sensors can be prepared while converters run
+        sensor_config = AttrDict(**self.task_config)
+        sensor_config.sensor = sensor
+        sensor_config.input_files = input_files
         # generate JEDI YAML file
         logger.info(f"Generate gdas_obsprovider2ioda YAML config: {self.task_config.OBSPROCYAML}")
-        prepaero_config = parse_j2yaml(self.task_config.OBSPROCYAML, self.task_config)
+        prepaero_config = parse_j2yaml(self.task_config.OBSPROCYAML, sensor_config)
 
         return prepaero_config
 
@@ -170,21 +232,32 @@ class AerosolObsPrep(Task):
         Run the IODA converter gdas_obsprovider2ioda.x
         """
         chdir(self.task_config.DATA)
-        exec_cmd = Executable(self.task_config.APRUN_PREPOBSAERO)
-        exec_name = os.path.join(self.task_config.DATA, 'gdas_obsprovider2ioda.x')
-        exec_cmd.add_default_arg(exec_name)
-
         for prepaero_yaml in self.task_config.prepaero_yaml:
-            try:
-                logger.debug(f"Executing {exec_cmd} on {prepaero_yaml}")
-                exec_cmd(f"{prepaero_yaml}")
-            except OSError:
-                raise OSError(f"Failed to execute {exec_cmd} on {prepaero_yaml}")
-            except Exception:
-                raise WorkflowException(f"An error occured during execution of {exec_cmd} on {prepaero_yaml}")
+            self._run_converter_yaml(prepaero_yaml)
 
         pass
 
+    def _run_converter_yaml(self, prepaero_yaml: str) -> None:
+        """
+        Run the IODA converter gdas_obsprovider2ioda.x on a single YAML file.
+        When the job has several tasks, to run converters concurrently,
+        it is launched on a single task.
+        """
+        if int(self.task_config.get('ntasks', 1)) > 1:
+            exec_cmd = Executable(f"{self.task_config.launcher} -n 1")
+        else:
+            exec_cmd = Executable(self.task_config.APRUN_PREPOBSAERO)
+        exec_name = os.path.join(self.task_config.DATA, 'gdas_obsprovider2ioda.x')
+        exec_cmd.add_default_arg(exec_name)
+
+        try:
+            logger.debug(f"Executing {exec_cmd} on {prepaero_yaml}")
+            exec_cmd(f"{prepaero_yaml}")
+        except OSError:
+            raise OSError(f"Failed to execute {exec_cmd} on {prepaero_yaml}")
+        except Exception:
+            raise WorkflowException(f"An error occured during execution of {exec_cmd} on {prepaero_yaml}")
+
     @logit(logger)
     def finalize(self) -> None:
         """
@@ -202,30 +275,37 @@ class AerosolObsPrep(Task):
             copylist.append([src, dest])
         FileHandler({'copy': copylist}).sync()
 
-        # gzip the files first
-        for obsfile in obsfiles:
-            with open(obsfile, 'rb') as f_in, gzip.open(f"{obsfile}.gz", 'wb') as f_out:
-                f_out.writelines(f_in)
-
         aeroobs = os.path.join(self.task_config.COMOUT_OBS, f"{self.task_config['APREFIX']}aeroobs")
-        # open tar file for writing
-        with tarfile.open(aeroobs, "w") as archive:
-            for obsfile in obsfiles:
-                aeroobsgzip = f"{obsfile}.gz"
-                archive.add(aeroobsgzip, arcname=os.path.basename(aeroobsgzip))
         # get list of raw viirs L2 files
         rawfiles = glob.glob(os.path.join(self.task_config.DATA_OBS, 'JRR-AOD*'))
-        # gzip the raw L2 files first
-        for rawfile in rawfiles:
-            with open(rawfile, 'rb') as f_in, gzip.open(f"{rawfile}.gz", 'wb') as f_out:
-                f_out.writelines(f_in)
-
         aerorawobs = os.path.join(self.task_config.COMOUT_OBS, f"{self.task_config['APREFIX']}aerorawobs")
-        # open tar file for writing
-        with tarfile.open(aerorawobs, "w") as archive:
+
+        if self.task_config.get('PREPOBSAERO_PACK_MODE', 'serial') == 'stream':
+            nproc = int(self.task_config.get('PREPOBSAERO_PACK_NPROC', os.cpu_count() or 1))
+            logger.info(f"Stream gzipped obs into tarballs using {nproc} processes")
+            self.stream_gzip_tarball(obsfiles, aeroobs, nproc)
+            self.stream_gzip_tarball(rawfiles, aerorawobs, nproc)
+        else:
+            # gzip the files first
+            for obsfile in obsfiles:
+                with open(obsfile, 'rb') as f_in, gzip.open(f"{obsfile}.gz", 'wb') as f_out:
+                    f_out.writelines(f_in)
+
+            # open tar file for writing
+            with tarfile.open(aeroobs, "w") as archive:
+                for obsfile in obsfiles:
+                    aeroobsgzip = f"{obsfile}.gz"
+                    archive.add(aeroobsgzip, arcname=os.path.basename(aeroobsgzip))
+            # gzip the raw L2 files first
             for rawfile in rawfiles:
-                aerorawobsgzip = f"{rawfile}.gz"
-                archive.add(aerorawobsgzip, arcname=os.path.basename(aerorawobsgzip))
+                with open(rawfile, 'rb') as f_in, gzip.open(f"{rawfile}.gz", 'wb') as f_out:
+                    f_out.writelines(f_in)
+
+            # open tar file for writing
+            with tarfile.open(aerorawobs, "w") as archive:
+                for rawfile in rawfiles:
+                    aerorawobsgzip = f"{rawfile}.gz"
+                    archive.add(aerorawobsgzip, arcname=os.path.basename(aerorawobsgzip))
         copylist = []
         for prepaero_yaml in self.task_config.prepaero_yaml:
             basename = os.path.basename(prepaero_yaml)
@@ -234,3 +314,45 @@ class AerosolObsPrep(Task):
         FileHandler({'copy': copylist}).sync()
 
         pass
+
+    @staticmethod
+    @logit(logger)
+    def stream_gzip_tarball(infiles: List[str], tarball: str, nproc: int = 1) -> None:
+        """
+        Compress a list of files in a process pool and write each compressed
+        member directly into a tarball, without intermediate .gz files.
+        Each input file is read exactly once.
+
+        Parameters
+        ----------
+        infiles : List[str]
+            list of files to compress and archive
+        tarball : str
+            path of the tarball to create
+        nproc : int
+            number of compression processes
+        """
+        # bound the number of compressed members held in memory at once
+        chunk = max(1, nproc) * 4
+        with tarfile.open(tarball, "w") as archive, ProcessPoolExecutor(max_workers=max(1, nproc)) as pool:
+            for ii in range(0, len(infiles), chunk):
+                for arcname, mtime, data in pool.map(_gzip_file, infiles[ii:ii + chunk]):
+                    tarinfo = tarfile.TarInfo(name=arcname)
+                    tarinfo.size = len(data)
+                    tarinfo.mtime = mtime
+                    tarinfo.mode = 0o644
+                    archive.addfile(tarinfo, io.BytesIO(data))
+        logger.info(f"Wrote {len(infiles)} gzipped files to {tarball}")
+
+
+def _gzip_file(infile: str) -> Tuple[str, float, bytes]:
+    """
+    Read a file once and return its gzipped archive name, modification time and compressed content.
+    This is a module-level function so that it can be pickled into a process pool.
+    """
+    mtime = os.path.getmtime(infile)
+    basename = os.path.basename(infile)
+    buffer = io.BytesIO()
+    with open(infile, 'rb') as f_in, gzip.GzipFile(filename=basename, mode='wb', fileobj=buffer, mtime=mtime) as f_out:
+        f_out.writelines(f_in)
+    return f"{basename}.gz", mtime, buffer.getvalue()
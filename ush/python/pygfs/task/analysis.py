@@ -12,10 +12,12 @@ from jcb import render
 from wxflow import (parse_j2yaml, FileHandler, rm_p, logit,
                     Task, Executable, WorkflowException, to_fv3time, to_YMD,
                     Template, TemplateConstants)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class Analysis(Task):
     """Parent class for GDAS tasks
 
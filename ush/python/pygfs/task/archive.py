@@ -4,6 +4,7 @@ import glob
 import os
 import shutil
 import tarfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from logging import getLogger
 from typing import Any, Dict, List
 
@@ -12,9 +13,12 @@ from wxflow import (AttrDict, FileHandler, Hsi, Htar, Task, to_timedelta,
                     strftime, to_YMDH, which, chdir, ProcessError)
 
 git_filename = "git_info.log"
+from pygfs.utils import hpss_utils
+from pygfs.utils import timing_utils
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class Archive(Task):
     """Task to archive ROTDIR data to HPSS (or locally)
     """
@@ -97,8 +101,14 @@ class Archive(Task):
 
         if arch_dict.HPSSARCH:
             self.tar_cmd = "htar"
-            self.hsi = Hsi()
-            self.htar = Htar()
+            hpss_standin = self.task_config.get('ARCH_HPSS_STANDIN', '')
+            if hpss_standin:
+                logger.warning(f"WARNING: archiving to {hpss_standin} in place of HPSS")
+                self.hsi = hpss_utils.LocalHsi(hpss_standin)
+                self.htar = hpss_utils.LocalHtar(hpss_standin)
+            else:
+                self.hsi = Hsi()
+                self.htar = Htar()
             self.cvf = self.htar.cvf
             self.rm_cmd = self.hsi.rm
             self.chgrp_cmd = self.hsi.chgrp
@@ -176,6 +186,70 @@ class Archive(Task):
             logger.warning(f"WARNING: skipping would-be empty archive {atardir_set.target}.")
             return
 
+        self._create_backup(atardir_set)
+
+        if atardir_set.has_rstprod:
+            self._protect_rstprod(atardir_set)
+
+    @logit(logger)
+    def execute_backup_datasets(self, atardir_sets: List[Dict[str, Any]]) -> None:
+        """Create the backup tarballs of several yaml dicts, ARCH_NTHREADS_TAR at a time.
+
+        The largest tarballs are started first so that the longest htar sessions
+        do not start last.  Once all the tarballs are created, the restricted ones
+        are protected together, in a single hsi session when archiving to HPSS.
+
+        Parameters
+        ----------
+        atardir_sets: List[Dict[str, Any]]
+            Dicts defining sets of files to backup and the target tarballs.
+
+        Return
+        ------
+        None
+        """
+
+        nonempty_sets = []
+        for atardir_set in atardir_sets:
+            if len(atardir_set.fileset) == 0:
+                logger.warning(f"WARNING: skipping would-be empty archive {atardir_set.target}.")
+            else:
+                nonempty_sets.append(atardir_set)
+        if len(nonempty_sets) == 0:
+            return
+
+        nonempty_sets.sort(key=lambda atardir_set: Archive._fileset_size(atardir_set.fileset), reverse=True)
+        nthreads = max(1, min(int(self.task_config.get('ARCH_NTHREADS_TAR', 1)), len(nonempty_sets)))
+        logger.info(f"Creating {len(nonempty_sets)} archives, {nthreads} at a time")
+
+        failed = []
+        with ThreadPoolExecutor(max_workers=nthreads) as executor:
+            futures = {executor.submit(self._create_backup, atardir_set): atardir_set for atardir_set in nonempty_sets}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as ee:
+                    logger.error(f"ERROR: Failed to create archive {futures[future].target}: {ee}")
+                    failed.append(futures[future].target)
+
+        # Protect the restricted archives that were created, even if others failed
+        rstprod_targets = [atardir_set.target for atardir_set in nonempty_sets
+                           if atardir_set.has_rstprod and atardir_set.target not in failed]
+        if len(rstprod_targets) > 0:
+            self._protect_rstprod_targets(rstprod_targets)
+
+        if len(failed) > 0:
+            raise RuntimeError(f"FATAL ERROR: Failed to create the archives {', '.join(failed)}")
+
+    def _create_backup(self, atardir_set: Dict[str, Any]) -> None:
+        """Create the tarball of a yaml dict, deleting it if it is restricted and its creation failed.
+
+        Parameters
+        ----------
+        atardir_set: Dict[str, Any]
+            Dict defining set of files to backup and the target tarball.
+        """
+
         if atardir_set.has_rstprod:
 
             try:
@@ -185,11 +259,29 @@ class Archive(Task):
                 self.rm_cmd(atardir_set.target)
                 raise RuntimeError(f"FATAL ERROR: Failed to create restricted archive {atardir_set.target}, deleting!")
 
-            self._protect_rstprod(atardir_set)
-
         else:
             self.cvf(atardir_set.target, atardir_set.fileset)
 
+    @staticmethod
+    def _fileset_size(fileset: List) -> int:
+        """Return the total size in bytes of the files and directories of a fileset.
+
+        Parameters
+        ----------
+        fileset : List
+            List of files and directories
+        """
+
+        size = 0
+        for entry in fileset:
+            if os.path.isdir(entry):
+                for dirpath, _, filenames in os.walk(entry):
+                    size += sum(os.path.getsize(os.path.join(dirpath, filename)) for filename in filenames
+                                if os.path.isfile(os.path.join(dirpath, filename)))
+            elif os.path.isfile(entry):
+                size += os.path.getsize(entry)
+        return size
+
     @staticmethod
     @logit(logger)
     def _create_fileset(atardir_set: Dict[str, Any]) -> List:
@@ -286,6 +378,31 @@ class Archive(Task):
                 raise RuntimeError(f"FATAL ERROR: Failed to protect {atardir_set.target}!\n"
                                    f"Please verify that it has been deleted!!")
 
+    @logit(logger)
+    def _protect_rstprod_targets(self, targets: List[str]) -> None:
+        """
+        Changes the group of several tarballs to rstprod and their permissions to
+        640, in a single hsi session when archiving to HPSS.  If this fails for any
+        reason, attempt to delete the files before exiting.
+
+        """
+
+        try:
+            if self.tar_cmd == "htar":
+                hpss_utils.hsi_batch(self.hsi, [["chgrp", "rstprod", *targets], ["chmod", "640", *targets]])
+            else:
+                for target in targets:
+                    self.chgrp_cmd("rstprod", target)
+                    self.chmod_cmd(target, 0o640)
+        # Regardless of exception type, attempt to remove the targets
+        except Exception:
+            try:
+                for target in targets:
+                    self.rm_cmd(target)
+            finally:
+                raise RuntimeError(f"FATAL ERROR: Failed to protect {', '.join(targets)}!\n"
+                                   f"Please verify that they have been deleted!!")
+
     @staticmethod
     @logit(logger)
     def _create_tarball(target: str, fileset: List) -> None:
@@ -14,10 +14,12 @@ from wxflow import (AttrDict,
                     parse_j2yaml, save_as_yaml,
                     logit)
 from pygfs.jedi import Jedi
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class AtmAnalysis(Task):
     """
     Class for JEDI-based global atm analysis tasks
@@ -122,8 +124,9 @@ class AtmAnalysis(Task):
             FileHandler(bias_dict).sync()
             logger.debug(f"Bias correction files:\n{pformat(bias_dict)}")
 
-            # extract bias corrections
-            Jedi.extract_tar_from_filehandler_dict(bias_dict)
+            # extract the bias corrections of the observers
+            Jedi.extract_tar_from_filehandler_dict(bias_dict, members=self.jedi_dict['atmanlvar'].referenced_files(),
+                                                   max_workers=self.task_config.get('ATMANL_NTHREADS_EXTRACT', 1))
 
         # stage CRTM fix files
         logger.info(f"Staging CRTM fix files from {self.task_config.CRTM_FIX_YAML}")
@@ -19,10 +19,13 @@ from wxflow import (AttrDict,
                     WorkflowException,
                     Template, TemplateConstants)
 from pygfs.jedi import Jedi
+from pygfs.utils import transfer_utils
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class AtmEnsAnalysis(Task):
     """
     Class for JEDI-based global atmens analysis tasks
@@ -123,8 +126,9 @@ class AtmEnsAnalysis(Task):
         FileHandler(bias_dict).sync()
         logger.debug(f"Bias correction files:\n{pformat(bias_dict)}")
 
-        # extract bias corrections
-        Jedi.extract_tar_from_filehandler_dict(bias_dict)
+        # extract the bias corrections of the observers
+        Jedi.extract_tar_from_filehandler_dict(bias_dict, members=self.jedi_dict['atmensanlobs'].referenced_files(),
+                                               max_workers=self.task_config.get('ATMENSANL_NTHREADS_EXTRACT', 1))
 
         # stage CRTM fix files
         logger.info(f"Staging CRTM fix files from {self.task_config.CRTM_FIX_YAML}")
@@ -194,6 +198,7 @@ class AtmEnsAnalysis(Task):
         This includes:
         - tar output diag files and place in ROTDIR
         - copy the generated YAML file from initialize to the ROTDIR
+        - copy the member increments to the ROTDIR
 
         Parameters
         ----------
@@ -230,16 +235,12 @@ class AtmEnsAnalysis(Task):
         yamls = glob.glob(os.path.join(self.task_config.DATA, '*atmens*yaml'))
 
         # copy full YAML from executable to ROTDIR
+        yaml_copy = []
         for src in yamls:
-            logger.info(f"Copying {src} to {self.task_config.COM_ATMOS_ANALYSIS_ENS}")
             yaml_base = os.path.splitext(os.path.basename(src))[0]
             dest_yaml_name = f"{self.task_config.RUN}.t{self.task_config.cyc:02d}z.{yaml_base}.yaml"
             dest = os.path.join(self.task_config.COM_ATMOS_ANALYSIS_ENS, dest_yaml_name)
-            logger.debug(f"Copying {src} to {dest}")
-            yaml_copy = {
-                'copy': [[src, dest]]
-            }
-            FileHandler(yaml_copy).sync()
+            yaml_copy.append([src, dest])
 
         # create template dictionaries
         template_inc = self.task_config.COM_ATMOS_ANALYSIS_TMPL
@@ -251,11 +252,11 @@ class AtmEnsAnalysis(Task):
         }
 
         # copy FV3 atm increment to comrot directory
-        logger.info("Copy UFS model readable atm increment file")
         cdate = to_fv3time(self.task_config.current_cycle)
         cdate_inc = cdate.replace('.', '_')
 
         # loop over ensemble members
+        inc_copy = []
         for imem in range(1, self.task_config.NMEM_ENS + 1):
             memchar = f"mem{imem:03d}"
 
@@ -264,13 +265,14 @@ class AtmEnsAnalysis(Task):
             incdir = Template.substitute_structure(template_inc, TemplateConstants.DOLLAR_CURLY_BRACE, tmpl_inc_dict.get)
             src = os.path.join(self.task_config.DATA, 'anl', memchar, f"atminc.{cdate_inc}z.nc4")
             dest = os.path.join(incdir, f"{self.task_config.RUN}.t{self.task_config.cyc:02d}z.atminc.nc")
-
-            # copy increment
-            logger.debug(f"Copying {src} to {dest}")
-            inc_copy = {
-                'copy': [[src, dest]]
-            }
-            FileHandler(inc_copy).sync()
+            inc_copy.append([src, dest])
+
+        # publish the YAMLs and the member increments together, linking them when DATA and COM share a filesystem
+        logger.info(f"Copy {len(yaml_copy)} YAML files and {len(inc_copy)} UFS model readable atm increment files")
+        plan = transfer_utils.build_transfer_plan(yaml_copy, inc_copy)
+        transfer_utils.execute_transfer_plan(plan,
+                                             link=self.task_config.get('ATMENSANL_LINK_COM', False),
+                                             max_workers=self.task_config.get('ATMENSANL_NTHREADS_COPY', None))
 
     def clean(self):
         super().clean()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from wxflow import (AttrDict,
+                    FileHandler,
+                    Executable,
+                    logit,
+                    Task,
+                    to_YMD,
+                    WorkflowException,
+                    Template, TemplateConstants)
+from pygfs.utils import grib2_utils
+from pygfs.utils import timing_utils
+
+logger = getLogger(__name__.split('.')[-1])
+
+
+@timing_utils.instrument
+class AtmosEnsStat(Task):
+    """
+    Class for computing the ensemble mean and spread of the member pgrb2 files
+    """
+
+    PRODUCT_GRIDS = ['0p25', '0p50', '1p00']
+    # GRIB2 code table 4.7 (derived forecast) of each statistic
+    DERIVED_FCST_CODE = {'mean': 0, 'spread': 4}
+
+    @logit(logger, name="AtmosEnsStat")
+    def __init__(self, config: Dict[str, Any]) -> None:
+        """Constructor for the ensemble statistics task
+
+        Parameters
+        ----------
+        config : Dict[str, Any]
+            Incoming configuration for the task from the environment
+
+        Returns
+        -------
+        None
+        """
+        super().__init__(config)
+
+        # FHRLST lists the forecast hours of a group, e.g. f000_f003_f006
+        fhrlst = str(self.task_config.get('FHRLST', ''))
+        forecast_hours = [int(fhr) for fhr in re.findall(r'\d+', fhrlst)] or [int(self.task_config.FORECAST_HOUR)]
+
+        localdict = AttrDict(
+            {'forecast_hours': forecast_hours,
+             'product_grids': self.PRODUCT_GRIDS,
+             'nmembers': self.task_config.NMEM_ENS + 1,
+             # as navg_min of ensstat.x, fields need all but one member
+             'min_members': max(self.task_config.NMEM_ENS, 1),
+             'nthreads': int(self.task_config.get('ENSSTAT_NTHREADS', 1)),
+             'nfields_per_batch': int(self.task_config.get('ENSSTAT_NFIELDS_PER_BATCH', 8)),
+             'wgrib2': self.task_config.get('WGRIB2', 'wgrib2')}
+        )
+        self.task_config = AttrDict(**self.task_config, **localdict)
+
+    def _output_file(self, stat: str, grid: str, fhr: int) -> str:
+        """Name of the output file of a statistic
+        """
+        return f"{self.task_config.RUN}.t{self.task_config.cyc:02d}z.{stat}.pres_.{grid}.f{fhr:03d}.grib2"
+
+    @logit(logger)
+    def member_files(self, grid: str, fhr: int) -> List[str]:
+        """Return the pgrb2 files of all members for a grid and forecast hour
+
+        Parameters
+        ----------
+        grid : str
+            product grid, e.g. 0p25
+        fhr : int
+            forecast hour
+
+        Returns
+        ----------
+        member_files : List[str]
+            pgrb2 files of members 0 to NMEM_ENS
+        """
+        tmpl_dict = {
+            'ROTDIR': self.task_config.ROTDIR,
+            'RUN': self.task_config.RUN,
+            'YMD': to_YMD(self.task_config.current_cycle),
+            'HH': self.task_config.current_cycle.strftime('%H'),
+            'GRID': grid
+        }
+
+        member_files = []
+        for imem in range(self.task_config.nmembers):
+            tmpl_dict['MEMDIR'] = f"mem{imem:03d}"
+            comin = Template.substitute_structure(self.task_config.COM_ATMOS_GRIB_GRID_TMPL,
+                                                  TemplateConstants.DOLLAR_CURLY_BRACE, tmpl_dict.get)
+            memfile = os.path.join(comin, f"{self.task_config.RUN}.t{self.task_config.cyc:02d}z.pgrb2.{grid}.f{fhr:03d}")
+            # the index file is written last by atmos_products
+            if not os.access(f"{memfile}.idx", os.R_OK):
+                raise WorkflowException(f"FATAL ERROR: {memfile} does not exist")
+            member_files.append(memfile)
+
+        return member_files
+
+    @logit(logger)
+    def execute(self) -> None:
+        """Compute the ensemble mean and spread for all forecast hours and grids
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+        for fhr in self.task_config.forecast_hours:
+            for grid in self.task_config.product_grids:
+                self.ensstat(grid, fhr)
+
+    @logit(logger)
+    def ensstat(self, grid: str, fhr: int) -> None:
+        """Compute the ensemble mean and spread of a grid and forecast hour
+
+        Fields are matched across members by their inventory and processed in batches
+        of ENSSTAT_NFIELDS_PER_BATCH fields, ENSSTAT_NTHREADS batches at a time, so that
+        only the members of the fields being processed are held in memory.
+        The mean and spread files and their index files are written to DATA/<grid>.
+
+        Parameters
+        ----------
+        grid : str
+            product grid, e.g. 0p25
+        fhr : int
+            forecast hour
+
+        Returns
+        ----------
+        None
+        """
+        workdir = os.path.join(self.task_config.DATA, grid, f"f{fhr:03d}")
+        os.makedirs(workdir, exist_ok=True)
+
+        member_files = self.member_files(grid, fhr)
+        inventories = [grib2_utils.read_inventory(memfile, self.task_config.wgrib2) for memfile in member_files]
+        records = grib2_utils.match_records(inventories)
+
+        fields = [rr for rr in records if sum(rec is not None for rec in rr) >= self.task_config.min_members]
+        if len(fields) < len(records):
+            logger.warning(f"WARNING: Skipping {len(records) - len(fields)} fields found in fewer than "
+                           f"{self.task_config.min_members} members")
+        if not fields:
+            raise WorkflowException(f"FATAL ERROR: No fields to process in {member_files[0]}")
+
+        nfields = self.task_config.nfields_per_batch
+        batches = [fields[ii:ii + nfields] for ii in range(0, len(fields), nfields)]
+        logger.info(f"Processing {len(fields)} fields of {len(member_files)} members in {len(batches)} batches")
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.task_config.nthreads, len(batches)))) as executor:
+            futures = [executor.submit(self._ensstat_batch, member_files, batch, os.path.join(workdir, f"batch{ii:04d}"))
+                       for ii, batch in enumerate(batches)]
+            batch_outputs = [future.result() for future in futures]
+
+        # concatenate the batches in field order
+        outdir = os.path.join(self.task_config.DATA, grid)
+        for stat in self.DERIVED_FCST_CODE:
+            outfile = os.path.join(outdir, self._output_file(stat, grid, fhr))
+            with open(outfile, 'wb') as f_out:
+                for outputs in batch_outputs:
+                    with open(outputs[stat], 'rb') as f_in:
+                        shutil.copyfileobj(f_in, f_out)
+                    os.remove(outputs[stat])
+
+            Executable(self.task_config.wgrib2)('-s', outfile, output=f"{outfile}.idx")
+            logger.info(f"Created {outfile}")
+
+    def _ensstat_batch(self, member_files: List[str], batch: List[List[Optional[str]]], prefix: str) -> Dict[str, str]:
+        """Compute the mean and spread of a batch of fields
+
+        Parameters
+        ----------
+        member_files : List[str]
+            pgrb2 files of the members
+        batch : List[List[Optional[str]]]
+            inventory lines of each field in each member, None where a member does not have the field
+        prefix : str
+            path prefix of the files written for the batch
+
+        Returns
+        ----------
+        outputs : Dict[str, str]
+            GRIB2 file of each statistic
+        """
+        members = None
+        for imem, memfile in enumerate(member_files):
+            rows = [ii for ii, rr in enumerate(batch) if rr[imem] is not None]
+            if not rows:
+                continue
+            data = grib2_utils.decode(memfile, [batch[ii][imem] for ii in rows], f"{prefix}.mem{imem:03d}.bin",
+                                      wgrib2=self.task_config.wgrib2)
+            if members is None:
+                members = np.full((len(member_files), len(batch), data.shape[1]), np.nan, dtype=np.float32)
+            members[imem, rows] = data
+
+        stats = dict(zip(self.DERIVED_FCST_CODE, grib2_utils.ensemble_mean_spread(members, self.task_config.min_members)))
+        del members
+
+        # the control member messages are the templates of the outputs
+        templates = [rr[0] for rr in batch]
+        outputs = {}
+        for stat, code in self.DERIVED_FCST_CODE.items():
+            outputs[stat] = f"{prefix}.{stat}.grib2"
+            grib2_utils.encode(member_files[0], templates, stats[stat], outputs[stat],
+                               set_args=['-set_ensm_derived_fcst', str(code), str(self.task_config.nmembers)],
+                               wgrib2=self.task_config.wgrib2)
+        return outputs
+
+    @logit(logger)
+    def finalize(self) -> None:
+        """Copy the mean and spread files and their index files to COMOUT and send DBN alerts
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+        for fhr in self.task_config.forecast_hours:
+            for grid in self.task_config.product_grids:
+                comout = self.task_config[f"COMOUT_ATMOS_GRIB_{grid}"]
+                for stat in self.DERIVED_FCST_CODE:
+                    outfile = self._output_file(stat, grid, fhr)
+                    copy_list = [[os.path.join(self.task_config.DATA, grid, ff), os.path.join(comout, ff)]
+                                 for ff in (outfile, f"{outfile}.idx")]
+                    FileHandler({'mkdir': [comout], 'copy': copy_list}).sync()
+
+                    if self.task_config.get('SENDDBN', False):
+                        dbn_alert = Executable(os.path.join(self.task_config.DBNROOT, 'bin', 'dbn_alert'))
+                        for _, dest in copy_list:
+                            dbn_alert('MODEL', f"{self.task_config.RUN.upper()}_PGB2_{grid}", self.task_config.job, dest)
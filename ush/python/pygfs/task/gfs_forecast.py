@@ -4,10 +4,12 @@ from typing import Dict, Any
 
 from wxflow import logit, Task
 from pygfs.ufswm.gfs import GFS
+from pygfs.utils import timing_utils
 
 logger = logging.getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class GFSForecast(Task):
     """
     UFS-weather-model forecast task for the GFS
@@ -4,9 +4,9 @@ import copy
 import os
 from logging import getLogger
 import pygfs.utils.marine_da_utils as mdau
+from pygfs.utils import transfer_utils
 import glob
 import re
-import netCDF4
 from multiprocessing import Process
 import subprocess
 import yaml
@@ -21,6 +21,7 @@ from wxflow import (AttrDict,
                     Task,
                     save_as_yaml,
                     Template, TemplateConstants, YAMLFile)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
@@ -40,6 +41,7 @@ def parse_obs_list_file(obs_list_yaml_path):
     return obs_types
 
 
+@timing_utils.instrument
 class MarineAnalysis(Task):
     """
     Class for global marine analysis tasks
@@ -248,6 +250,9 @@ class MarineAnalysis(Task):
         var_yaml_jcb = 'var.yaml'
         mdau.clean_empty_obsspaces(jedi_config, target=var_yaml_jcb, app='var')
 
+        # record the obs space -> variable mapping of the diag files for the statistics
+        mdau.write_obs_space_manifest(jedi_config, os.path.join(self.task_config.DATA, 'diags'), app='var')
+
     def _prep_checkpoint(self: Task) -> None:
         """Create the yaml configuration to run the SOCA to MOM6 IAU increment
         """
@@ -337,7 +342,8 @@ class MarineAnalysis(Task):
            This method saves the results of the deterministic variational analysis to the COMROOT
         """
 
-        def list_all_files(dir_in, dir_out, wc='*', fh_list=[]):
+        def list_all_files(dir_in, dir_out, wc='*'):
+            fh_list = []
             files = glob.glob(os.path.join(dir_in, wc))
             for file_src in files:
                 file_dst = os.path.join(dir_out, os.path.basename(file_src))
@@ -407,22 +413,22 @@ class MarineAnalysis(Task):
         post_file_list.append([os.path.join(anl_dir, 'Data', f'{cice_rst_date}.cice_model.res.nc'),
                                os.path.join(com_ice_analysis, f'{cice_rst_date}.cice_model_anl.res.nc')])
 
-        FileHandler({'copy': post_file_list}).sync()
-
         # create COM sub-directories
         FileHandler({'mkdir': [os.path.join(com_ocean_analysis, 'diags'),
                                os.path.join(com_ocean_analysis, 'bump'),
                                os.path.join(com_ocean_analysis, 'yaml')]}).sync()
 
         # ioda output files
-        fh_list = list_all_files(os.path.join(anl_dir, 'diags'),
-                                 os.path.join(com_ocean_analysis, 'diags'))
+        diags_list = list_all_files(os.path.join(anl_dir, 'diags'),
+                                    os.path.join(com_ocean_analysis, 'diags'))
 
         # yaml configurations
-        fh_list = list_all_files(os.path.join(anl_dir),
-                                 os.path.join(com_ocean_analysis, 'yaml'), wc='*.yaml', fh_list=fh_list)
+        yaml_list = list_all_files(os.path.join(anl_dir),
+                                   os.path.join(com_ocean_analysis, 'yaml'), wc='*.yaml')
 
-        FileHandler({'copy': fh_list}).sync()
+        # single transfer plan, hard linked when DATA and COM share a filesystem
+        plan = transfer_utils.build_transfer_plan(post_file_list, diags_list, yaml_list)
+        transfer_utils.execute_transfer_plan(plan)
 
     @logit(logger)
     def obs_space_stats(self: Task) -> None:
@@ -453,6 +459,14 @@ class MarineAnalysis(Task):
         # get the experiment id
         pslot = self.task_config.PSLOT
 
+        # get the variable names from the manifest written with the variational configuration,
+        # reading the diag files only for those it does not have
+        diags_dir = os.path.join(self.task_config.COMOUT_OCEAN_ANALYSIS, 'diags')
+        variables = mdau.read_obs_space_manifest(diags_dir)
+        missing = [obsfile for obsfile in diags_list if os.path.basename(obsfile) not in variables]
+        if missing:
+            variables.update(mdau.get_obs_space_variables(missing))
+
         # iterate through the obs spaces and generate the yaml for gdassoca_obsstats.x
         obs_spaces = []
         for obsfile in diags_list:
@@ -461,9 +475,7 @@ class MarineAnalysis(Task):
             obs_space = re.sub(r'\.\d{10}\.nc4$', '', os.path.basename(obsfile))
 
             # get the variable name, assume 1 variable per file
-            nc = netCDF4.Dataset(obsfile, 'r')
-            variable = next(iter(nc.groups["ombg"].variables))
-            nc.close()
+            variable = variables[os.path.basename(obsfile)]
 
             # filling values for the templated yaml
             data = {'obs_space': os.path.basename(obsfile),
@@ -3,7 +3,9 @@
 import os
 import glob
 from logging import getLogger
+from typing import Dict
 import pygfs.utils.marine_da_utils as mdau
+from pygfs.utils import cache_utils
 
 from wxflow import (AttrDict,
                     FileHandler,
@@ -14,11 +16,13 @@ from wxflow import (AttrDict,
                     Executable,
                     Task)
 
-from pygfs.jedi import Jedi
+from pygfs.jedi import Jedi, JediDAG
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class MarineBMat(Task):
     """
     Class for global marine B-matrix tasks.
@@ -146,6 +150,12 @@ class MarineBMat(Task):
             os.remove(link_name)
         os.symlink(link_target, link_name)
 
+        # locate the cached static B-matrix products for this configuration
+        if self.task_config.get('MARINE_BMAT_CACHE_DIR', ''):
+            self.task_config.static_b_cache_entry = os.path.join(self.task_config.MARINE_BMAT_CACHE_DIR,
+                                                                 self._static_b_cache_key())
+            logger.info(f"Static B-matrix products are cached in {self.task_config.static_b_cache_entry}")
+
     @logit(logger)
     def execute(self) -> None:
         """Generate the full B-matrix
@@ -154,6 +164,13 @@ class MarineBMat(Task):
         This includes:
         - running all JEDI application and Python scripts required to generate the B-matrix
 
+        The grid and horizontal diffusion products are taken from the static B-matrix cache
+        when it has them for this configuration, and the applications creating them are skipped.
+        Once the variance partitioning has run, the horizontal diffusion, vertical diffusion
+        and ensemble branches are independent. With MARINE_BMAT_CONCURRENT set to YES they
+        run concurrently, sharing the MPI tasks of the job, each JEDI application in a private
+        directory with the files it reads and creates.
+
         Parameters
         ----------
         None
@@ -163,28 +180,143 @@ class MarineBMat(Task):
         None
         """
 
-        self.jedi_dict['gridgen'].execute()
+        window_end_iso = self.task_config.MARINE_WINDOW_END.strftime('%Y-%m-%dT%H:%M:%SZ')
+        window_middle_iso = self.task_config.MARINE_WINDOW_MIDDLE.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        # grid and horizontal diffusion products only depend on the static configuration
+        static_b_cached = self._restore_static_b()
+
+        # everything staged in DATA is only read by the applications, except the output directories
+        shared = sorted(set(os.listdir(self.task_config.DATA)) - {'staticb', 'RESTART'})
+        max_concurrent = None if self.task_config.get('MARINE_BMAT_CONCURRENT', False) else 1
+        dag = JediDAG(self.task_config.ntasks, max_concurrent=max_concurrent,
+                      step_opt=self.task_config.get('APRUN_MARINEBMAT_STEP_OPT', ''), shared=shared)
+
+        if not static_b_cached:
+            dag.add('gridgen', self.jedi_dict['gridgen'],
+                    outputs=['soca_gridspec.nc'])
 
         # variance partitioning
-        self.jedi_dict['soca_diagb'].execute()
+        bkgerr_stddev = [f"staticb/{comp}.bkgerr_stddev.incr.{window_end_iso}.nc" for comp in ('ocn', 'ice')]
+        dag.add('soca_diagb', self.jedi_dict['soca_diagb'],
+                inputs=['soca_gridspec.nc'], outputs=bkgerr_stddev)
 
         # horizontal diffusion
-        self.jedi_dict['soca_setcorscales'].execute()
-        self.jedi_dict['soca_parameters_diffusion_hz'].execute()
+        if not static_b_cached:
+            dag.add('soca_setcorscales', self.jedi_dict['soca_setcorscales'],
+                    inputs=['soca_gridspec.nc'] + bkgerr_stddev, outputs=['*.cor_r*.incr.*.nc'])
+            dag.add('soca_parameters_diffusion_hz', self.jedi_dict['soca_parameters_diffusion_hz'],
+                    inputs=['soca_gridspec.nc', '*.cor_r*.incr.*.nc'], outputs=['staticb/hz_*.nc'])
 
         # vertical diffusion
         exec_cmd = Executable("python")
         exec_name = os.path.join(self.task_config.DATA, 'calc_scales.x')
         exec_cmd.add_default_arg(exec_name)
         exec_cmd.add_default_arg('soca_vtscales.yaml')
-        mdau.run(exec_cmd)
+        dag.add('calc_scales', lambda: mdau.run(exec_cmd),
+                inputs=['soca_gridspec.nc'] + bkgerr_stddev, outputs=['vt_scales.nc'])
+        dag.add('soca_parameters_diffusion_vt', self.jedi_dict['soca_parameters_diffusion_vt'],
+                inputs=['soca_gridspec.nc', 'vt_scales.nc'], outputs=['staticb/vt_*.nc'])
 
-        self.jedi_dict['soca_parameters_diffusion_vt'].execute()
-
-        # hybrid EnVAR case
+        # hybrid EnVAR case, the rebalanced perturbations are written outside of DATA
         if self.task_config.DOHYBVAR_OCN == "YES" or self.task_config.NMEM_ENS >= 2:
-            self.jedi_dict['soca_ensb'].execute()
-            self.jedi_dict['soca_ensweights'].execute()
+            ens_stddev = ['ocn.*.incr.*.nc', 'ice.*.incr.*.nc']
+            dag.add('soca_ensb', self.jedi_dict['soca_ensb'],
+                    inputs=['soca_gridspec.nc'] + bkgerr_stddev, outputs=ens_stddev)
+            dag.add('soca_ensweights', self.jedi_dict['soca_ensweights'],
+                    inputs=['soca_gridspec.nc'] + ens_stddev,
+                    outputs=[f"{comp}.ens_weights.incr.{window_middle_iso}.nc" for comp in ('ocn', 'ice')])
+
+        dag.execute()
+
+        if not static_b_cached:
+            self._publish_static_b()
+
+    def _static_b_products(self) -> Dict[str, str]:
+        """Return the paths of the static B-matrix products, by file name
+        """
+        return {'soca_gridspec.nc': os.path.join(self.task_config.DATA, 'soca_gridspec.nc'),
+                'hz_ocean.nc': os.path.join(self.task_config.DATAstaticb, 'hz_ocean.nc')}
+
+    @logit(logger)
+    def _static_b_cache_key(self) -> str:
+        """Compute the cache key of the static B-matrix products
+
+        The key combines the rendered JEDI YAML of the applications creating the static
+        products, with the dates and prefix of the cycle and the run directories masked,
+        and the names, sizes and modification times of the SOCA fix files defining the grid.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        key: str
+            hexadecimal cache key
+        """
+        cycle_strings = [self.task_config.APREFIX]
+        for date in (self.task_config.MARINE_WINDOW_BEGIN, self.task_config.MARINE_WINDOW_MIDDLE,
+                     self.task_config.MARINE_WINDOW_END):
+            cycle_strings += [date.strftime(fmt) for fmt in ('%Y-%m-%dT%H:%M:%SZ', '%Y%m%d.%H%M%S', '%Y%m%d%H')]
+        # DATA is ${DATAjob}/${jobid}, the job ID changes with every run
+        run_strings = [str(self.task_config.get(key, '')) for key in ('DATA', 'DATAjob', 'jobid')]
+
+        configs = {app: self.jedi_dict[app].jedi_config.input_config
+                   for app in ('gridgen', 'soca_setcorscales', 'soca_parameters_diffusion_hz')}
+        return cache_utils.config_key(configs, {'@CYCLE@': cycle_strings, '@RUNDIR@': run_strings},
+                                      fix_dir=self.task_config.SOCA_INPUT_FIX_DIR,
+                                      extra=[str(self.task_config.OCNRES)])
+
+    @logit(logger)
+    def _restore_static_b(self) -> bool:
+        """Link the cached static B-matrix products into the run directories
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        bool
+            True if all static products were restored from the cache
+        """
+        entry = self.task_config.get('static_b_cache_entry')
+        if entry is None:
+            return False
+        cached = {os.path.basename(ff): ff for ff in cache_utils.cache_lookup(entry)}
+        products = self._static_b_products()
+        if not set(products) <= set(cached):
+            logger.info(f"Static B-matrix products are not cached yet, they will be computed")
+            return False
+
+        for name, dest in products.items():
+            if os.path.lexists(dest):
+                os.remove(dest)
+            os.symlink(cached[name], dest)
+        logger.info(f"Linked static B-matrix products from {entry}")
+        return True
+
+    @logit(logger)
+    def _publish_static_b(self) -> None:
+        """Store the static B-matrix products in the cache
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        ----------
+        None
+        """
+        entry = self.task_config.get('static_b_cache_entry')
+        if entry is None:
+            return
+        try:
+            cache_utils.cache_publish(entry, list(self._static_b_products().values()))
+        except OSError as err:
+            # the cache is an optimization, failing to fill it is not fatal
+            logger.warning(f"WARNING: Unable to cache static B-matrix products in {entry}: {err}")
 
     @logit(logger)
     def finalize(self: Task) -> None:
@@ -2,6 +2,7 @@
 
 import f90nml
 import pygfs.utils.marine_da_utils as mdau
+from pygfs.utils import transfer_utils
 from logging import getLogger
 import os
 from pygfs.task.analysis import Analysis
@@ -13,10 +14,12 @@ from wxflow import (AttrDict,
                     parse_j2yaml,
                     to_timedelta,
                     to_YMDH)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class MarineLETKF(Analysis):
     """
     Class for global ocean and sea ice analysis LETKF task
@@ -115,20 +118,28 @@ class MarineLETKF(Analysis):
             obs_filename = f"{self.task_config.OPREFIX}{obs_name}.{to_YMDH(self.task_config.current_cycle)}.nc4"
             obs_files.append((obs_filename, ob))
 
-        obs_files_to_copy = []
+        # get the available obs from a single listing of COMIN_OBS
+        try:
+            available_obs = set(os.listdir(self.task_config.COMIN_OBS))
+        except FileNotFoundError:
+            logger.warning(f"WARNING: {self.task_config.COMIN_OBS} does not exist")
+            available_obs = set()
+
+        obs_files_to_stage = []
         obs_to_use = []
-        # copy obs from COMIN_OBS to DATA/obs
         for obs_file, ob in obs_files:
-            obs_src = os.path.join(self.task_config.COMIN_OBS, obs_file)
-            obs_dst = os.path.join(self.task_config.DATA, self.task_config.obs_dir, obs_file)
-            if os.path.exists(obs_src):
-                obs_files_to_copy.append([obs_src, obs_dst])
+            if obs_file in available_obs:
+                obs_src = os.path.join(self.task_config.COMIN_OBS, obs_file)
+                obs_dst = os.path.join(self.task_config.DATA, self.task_config.obs_dir, obs_file)
+                obs_files_to_stage.append((obs_src, obs_dst))
                 obs_to_use.append(ob)
             else:
                 logger.warning(f"{obs_file} is not available in {self.task_config.COMIN_OBS}")
 
-        # stage the desired obs files
-        FileHandler({'copy': obs_files_to_copy}).sync()
+        # stage the desired obs files; the LETKF only reads them, so hard link them
+        # when COMIN_OBS is on the same filesystem and copy them in parallel otherwise
+        link_obs = bool(self.task_config.get('MARINE_LETKF_LINK_OBS', True))
+        transfer_utils.execute_transfer_plan(obs_files_to_stage, link=link_obs)
 
         # make the letkf.yaml
         letkf_yaml = parse_j2yaml(self.task_config.MARINE_LETKF_YAML_TMPL, stageconf)
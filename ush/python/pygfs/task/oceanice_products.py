@@ -15,10 +15,12 @@ from wxflow import (AttrDict,
                     add_to_datetime, to_timedelta,
                     WorkflowException,
                     Executable)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class OceanIceProducts(Task):
     """Ocean Ice Products Task
     """
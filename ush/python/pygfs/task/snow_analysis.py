@@ -17,10 +17,12 @@ from wxflow import (AttrDict,
                     Executable,
                     WorkflowException)
 from pygfs.task.analysis import Analysis
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class SnowAnalysis(Analysis):
     """
     Class for global snow analysis tasks
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
+import glob
 import os
 from logging import getLogger
-from typing import Dict, List, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
 import netCDF4 as nc
 import numpy as np
 
@@ -16,10 +18,14 @@ from wxflow import (AttrDict,
                     Executable,
                     WorkflowException)
 from pygfs.task.analysis import Analysis
+from pygfs.utils import cache_utils
+from pygfs.utils.regrid_utils import ConservativeRemap, MISSING_VALUE
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class SnowEnsAnalysis(Analysis):
     """
     Class for global ensemble snow analysis tasks
@@ -101,6 +107,11 @@ class SnowEnsAnalysis(Analysis):
         """Create a modified land_frac file for use by fregrid
         to interpolate the snow background from det to ensres
 
+        The tiles are processed concurrently with up to SNOW_PREP_NPROC processes.
+        The land fractions identify the weight files and the fregrid remap files in the
+        persistent cache under SNOW_REMAP_CACHE_DIR, if that is set; cached weight files
+        are linked instead of being written again
+
         Parameters
         ----------
         self : Analysis
@@ -109,34 +120,45 @@ class SnowEnsAnalysis(Analysis):
 
         chdir(self.task_config.DATA)
 
-        # loop through tiles
+        weight_dir = os.path.join(self.task_config.DATA, 'orog', 'det')
+        tile_args = []
+        weight_files = []
         for tile in range(1, self.task_config.ntiles + 1):
-            # open the restart and get the vegetation type
-            rst = nc.Dataset(f"./bkg/det/{to_fv3time(self.task_config.bkg_time)}.sfc_data.tile{tile}.nc")
-            vtype = rst.variables['vtype'][:]
-            rst.close()
-            # open the oro data and get the land fraction
-            oro = nc.Dataset(f"./orog/det/{self.task_config.CASE}.mx{self.task_config.OCNRES}_oro_data.tile{tile}.nc")
-            land_frac = oro.variables['land_frac'][:]
-            oro.close()
-            # create an output file
-            ncfile = nc.Dataset(f"./orog/det/{self.task_config.CASE}.mx{self.task_config.OCNRES}_interp_weight.tile{tile}.nc", mode='w', format='NETCDF4')
-            case_int = int(self.task_config.CASE[1:])
-            lon = ncfile.createDimension('lon', case_int)
-            lat = ncfile.createDimension('lat', case_int)
-            lsm_frac_out = ncfile.createVariable('lsm_frac', np.float32, ('lon', 'lat'))
-            # set the land fraction to 0 on glaciers to not interpolate that snow
-            glacier = 15
-            land_frac[np.where(vtype[0, ...] == glacier)] = 0
-            lsm_frac_out[:] = land_frac
-            # write out and close the file
-            ncfile.close()
+            tile_args.append((os.path.join(self.task_config.DATA, 'bkg', 'det',
+                                           f"{to_fv3time(self.task_config.bkg_time)}.sfc_data.tile{tile}.nc"),
+                              os.path.join(weight_dir, f"{self.task_config.CASE}.mx{self.task_config.OCNRES}_oro_data.tile{tile}.nc")))
+            weight_files.append(os.path.join(weight_dir, f"{self.task_config.CASE}.mx{self.task_config.OCNRES}_interp_weight.tile{tile}.nc"))
+        land_fracs = self._map_tiles(_weight_tile_land_frac, tile_args)
+
+        weights_entry = None
+        remap_cache_dir = self.task_config.get('SNOW_REMAP_CACHE_DIR', '')
+        if remap_cache_dir:
+            key_parts = [self.task_config.CASE, self.task_config.CASE_ENS, self.task_config.OCNRES]
+            key_parts += [np.ascontiguousarray(land_frac).tobytes() for land_frac in land_fracs]
+            key = cache_utils.hash_key(*key_parts)
+            self.task_config.remap_cache_entry = os.path.join(remap_cache_dir, key)
+            logger.info(f"Remap files are cached in {self.task_config.remap_cache_entry}")
+            weights_entry = os.path.join(remap_cache_dir, f"{key}_weights")
+            if cache_utils.cache_restore(weights_entry, weight_dir, link=True):
+                return
+
+        self._map_tiles(_write_weight_tile, list(zip(weight_files, land_fracs)))
+
+        if weights_entry is not None:
+            try:
+                cache_utils.cache_publish(weights_entry, weight_files)
+            except OSError as err:
+                # the cache is an optimization, failing to fill it is not fatal
+                logger.warning(f"WARNING: Unable to cache weight files in {weights_entry}: {err}")
 
     @logit(logger)
     def genMask(self) -> None:
         """Create a mask for use by JEDI
         to mask out snow increments on non-LSM gridpoints
 
+        The tiles are processed concurrently with up to SNOW_PREP_NPROC processes,
+        and only the rows of slmsk containing glacier points are rewritten
+
         Parameters
         ----------
         self : Analysis
@@ -145,19 +167,34 @@ class SnowEnsAnalysis(Analysis):
 
         chdir(self.task_config.DATA)
 
-        # loop through tiles
-        for tile in range(1, self.task_config.ntiles + 1):
-            # open the restart and get the vegetation type
-            rst = nc.Dataset(f"./bkg/mem001/{to_fv3time(self.task_config.bkg_time)}.sfc_data.tile{tile}.nc", mode="r+")
-            vtype = rst.variables['vtype'][:]
-            slmsk = rst.variables['slmsk'][:]
-            # slmsk(Time, yaxis_1, xaxis_1)
-            # set the mask to 3 on glaciers
-            glacier = 15
-            slmsk[np.where(vtype == glacier)] = 3
-            # write out and close the file
-            rst.variables['slmsk'][:] = slmsk
-            rst.close()
+        tile_args = [(os.path.join(self.task_config.DATA, 'bkg', 'mem001',
+                                   f"{to_fv3time(self.task_config.bkg_time)}.sfc_data.tile{tile}.nc"),)
+                     for tile in range(1, self.task_config.ntiles + 1)]
+        npoints = self._map_tiles(_gen_mask_tile, tile_args)
+        logger.info(f"Masked {sum(npoints)} glacier points")
+
+    def _map_tiles(self, func: Callable, tile_args: List[Tuple]) -> List[Any]:
+        """Apply func to the arguments of each tile, concurrently if SNOW_PREP_NPROC > 1
+
+        Parameters
+        ----------
+        self : Analysis
+           Instance of the SnowEnsAnalysis object
+        func : Callable
+            module-level function processing one tile
+        tile_args : List[Tuple]
+            arguments of func for each tile
+
+        Returns
+        -------
+        List[Any]
+            results of func for each tile, in tile order
+        """
+        nproc = min(int(self.task_config.get('SNOW_PREP_NPROC', 1)), len(tile_args))
+        if nproc <= 1:
+            return [func(*args) for args in tile_args]
+        with ProcessPoolExecutor(max_workers=nproc) as executor:
+            return list(executor.map(func, *zip(*tile_args)))
 
     @logit(logger)
     def regridDetBkg(self) -> None:
@@ -172,6 +209,9 @@ class SnowEnsAnalysis(Analysis):
 
         chdir(self.task_config.DATA)
 
+        if self._regrid_in_process(f"./bkg/det", f"./bkg/det_ensres", f"{to_fv3time(self.task_config.bkg_time)}.sfc_data"):
+            return
+
         arg_list = [
             "--input_mosaic", f"./orog/det/{self.task_config.CASE}_mosaic.nc",
             "--input_dir", f"./bkg/det/",
@@ -188,6 +228,7 @@ class SnowEnsAnalysis(Analysis):
         fregrid_exe = os.path.join(self.task_config.DATA, 'fregrid.x')
         exec_cmd = Executable(fregrid_exe)
 
+        self._restore_remap()
         try:
             logger.debug(f"Executing {exec_cmd}")
             exec_cmd(*arg_list)
@@ -195,6 +236,7 @@ class SnowEnsAnalysis(Analysis):
             raise OSError(f"Failed to execute {exec_cmd}")
         except Exception:
             raise WorkflowException(f"An error occured during execution of {exec_cmd}")
+        self._publish_remap()
 
     @logit(logger)
     def regridDetInc(self) -> None:
@@ -209,6 +251,9 @@ class SnowEnsAnalysis(Analysis):
 
         chdir(self.task_config.DATA)
 
+        if self._regrid_in_process(f"./inc/det", f"./inc/det_ensres", f"snowinc.{to_fv3time(self.task_config.bkg_time)}.sfc_data"):
+            return
+
         arg_list = [
             "--input_mosaic", f"./orog/det/{self.task_config.CASE}_mosaic.nc",
             "--input_dir", f"./inc/det/",
@@ -225,6 +270,7 @@ class SnowEnsAnalysis(Analysis):
         fregrid_exe = os.path.join(self.task_config.DATA, 'fregrid.x')
         exec_cmd = Executable(fregrid_exe)
 
+        self._restore_remap()
         try:
             logger.debug(f"Executing {exec_cmd}")
             exec_cmd(*arg_list)
@@ -232,6 +278,126 @@ class SnowEnsAnalysis(Analysis):
             raise OSError(f"Failed to execute {exec_cmd}")
         except Exception:
             raise WorkflowException(f"An error occured during execution of {exec_cmd}")
+        self._publish_remap()
+
+    @logit(logger)
+    def _regrid_in_process(self, input_dir: str, output_dir: str, file_prefix: str) -> bool:
+        """Regrid snodl from det to ensres in-process with the fregrid
+        remap files, instead of running fregrid
+
+        The remap operator is built once and shared by regridDetBkg and regridDetInc.
+        Nothing is done if SNOW_REGRID_ENGINE is not 'python', or if no remap files
+        are available yet, in which case fregrid computes them.
+
+        Parameters
+        ----------
+        self : Analysis
+           Instance of the SnowEnsAnalysis object
+        input_dir : str
+            directory of the det input tiles
+        output_dir : str
+            directory to write the ensres output tiles to
+        file_prefix : str
+            file name of the tiles, without the .tile{n}.nc suffix
+
+        Returns
+        -------
+        bool
+            True if the field was regridded
+        """
+        if self.task_config.get('SNOW_REGRID_ENGINE', 'fregrid') != 'python':
+            return False
+
+        if getattr(self, '_remap', None) is None:
+            logger.warning("WARNING: SNOW_REGRID_ENGINE=python is experimental, it is not validated against fregrid yet")
+            self._restore_remap()
+            ntiles = self.task_config.ntiles
+            remap_files = [os.path.join(self.task_config.DATA, f"remap.tile{tile}.nc") for tile in range(1, ntiles + 1)]
+            if not all(os.path.isfile(ff) for ff in remap_files):
+                logger.info("Remap files are not available, regridding with fregrid")
+                return False
+            weights = []
+            for tile in range(1, ntiles + 1):
+                with nc.Dataset(f"./orog/det/{self.task_config.CASE}.mx{self.task_config.OCNRES}_interp_weight.tile{tile}.nc") as ncf:
+                    weights.append(ncf.variables['lsm_frac'][:])
+            res_det = int(self.task_config.CASE[1:])
+            res_ens = int(self.task_config.CASE_ENS[1:])
+            self._remap = ConservativeRemap.from_remap_files(remap_files,
+                                                             (ntiles, res_det, res_det),
+                                                             (ntiles, res_ens, res_ens),
+                                                             weights=weights)
+
+        snodl_in = []
+        for tile in range(1, self.task_config.ntiles + 1):
+            with nc.Dataset(os.path.join(input_dir, f"{file_prefix}.tile{tile}.nc")) as ncf:
+                var = ncf.variables['snodl']
+                snodl_in.append(var[0, ...] if var.ndim == 3 else var[:])
+                missing_value = getattr(var, 'missing_value', None)
+        snodl_out = self._remap.regrid(np.stack(snodl_in), missing_value=missing_value)
+
+        # mirror the layout of the input field in the output, as fregrid does
+        with nc.Dataset(os.path.join(input_dir, f"{file_prefix}.tile1.nc")) as src:
+            var_in = src.variables['snodl']
+            dims = var_in.dimensions
+            dtype = var_in.dtype
+            attrs = {key: var_in.getncattr(key) for key in var_in.ncattrs() if key not in ('_FillValue', 'missing_value')}
+            times = src.variables[dims[0]][:] if var_in.ndim == 3 and dims[0] in src.variables else None
+        os.makedirs(output_dir, exist_ok=True)
+        for tile in range(1, self.task_config.ntiles + 1):
+            with nc.Dataset(os.path.join(output_dir, f"{file_prefix}.tile{tile}.nc"), mode='w', format='NETCDF4') as dst:
+                for dim, size in zip(dims, (None,) * (len(dims) - 2) + snodl_out.shape[1:]):
+                    dst.createDimension(dim, size)
+                    if size is not None:
+                        axis = dst.createVariable(dim, np.float64, (dim,))
+                        axis[:] = np.arange(1, size + 1)
+                if times is not None:
+                    time_var = dst.createVariable(dims[0], np.float64, (dims[0],))
+                    time_var[:] = times
+                snodl = dst.createVariable('snodl', dtype, dims)
+                snodl.setncatts(attrs)
+                snodl.missing_value = MISSING_VALUE
+                snodl[:] = snodl_out[tile - 1] if len(dims) == 2 else snodl_out[tile - 1][np.newaxis, ...]
+
+        logger.info(f"Regridded snodl from {input_dir} to {output_dir}")
+        return True
+
+    @logit(logger)
+    def _restore_remap(self) -> None:
+        """Copy cached fregrid remap files into DATA, if the cache has them
+        and they have not already been computed in this run
+
+        Parameters
+        ----------
+        self : Analysis
+           Instance of the SnowEnsAnalysis object
+        """
+        entry = self.task_config.get('remap_cache_entry')
+        if entry is None or glob.glob(os.path.join(self.task_config.DATA, 'remap*')):
+            return
+        if not cache_utils.cache_restore(entry, self.task_config.DATA):
+            logger.info("No cached remap files found, fregrid will compute them")
+
+    @logit(logger)
+    def _publish_remap(self) -> None:
+        """Store the fregrid remap files in DATA in the persistent cache
+
+        Parameters
+        ----------
+        self : Analysis
+           Instance of the SnowEnsAnalysis object
+        """
+        entry = self.task_config.get('remap_cache_entry')
+        if entry is None or cache_utils.cache_lookup(entry):
+            return
+        remap_files = sorted(glob.glob(os.path.join(self.task_config.DATA, 'remap*')))
+        if not remap_files:
+            logger.warning("WARNING: fregrid did not write any remap files to cache")
+            return
+        try:
+            cache_utils.cache_publish(entry, remap_files)
+        except OSError as err:
+            # the cache is an optimization, failing to fill it is not fatal
+            logger.warning(f"WARNING: Unable to cache remap files in {entry}: {err}")
 
     @logit(logger)
     def recenterEns(self) -> None:
@@ -428,3 +594,48 @@ class SnowEnsAnalysis(Analysis):
             'copy': [],
         }
         return bias_dict
+
+
+# land surface vegetation type of glaciers
+GLACIER = 15
+
+
+def _weight_tile_land_frac(rst_file: str, oro_file: str) -> np.ndarray:
+    """Return the land fraction of one tile, set to 0 on glaciers to not interpolate that snow
+    """
+    # get the vegetation type and the land fraction
+    with nc.Dataset(rst_file) as rst:
+        vtype = rst.variables['vtype'][0, ...]
+    with nc.Dataset(oro_file) as oro:
+        land_frac = np.asarray(oro.variables['land_frac'][:], dtype=np.float32)
+    land_frac[vtype == GLACIER] = 0
+    return land_frac
+
+
+def _write_weight_tile(weight_file: str, land_frac: np.ndarray) -> None:
+    """Write the fregrid weight file of one tile
+    """
+    # fregrid reads the whole field of a tile at once, so store it as a single compressed chunk
+    with nc.Dataset(weight_file, mode='w', format='NETCDF4') as ncfile:
+        ncfile.createDimension('lon', land_frac.shape[0])
+        ncfile.createDimension('lat', land_frac.shape[1])
+        lsm_frac_out = ncfile.createVariable('lsm_frac', np.float32, ('lon', 'lat'),
+                                             zlib=True, complevel=1, shuffle=True,
+                                             chunksizes=land_frac.shape)
+        lsm_frac_out[:] = land_frac
+
+
+def _gen_mask_tile(rst_file: str) -> int:
+    """Set slmsk to 3 on the glacier points of one tile and return the number of points changed
+
+    Only the rows of slmsk(Time, yaxis_1, xaxis_1) containing changed points are written
+    """
+    with nc.Dataset(rst_file, mode='r+') as rst:
+        vtype = rst.variables['vtype'][:]
+        slmsk_var = rst.variables['slmsk']
+        slmsk = slmsk_var[:]
+        changed = np.ma.filled((vtype == GLACIER) & (slmsk != 3), False)
+        slmsk[changed] = 3
+        for time, row in sorted(set(zip(*np.nonzero(changed)[:2]))):
+            slmsk_var[time, row, :] = slmsk[time, row, :]
+    return int(np.count_nonzero(changed))
@@ -8,10 +8,12 @@ from typing import Any, Dict, List
 from wxflow import (AttrDict, FileHandler, Task, cast_strdict_as_dtypedict,
                     logit, parse_j2yaml, strftime, to_YMD,
                     add_to_datetime, to_timedelta, Template, TemplateConstants)
+from pygfs.utils import timing_utils
 
 logger = getLogger(__name__.split('.')[-1])
 
 
+@timing_utils.instrument
 class Stage(Task):
     """Task to stage initial conditions
     """
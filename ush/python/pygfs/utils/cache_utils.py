@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from logging import getLogger
+from typing import Any, Dict, List, Optional, Union
+
+from wxflow import logit
+
+logger = getLogger(__name__.split('.')[-1])
+
+
+def hash_key(*parts: Union[str, bytes]) -> str:
+    """
+    Return a hexadecimal digest identifying the given strings or bytes
+    """
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode())
+        # separator so that ('ab', 'c') and ('a', 'bc') differ
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def config_key(configs: Dict[str, Any], masks: Dict[str, List[str]],
+               fix_dir: Optional[str] = None, extra: Optional[List[str]] = None) -> str:
+    """
+    Return a hexadecimal digest identifying products created from rendered configurations
+
+    The configurations are serialized with the strings specific to a run (dates, run directories, ...)
+    replaced by their mask, so that runs of different cycles with the same configuration share the key.
+
+    Parameters
+    ----------
+    configs : Dict[str, Any]
+        rendered configurations, by name
+    masks : Dict[str, List[str]]
+        strings to replace by each mask; longer strings are replaced first, empty strings are ignored
+    fix_dir : str, optional
+        directory of the fix files the products depend on, by relative path, size and modification time
+    extra : List[str], optional
+        other strings identifying the products
+    """
+    replacements = sorted(((string, mask) for mask, strings in masks.items() for string in strings if string),
+                          key=lambda item: len(item[0]), reverse=True)
+
+    key_parts = list(extra or [])
+    for name, config in configs.items():
+        rendered = json.dumps(config, sort_keys=True, default=str)
+        for string, mask in replacements:
+            rendered = rendered.replace(string, mask)
+        key_parts += [name, rendered]
+
+    if fix_dir is not None:
+        for root, _, files in sorted(os.walk(fix_dir, followlinks=True)):
+            for ff in sorted(files):
+                stat = os.stat(os.path.join(root, ff))
+                key_parts.append(f"{os.path.relpath(os.path.join(root, ff), fix_dir)}:{stat.st_size}:{int(stat.st_mtime)}")
+
+    return hash_key(*key_parts)
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Return a hexadecimal digest of the content of a file
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def cache_lookup(entry: str) -> List[str]:
+    """
+    Return the sorted list of files in a cache entry, or an empty list if the entry does not exist
+
+    Parameters
+    ----------
+    entry : str
+        path to the cache entry directory
+    """
+    if not os.path.isdir(entry):
+        return []
+    return sorted(os.path.join(entry, ff) for ff in os.listdir(entry))
+
+
+@logit(logger)
+def cache_publish(entry: str, files: List[str]) -> None:
+    """
+    Atomically publish files into a cache entry.
+    The files are copied into a temporary directory next to the entry that is then renamed,
+    so concurrent jobs see either a complete entry or no entry.
+    If another job published the entry first, its entry is kept.
+
+    Parameters
+    ----------
+    entry : str
+        path to the cache entry directory
+    files : List[str]
+        files to store in the entry, under their basename
+    """
+    if os.path.isdir(entry):
+        logger.info(f"Cache entry {entry} already exists")
+        return
+
+    cache_root = os.path.dirname(entry)
+    os.makedirs(cache_root, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(prefix=f".{os.path.basename(entry)}.", dir=cache_root)
+    try:
+        for src in files:
+            shutil.copy2(src, os.path.join(tmpdir, os.path.basename(src)))
+        os.chmod(tmpdir, 0o755)
+        os.rename(tmpdir, entry)
+        logger.info(f"Published {len(files)} files to cache entry {entry}")
+    except OSError:
+        # another job published the same entry first
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        if not os.path.isdir(entry):
+            raise
+        logger.info(f"Cache entry {entry} was published concurrently")
+
+
+@logit(logger)
+def cache_restore(entry: str, dest_dir: str, link: bool = False) -> List[str]:
+    """
+    Place the files of a cache entry into a directory
+
+    Parameters
+    ----------
+    entry : str
+        path to the cache entry directory
+    dest_dir : str
+        directory to place the files into, under their basename
+    link : bool
+        symlink the files instead of copying them
+
+    Returns
+    -------
+    files : List[str]
+        the restored files, empty if the entry does not exist
+    """
+    restored = []
+    for src in cache_lookup(entry):
+        dest = os.path.join(dest_dir, os.path.basename(src))
+        if os.path.lexists(dest):
+            os.remove(dest)
+        if link:
+            os.symlink(src, dest)
+        else:
+            shutil.copy2(src, dest)
+        restored.append(dest)
+    if restored:
+        logger.info(f"Restored {len(restored)} files from cache entry {entry}")
+    return restored
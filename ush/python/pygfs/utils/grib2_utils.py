@@ -0,0 +1,185 @@
+import os
+from collections import Counter
+from logging import getLogger
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from wxflow import Executable, WorkflowException
+
+logger = getLogger(__name__.split('.')[-1])
+
+# value wgrib2 uses for undefined (bitmap masked) grid points
+UNDEFINED = np.float32(9.999e20)
+
+
+def read_inventory(grib_file: str, wgrib2: str = 'wgrib2') -> List[str]:
+    """
+    Return the short inventory (wgrib2 -s) of a GRIB2 file,
+    read from the index file next to it when there is one
+
+    Parameters
+    ----------
+    grib_file : str
+        path to the GRIB2 file
+    wgrib2 : str
+        wgrib2 command, used when there is no index file
+
+    Returns
+    -------
+    inventory : List[str]
+        one line per message, e.g. "1:0:d=2021032312:HGT:1000 mb:6 hour fcst:ENS=+1"
+    """
+    if os.path.isfile(f"{grib_file}.idx"):
+        with open(f"{grib_file}.idx") as fh:
+            return [line.rstrip('\n') for line in fh if line.strip()]
+
+    cmd = Executable(wgrib2)
+    return [line for line in cmd('-s', grib_file, output=str).splitlines() if line.strip()]
+
+
+def record_key(line: str) -> str:
+    """
+    Return the part of an inventory line that identifies a field across ensemble members:
+    the date, variable, level and forecast time, without the message number,
+    the byte offset and the ensemble member description (ENS=...)
+    """
+    return ':'.join(item for item in line.split(':')[2:] if item and not item.startswith('ENS='))
+
+
+def match_records(inventories: Sequence[List[str]]) -> List[List[Optional[str]]]:
+    """
+    Match the messages of several GRIB2 files field by field
+
+    Fields are in the order of the first inventory; fields missing from the first
+    inventory are ignored. A field repeated within a file is matched by occurrence.
+
+    Parameters
+    ----------
+    inventories : Sequence[List[str]]
+        short inventories of the files
+
+    Returns
+    -------
+    records : List[List[Optional[str]]]
+        for each field, the inventory line of the field in each file, None where a file does not have it
+    """
+    def keyed(inventory):
+        seen = Counter()
+        keys = {}
+        for line in inventory:
+            key = record_key(line)
+            keys[(key, seen[key])] = line
+            seen[key] += 1
+        return keys
+
+    keyed_inventories = [keyed(inventory) for inventory in inventories]
+    return [[keys.get(field) for keys in keyed_inventories] for field in keyed_inventories[0]]
+
+
+def decode(grib_file: str, records: List[str], bin_file: str, wgrib2: str = 'wgrib2') -> np.ndarray:
+    """
+    Decode messages of a GRIB2 file
+
+    Parameters
+    ----------
+    grib_file : str
+        path to the GRIB2 file
+    records : List[str]
+        inventory lines of the messages to decode
+    bin_file : str
+        scratch file for the decoded values, removed afterwards
+    wgrib2 : str
+        wgrib2 command
+
+    Returns
+    -------
+    data : np.ndarray
+        float32 values of shape (len(records), npts), in the order of records,
+        UNDEFINED where the grid point is masked
+    """
+    inv_file = f"{bin_file}.inv"
+    with open(inv_file, 'w') as fh:
+        fh.write('\n'.join(records) + '\n')
+
+    try:
+        # with -i, wgrib2 seeks to the messages of the inventory read from stdin
+        cmd = Executable(wgrib2)
+        cmd(grib_file, '-i', '-no_header', '-bin', bin_file, input=inv_file, output=os.devnull)
+        data = np.fromfile(bin_file, dtype=np.float32)
+    finally:
+        for path in (inv_file, bin_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if data.size % len(records) != 0:
+        raise WorkflowException(f"FATAL ERROR: Decoded {data.size} values from {len(records)} messages of {grib_file}")
+    return data.reshape(len(records), -1)
+
+
+def encode(template_file: str, records: List[str], data: np.ndarray, grib_out: str,
+           set_args: Sequence[str] = (), wgrib2: str = 'wgrib2') -> None:
+    """
+    Write new values into a copy of messages of a GRIB2 file,
+    keeping their metadata and packing
+
+    Parameters
+    ----------
+    template_file : str
+        path to the GRIB2 file with the template messages
+    records : List[str]
+        inventory lines of the template messages
+    data : np.ndarray
+        values of shape (len(records), npts), UNDEFINED where the grid point is masked
+    grib_out : str
+        path to the GRIB2 file to write
+    set_args : Sequence[str]
+        additional wgrib2 options applied to the messages before they are written, e.g. metadata changes
+    wgrib2 : str
+        wgrib2 command
+    """
+    bin_file = f"{grib_out}.bin"
+    inv_file = f"{grib_out}.inv"
+    np.ascontiguousarray(data, dtype=np.float32).tofile(bin_file)
+    with open(inv_file, 'w') as fh:
+        fh.write('\n'.join(records) + '\n')
+
+    try:
+        cmd = Executable(wgrib2)
+        cmd(template_file, '-i', '-no_header', '-import_bin', bin_file, *set_args,
+            '-set_grib_type', 'same', '-grib_out', grib_out, input=inv_file, output=os.devnull)
+    finally:
+        for path in (inv_file, bin_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def ensemble_mean_spread(members: np.ndarray, min_members: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the ensemble mean and spread (standard deviation about the mean,
+    normalized by the number of members minus one) of decoded fields
+
+    Parameters
+    ----------
+    members : np.ndarray
+        values of shape (nmembers, ...), NaN or UNDEFINED where a member has no value
+    min_members : int
+        minimum number of members with a value for a grid point to be defined
+
+    Returns
+    -------
+    mean, spread : np.ndarray
+        float32 arrays of shape members.shape[1:], UNDEFINED where fewer than min_members have a value
+    """
+    members = np.where(members == UNDEFINED, np.nan, members)
+    valid = np.isfinite(members)
+    count = valid.sum(axis=0)
+    defined = count >= max(min_members, 1)
+
+    values = np.where(valid, members, 0.).astype(np.float64)
+    mean = values.sum(axis=0) / np.maximum(count, 1)
+    sqdev = np.where(valid, values - mean, 0.)
+    spread = np.sqrt((sqdev * sqdev).sum(axis=0) / np.maximum(count - 1, 1))
+
+    return (np.where(defined, mean, UNDEFINED).astype(np.float32),
+            np.where(defined, spread, UNDEFINED).astype(np.float32))
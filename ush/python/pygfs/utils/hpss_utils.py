@@ -0,0 +1,136 @@
+import os
+import shlex
+import tarfile
+from logging import getLogger
+from typing import List, Union
+
+from wxflow import chgrp, mkdir_p, rm_p
+
+logger = getLogger(__name__.split('.')[-1])
+
+
+def hsi_batch(hsi, commands: List[List[str]]) -> str:
+    """
+    Run several hsi commands in a single hsi session
+
+    Parameters
+    ----------
+    hsi : wxflow.Hsi | LocalHsi
+        hsi interface
+    commands : List[List[str]]
+        commands and their arguments, e.g. [['chgrp', 'rstprod', 'a.tar', 'b.tar'], ['chmod', '640', 'a.tar', 'b.tar']]
+
+    Returns
+    -------
+    output : str
+        concatenated output and error of the hsi session
+    """
+    # hsi reads the commands of its command line separated by semicolons
+    return hsi.exe(' ; '.join(shlex.join(command) for command in commands), output=str, error=str)
+
+
+class LocalHsi:
+    """
+    Stand-in for wxflow.Hsi that applies the commands to a local directory
+    holding the HPSS tree, to test archiving without HPSS
+    """
+
+    def __init__(self, root: str) -> None:
+        """
+        Parameters
+        ----------
+        root : str
+            local directory standing in for the root of HPSS
+        """
+        self.root = root
+
+    def path(self, target: str) -> str:
+        """
+        Return the local path of an HPSS path
+        """
+        return os.path.join(self.root, str(target).lstrip(os.sep))
+
+    def exe(self, *args, output=None, error=None, ignore_errors: list = []) -> str:
+        """
+        Run the commands of an hsi command line (chgrp, chmod, mkdir, rm), separated by semicolons,
+        as the hsi Executable of wxflow.Hsi does
+        """
+        output = []
+        for command in ' '.join(args).split(';'):
+            args = shlex.split(command)
+            if not args:
+                continue
+            cmd, args = args[0], [arg for arg in args[1:] if not arg.startswith('-')]
+            logger.info(f"LocalHsi: {cmd} {' '.join(args)}")
+            if cmd == 'chgrp':
+                for target in args[1:]:
+                    chgrp(args[0], self.path(target))
+            elif cmd == 'chmod':
+                for target in args[1:]:
+                    os.chmod(self.path(target), int(args[0], 8))
+            elif cmd == 'mkdir':
+                for target in args:
+                    mkdir_p(self.path(target))
+            elif cmd == 'rm':
+                for target in args:
+                    rm_p(self.path(target))
+            else:
+                raise NotImplementedError(f"LocalHsi does not implement hsi {cmd}")
+            output.append(command.strip())
+        return '\n'.join(output)
+
+    def chgrp(self, group_name: str, target: str, hsi_opts: str = "", chgrp_opts: str = "") -> str:
+        return self.exe('chgrp', group_name, target)
+
+    def chmod(self, mod: str, target: str, hsi_opts: str = "", chmod_opts: str = "") -> str:
+        return self.exe('chmod', mod, target)
+
+    def rm(self, target: str, recursive: bool = False, hsi_opts: str = "", rm_opts: str = "") -> str:
+        return self.exe('rm', target)
+
+    def mkdir(self, target: str, hsi_opts: str = "", mkdir_opts: str = "") -> str:
+        return self.exe('mkdir', target)
+
+    def exists(self, target: str) -> bool:
+        return os.path.exists(self.path(target))
+
+
+class LocalHtar:
+    """
+    Stand-in for wxflow.Htar that writes the tarballs and their index files
+    to a local directory holding the HPSS tree, to test archiving without HPSS
+    """
+
+    def __init__(self, root: str) -> None:
+        """
+        Parameters
+        ----------
+        root : str
+            local directory standing in for the root of HPSS
+        """
+        self.root = root
+
+    def cvf(self, tarball: str, fileset: Union[List, str], dereference: bool = False) -> str:
+        """
+        Write a tarball of the files and directories of a fileset, as htar -cvf -P does
+
+        Returns
+        -------
+        output : str
+            list of the members of the tarball
+        """
+        fileset = [fileset] if isinstance(fileset, str) else fileset
+        target = os.path.join(self.root, str(tarball).lstrip(os.sep))
+        mkdir_p(os.path.dirname(target))
+
+        with tarfile.open(target, 'w', dereference=dereference) as tar:
+            for filename in fileset:
+                tar.add(filename)
+            members = tar.getnames()
+
+        # htar writes an index of the members next to the tarball
+        with open(f"{target}.idx", 'w') as fh:
+            fh.write('\n'.join(members) + '\n')
+
+        logger.info(f"LocalHtar: created {target} with {len(members)} members")
+        return '\n'.join(members)
@@ -0,0 +1,86 @@
+import os
+import tarfile
+from logging import getLogger
+from typing import Any, Optional, Set
+
+from wxflow import logit
+
+logger = getLogger(__name__.split('.')[-1])
+
+
+def referenced_files(input_config: Any) -> Set[str]:
+    """Return the names of the files referenced by a rendered JEDI config
+
+    Every string of the rendered JEDI input config is considered as a possible
+    file path, e.g. the bias correction files of the observers.
+
+    Parameters
+    ----------
+    input_config
+        Rendered JEDI input config
+
+    Returns
+    ----------
+    filenames : Set[str]
+        Basenames of the strings of the JEDI input config
+    """
+
+    filenames = set()
+    items = [input_config]
+    while items:
+        item = items.pop()
+        if isinstance(item, dict):
+            items.extend(item.values())
+        elif isinstance(item, list):
+            items.extend(item)
+        elif isinstance(item, str):
+            filenames.add(os.path.basename(item))
+
+    return filenames
+
+
+@logit(logger)
+def extract_tar(tar_file: str, members: Optional[Set[str]] = None) -> None:
+    """Extract files from a tarball
+
+    This method extract files from a tarball
+
+    Parameters
+    ----------
+    tar_file
+        path/name of tarball
+    members (optional) : Set[str]
+        Basenames of the files to extract; all files by default.
+        If none of the files of the tarball are members, all files are extracted.
+
+    Returns
+    ----------
+    None
+    """
+
+    # extract files from tar file
+    tar_path = os.path.dirname(tar_file)
+    try:
+        with tarfile.open(tar_file, "r") as tarball:
+            tar_members = [member for member in tarball.getmembers()
+                           if members is None or os.path.basename(member.name) in members]
+            if len(tar_members) == 0:
+                # the names in the tarball do not follow the JEDI config, do not guess which are needed
+                logger.warning(f"WARNING: No files referenced by the JEDI config in {tar_file}, extracting all files")
+                tar_members = tarball.getmembers()
+            logger.info(f"Extract files from {tar_file}")
+            tarball.extractall(path=tar_path, members=tar_members)
+            logger.info(f"Extract {[member.name for member in tar_members]}")
+    except tarfile.FileExistsError as err:
+        logger.exception(f"FATAL ERROR: {tar_file} does not exist")
+        raise tarfile.FileExistsError(f"FATAL ERROR: {tar_file} does not exist")
+    except tarfile.ReadError as err:
+        if tarfile.is_tarfile(tar_file):
+            logger.error(f"FATAL ERROR: tar archive {tar_file} could not be read")
+            raise tarfile.ReadError(f"FATAL ERROR: tar archive {tar_file} could not be read")
+        else:
+            logger.error(f"FATAL ERROR: {tar_file} is not a tar archive")
+            raise tarfile.ReadError(f"FATAL ERROR: {tar_file} is not a tar archive")
+    except tarfile.ExtractError as err:
+        logger.exception(f"FATAL ERROR: unable to extract from {tar_file}")
+        raise tarfile.ExtractError("FATAL ERROR: unable to extract from {tar_file}")
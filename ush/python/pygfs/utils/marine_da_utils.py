@@ -1,8 +1,11 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 import dateutil.parser as dparser
 import os
 from netCDF4 import Dataset
 from logging import getLogger
+from typing import Dict, List, Tuple
 import yaml
 
 from wxflow import (FileHandler,
@@ -10,6 +13,7 @@ from wxflow import (FileHandler,
                     WorkflowException,
                     AttrDict,
                     parse_j2yaml,
+                    parse_yaml,
                     Executable,
                     save_as_yaml,
                     jinja)
@@ -76,6 +80,32 @@ def stage_ens_mem(task_config: AttrDict) -> None:
     FileHandler(letkf_stage_list).sync()
 
 
+@lru_cache(maxsize=None)
+def _parse_time_units(units: str) -> datetime:
+    """
+    Parse the reference date of a CF time units string, e.g. 'hours since 2021-03-21 00:00:00'.
+    Backgrounds of a window share the same units, so the parsed dates are cached.
+    """
+    return dparser.parse(units, fuzzy=True)
+
+
+def _read_time_metadata(histfile: str) -> Tuple[str, float]:
+    """
+    Read the units and first value of the time variable of a MOM6 file, and nothing else.
+    """
+    with Dataset(histfile, 'r') as ncf:
+        time = ncf.variables['time']
+        return time.units, float(time[0])
+
+
+def get_hist_date(histfile: str) -> datetime:
+    """
+    Return the valid date of a MOM6 history or restart file
+    """
+    units, time = _read_time_metadata(histfile)
+    return _parse_time_units(units) + timedelta(hours=int(time))
+
+
 @logit(logger)
 def test_hist_date(histfile: str, ref_date: datetime) -> None:
     """
@@ -83,15 +113,30 @@ def test_hist_date(histfile: str, ref_date: datetime) -> None:
     TODO: Implement the same for seaice
     """
 
-    ncf = Dataset(histfile, 'r')
-    hist_date = dparser.parse(ncf.variables['time'].units, fuzzy=True) + timedelta(hours=int(ncf.variables['time'][0]))
-    ncf.close()
+    hist_date = get_hist_date(histfile)
     logger.info(f"*** history file date: {hist_date} expected date: {ref_date}")
 
     if hist_date != ref_date:
         raise ValueError(f"FATAL ERROR: Inconsistent bkg date'")
 
 
+@logit(logger)
+def test_hist_dates(hist_dates: List[Tuple[str, datetime]]) -> None:
+    """
+    Check the dates of a batch of MOM6 history files, reading only their time metadata.
+
+    Parameters
+    ----------
+    hist_dates: List[Tuple[str, datetime]]
+        list of (history file, expected date)
+    """
+    for histfile, ref_date in hist_dates:
+        hist_date = get_hist_date(histfile)
+        logger.info(f"*** {histfile} date: {hist_date} expected date: {ref_date}")
+        if hist_date != ref_date:
+            raise ValueError(f"FATAL ERROR: Inconsistent bkg date for {histfile}")
+
+
 @logit(logger)
 def gen_bkg_list(bkg_path: str, window_begin=' ', yaml_name='bkg.yaml', ice_rst=False) -> None:
     """
@@ -113,15 +158,15 @@ def gen_bkg_list(bkg_path: str, window_begin=' ', yaml_name='bkg.yaml', ice_rst=
 
     # Identify the ocean background that will be used for the  vertical coordinate remapping
     ocn_filename_ic = './INPUT/MOM.res.nc'
-    test_hist_date(ocn_filename_ic, bkg_date)  # assert date of the history file is correct
+    hist_dates = [(ocn_filename_ic, bkg_date)]
 
     # Copy/process backgrounds and generate background yaml list
     bkg_list = []
     for bkg in files:
         logger.info(f"****************** bkg: {bkg}")
-        # assert validity of the ocean bkg date, remove basename
+        # expected ocean bkg date, remove basename
         bkg_date = bkg_date + timedelta(hours=dt_pseudo)
-        test_hist_date(bkg, bkg_date)
+        hist_dates.append((bkg, bkg_date))
         ocn_filename = os.path.splitext(os.path.basename(bkg))[0] + '.nc'
 
         # prepare the seaice background, aggregate if the backgrounds are CICE restarts
@@ -136,6 +181,9 @@ def gen_bkg_list(bkg_path: str, window_begin=' ', yaml_name='bkg.yaml', ice_rst=
 
         bkg_list.append(bkg_dict)
 
+    # assert validity of the dates of the initial condition and backgrounds in one batch
+    test_hist_dates(hist_dates)
+
     # save pseudo model yaml configuration
     save_as_yaml(bkg_list, yaml_name)
 
@@ -199,3 +247,78 @@ def get_mom6_levels(ocnres: str) -> int:
         raise KeyError("FATAL ERROR: Invalid ocnres value. Aborting.")
 
     return nlev
+
+
+def _read_ombg_variable(obsfile: str) -> str:
+    """
+    Return the name of the first variable of the ombg group of an IODA diag file.
+    Module-level so that it can be dispatched to a process pool.
+    """
+    with Dataset(obsfile, 'r') as nc:
+        return next(iter(nc.groups["ombg"].variables))
+
+
+def get_obs_space_variables(obsfiles: List[str], max_workers: int = None) -> Dict[str, str]:
+    """
+    Read the simulated variable of each IODA diag file, assuming 1 variable per file.
+    The headers are read concurrently.
+
+    Parameters
+    ----------
+    obsfiles: List[str]
+        list of IODA diag files
+    max_workers: int
+        maximum number of concurrent readers, defaults to the number of processors
+
+    Returns
+    -------
+    variables: Dict[str, str]
+        obs file basename -> variable name
+    """
+    if not obsfiles:
+        return {}
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(obsfiles))
+    logger.info(f"Reading the simulated variable of {len(obsfiles)} IODA diag files")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        variables = list(executor.map(_read_ombg_variable, obsfiles))
+
+    return {os.path.basename(obsfile): variable for obsfile, variable in zip(obsfiles, variables)}
+
+
+@logit(logger)
+def write_obs_space_manifest(config, diags_dir: str, manifest_name: str = 'obs_space_manifest.yaml', app='var') -> None:
+    """
+    Record the obs space -> variable mapping of the IODA diag files the application will write,
+    from its rendered configuration, so that downstream steps do not need to open the files.
+    The diag files are named by the obsdataout of each obs space, assuming 1 variable per file.
+    """
+
+    # obs space dictionary depth is dependent on the application
+    if app == 'var':
+        obs_spaces = config['cost function']['observations']['observers']
+    else:
+        raise ValueError(f"FATAL ERROR: obs space manifest not implemented for {app}")
+
+    manifest = {}
+    for obs_space in obs_spaces:
+        obsdataout = obs_space['obs space'].get('obsdataout')
+        if obsdataout is None:
+            continue
+        obsfile = os.path.basename(obsdataout['engine']['obsfile'])
+        manifest[obsfile] = obs_space['obs space']['simulated variables'][0]
+
+    save_as_yaml(manifest, os.path.join(diags_dir, manifest_name))
+    logger.info(f"Wrote obs space manifest with {len(manifest)} entries to {diags_dir}")
+
+
+def read_obs_space_manifest(diags_dir: str, manifest_name: str = 'obs_space_manifest.yaml') -> Dict[str, str]:
+    """
+    Read the obs space -> variable mapping written by write_obs_space_manifest.
+    Returns an empty dictionary if the manifest does not exist.
+    """
+    manifest = os.path.join(diags_dir, manifest_name)
+    if not os.path.isfile(manifest):
+        logger.info(f"No obs space manifest found in {diags_dir}")
+        return {}
+    return dict(parse_yaml(manifest))
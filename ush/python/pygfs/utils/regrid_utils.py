@@ -0,0 +1,130 @@
+from logging import getLogger
+from typing import List, Tuple
+
+import netCDF4 as nc
+import numpy as np
+
+from wxflow import logit, WorkflowException
+
+logger = getLogger(__name__.split('.')[-1])
+
+# value written by fregrid on output cells that receive no valid input
+MISSING_VALUE = -1.e20
+
+
+class ConservativeRemap:
+    """
+    First-order conservative regridding between cubed-sphere mosaics,
+    using the exchange grid written by fregrid to its remap files.
+
+    The exchange grid is held as a sparse operator in coordinate form:
+    each exchange cell maps one input cell (over all input tiles) to one
+    output cell (over all output tiles) with its area, optionally scaled
+    by a weight on the input grid as with the fregrid --weight_file option.
+    """
+
+    def __init__(self, rows: np.ndarray, cols: np.ndarray, areas: np.ndarray,
+                 in_shape: Tuple[int, int, int], out_shape: Tuple[int, int, int]) -> None:
+        """
+        Parameters
+        ----------
+        rows : np.ndarray
+            flat index of the output cell of each exchange cell
+        cols : np.ndarray
+            flat index of the input cell of each exchange cell
+        areas : np.ndarray
+            (weighted) area of each exchange cell
+        in_shape : Tuple[int, int, int]
+            (ntiles, ny, nx) of the input mosaic
+        out_shape : Tuple[int, int, int]
+            (ntiles, ny, nx) of the output mosaic
+        """
+        self.rows = rows
+        self.cols = cols
+        self.areas = areas
+        self.in_shape = tuple(in_shape)
+        self.out_shape = tuple(out_shape)
+
+    @classmethod
+    @logit(logger)
+    def from_remap_files(cls, remap_files: List[str],
+                         in_shape: Tuple[int, int, int], out_shape: Tuple[int, int, int],
+                         weights: List[np.ndarray] = None) -> 'ConservativeRemap':
+        """
+        Build the operator from fregrid conserve_order1 remap files
+
+        Parameters
+        ----------
+        remap_files : List[str]
+            remap files, one per output tile, in tile order
+        in_shape : Tuple[int, int, int]
+            (ntiles, ny, nx) of the input mosaic
+        out_shape : Tuple[int, int, int]
+            (ntiles, ny, nx) of the output mosaic
+        weights : List[np.ndarray]
+            optional weight on the input grid, one (ny, nx) array per input tile
+
+        Returns
+        -------
+        remap : ConservativeRemap
+        """
+        if len(remap_files) != out_shape[0]:
+            raise WorkflowException(f"FATAL ERROR: Expected {out_shape[0]} remap files, found {len(remap_files)}")
+
+        _, ny_in, nx_in = in_shape
+        _, ny_out, nx_out = out_shape
+        if weights is not None:
+            weights = np.concatenate([np.asarray(ww, dtype=np.float64).reshape(-1) for ww in weights])
+
+        rows, cols, areas = [], [], []
+        for tile_out, remap_file in enumerate(remap_files):
+            with nc.Dataset(remap_file) as ncf:
+                # fregrid writes one-based tile and (i, j) cell indices
+                tile_in = ncf.variables['tile1'][:].astype(np.int64) - 1
+                cell_in = ncf.variables['tile1_cell'][:].astype(np.int64) - 1
+                cell_out = ncf.variables['tile2_cell'][:].astype(np.int64) - 1
+                area = ncf.variables['xgrid_area'][:].astype(np.float64)
+            col = (tile_in * ny_in + cell_in[:, 1]) * nx_in + cell_in[:, 0]
+            if weights is not None:
+                area = area * weights[col]
+            rows.append((tile_out * ny_out + cell_out[:, 1]) * nx_out + cell_out[:, 0])
+            cols.append(col)
+            areas.append(area)
+
+        remap = cls(np.concatenate(rows), np.concatenate(cols), np.concatenate(areas), in_shape, out_shape)
+        logger.info(f"Built conservative remap operator with {remap.areas.size} exchange cells")
+        return remap
+
+    def regrid(self, field: np.ndarray, missing_value: float = None) -> np.ndarray:
+        """
+        Regrid a field from the input to the output mosaic
+
+        Parameters
+        ----------
+        field : np.ndarray
+            field of shape in_shape
+        missing_value : float
+            value of missing input cells, which are excluded;
+            NaN and masked cells are always excluded
+
+        Returns
+        -------
+        field_out : np.ndarray
+            field of shape out_shape, MISSING_VALUE where no valid input contributes
+        """
+        data = np.ma.filled(np.ma.asarray(field, dtype=np.float64), np.nan).reshape(-1)
+        if data.size != np.prod(self.in_shape):
+            raise WorkflowException(f"FATAL ERROR: Field of size {data.size} does not match input mosaic {self.in_shape}")
+        valid = np.isfinite(data)
+        if missing_value is not None:
+            valid &= data != missing_value
+
+        areas = self.areas * valid[self.cols]
+        nout = int(np.prod(self.out_shape))
+        out_area = np.bincount(self.rows, weights=areas, minlength=nout)
+        out_sum = np.bincount(self.rows, weights=areas * np.where(valid, data, 0.)[self.cols], minlength=nout)
+
+        field_out = np.full(nout, MISSING_VALUE)
+        has_area = out_area > 0.
+        field_out[has_area] = out_sum[has_area] / out_area[has_area]
+        return field_out.reshape(self.out_shape)
@@ -0,0 +1,255 @@
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional
+
+from wxflow import FileHandler
+
+logger = getLogger(__name__.split('.')[-1])
+
+# Timing is decided once, when the module is imported;
+# when it is off, instrument() returns the classes unchanged, phases cost nothing and enable() does nothing
+TIMING_ENABLED = os.environ.get('PYGFS_TIMING', 'NO').upper() in ('YES', 'TRUE', '1')
+
+_state = threading.local()
+_write_lock = threading.Lock()
+# FileHandler.sync before enable() wrapped it
+_file_handler_sync = None
+
+
+def _io_bytes() -> Dict[str, int]:
+    """
+    Return the bytes read and written by this process (/proc/self/io, Linux only)
+    """
+    counters = {}
+    try:
+        with open('/proc/self/io') as fh:
+            for line in fh:
+                key, _, value = line.partition(':')
+                counters[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return {'read_bytes': counters.get('rchar', 0), 'write_bytes': counters.get('wchar', 0)}
+
+
+def _snapshot() -> Dict[str, float]:
+    """
+    Return the resource counters of this process and its finished children
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    child = resource.getrusage(resource.RUSAGE_CHILDREN)
+    snapshot = {'wall': time.perf_counter(),
+                'cpu': usage.ru_utime + usage.ru_stime,
+                'child_cpu': child.ru_utime + child.ru_stime,
+                'max_rss_kb': usage.ru_maxrss,
+                'child_max_rss_kb': child.ru_maxrss,
+                # block I/O of the children (e.g. executables), in 512-byte blocks
+                'child_read_bytes': child.ru_inblock * 512,
+                'child_write_bytes': child.ru_oublock * 512}
+    snapshot.update(_io_bytes())
+    return snapshot
+
+
+def timing_file() -> str:
+    """
+    Return the JSON lines file of the timing records of this job:
+    $TIMING_DIR, or the log directory of the cycle, ${RUN}.${jobid}.timing.jsonl
+    """
+    timing_dir = os.environ.get('TIMING_DIR')
+    if not timing_dir:
+        timing_dir = os.path.join(os.environ.get('ROTDIR', os.getcwd()), 'logs',
+                                  f"{os.environ.get('PDY', '')}{os.environ.get('cyc', '')}")
+    jobid = os.environ.get('jobid', f"{os.environ.get('job', 'job')}.{os.getpid()}")
+    return os.path.join(timing_dir, f"{os.environ.get('RUN', '')}.{jobid}.timing.jsonl")
+
+
+def _write_record(record: Dict[str, Any]) -> None:
+    """
+    Append a record to the timing file of the job; failures to write are only logged
+    """
+    path = timing_file()
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a') as fh:
+                fh.write(json.dumps(record) + '\n')
+    except OSError as ee:
+        logger.warning(f"WARNING: Unable to write timing record to {path}: {ee}")
+
+
+@contextmanager
+def phase(name: str, **extra: Any):
+    """
+    Context manager recording the wall time, CPU time, peak RSS and I/O bytes of a phase
+
+    Phases may be nested; each record holds the inclusive counters of its phase and the name of
+    the enclosing phase. The peak RSS is the peak of the process so far, the RSS growth is how much
+    the phase raised it.
+
+    Parameters
+    ----------
+    name : str
+        name of the phase, e.g. AtmAnalysis.initialize
+    extra : Any
+        additional JSON serializable values to record
+    """
+    if not TIMING_ENABLED:
+        yield
+        return
+
+    stack = _state.__dict__.setdefault('stack', [])
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    start_time = time.time()
+    start = _snapshot()
+    status = 'error'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        end = _snapshot()
+        stack.pop()
+        record = {'job': os.environ.get('job', ''),
+                  'run': os.environ.get('RUN', ''),
+                  'cycle': f"{os.environ.get('PDY', '')}{os.environ.get('cyc', '')}",
+                  'member': os.environ.get('MEMDIR', ''),
+                  'fhr': os.environ.get('FHR3', ''),
+                  'pid': os.getpid(),
+                  'phase': name,
+                  'parent': parent,
+                  'depth': len(stack),
+                  'status': status,
+                  'start': round(start_time, 3),
+                  'wall_s': round(end['wall'] - start['wall'], 6),
+                  'cpu_s': round(end['cpu'] - start['cpu'], 6),
+                  'child_cpu_s': round(end['child_cpu'] - start['child_cpu'], 6),
+                  'max_rss_kb': max(end['max_rss_kb'], end['child_max_rss_kb']),
+                  'rss_growth_kb': end['max_rss_kb'] - start['max_rss_kb'],
+                  'read_bytes': end['read_bytes'] - start['read_bytes'],
+                  'write_bytes': end['write_bytes'] - start['write_bytes'],
+                  'child_read_bytes': end['child_read_bytes'] - start['child_read_bytes'],
+                  'child_write_bytes': end['child_write_bytes'] - start['child_write_bytes']}
+        record.update(extra)
+        _write_record(record)
+
+
+def timed(name: str, label: Optional[Callable[[Any], str]] = None) -> Callable:
+    """
+    Decorator recording each call of a function as a phase
+
+    Parameters
+    ----------
+    name : str
+        name of the phase
+    label : Callable
+        function of the first argument (e.g. self) returning a detail to record, e.g. a YAML name
+    """
+    def decorator(func):
+        if not TIMING_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            extra = {}
+            if label is not None and args:
+                try:
+                    extra['detail'] = str(label(args[0]))
+                except Exception:
+                    pass
+            with phase(name, **extra):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument(cls: type = None, *, methods: Optional[List[str]] = None,
+               label: Optional[Callable[[Any], str]] = None):
+    """
+    Class decorator recording the calls of the methods of a class as phases
+
+    By default the constructor and every public method defined in the class are instrumented,
+    including static and class methods. Inherited methods are recorded by the class defining them.
+    The first object of an instrumented class to be constructed also enables the recording
+    of the file operations.
+
+    Parameters
+    ----------
+    cls : type
+        class to instrument
+    methods : List[str]
+        names of the methods to instrument
+    label : Callable
+        function of the instance returning a detail to record with the instance methods
+    """
+    def decorate(cls):
+        if not TIMING_ENABLED:
+            return cls
+
+        for attr, value in list(vars(cls).items()):
+            if methods is not None:
+                if attr not in methods:
+                    continue
+            elif attr.startswith('_') and attr != '__init__':
+                continue
+
+            name = f"{cls.__name__}.{attr}"
+            if isinstance(value, staticmethod):
+                setattr(cls, attr, staticmethod(timed(name)(value.__func__)))
+            elif isinstance(value, classmethod):
+                setattr(cls, attr, classmethod(timed(name)(value.__func__)))
+            elif callable(value):
+                setattr(cls, attr, timed(name, label)(value))
+
+        # constructing an instrumented object also records the file operations
+        init = cls.__init__
+
+        @functools.wraps(init)
+        def __init__(self, *args, **kwargs):
+            enable()
+            init(self, *args, **kwargs)
+
+        cls.__init__ = __init__
+        return cls
+
+    return decorate if cls is None else decorate(cls)
+
+
+def _file_handler_extra(file_handler: FileHandler) -> Dict[str, int]:
+    """
+    Return the number of files and the bytes of the sources handled by a FileHandler
+    """
+    nfiles, nbytes = 0, 0
+    for action, files in (file_handler.config or {}).items():
+        if action == 'mkdir' or not files:
+            continue
+        for src, _ in files:
+            nfiles += 1
+            try:
+                nbytes += os.path.getsize(src)
+            except OSError:
+                pass
+    return {'nfiles': nfiles, 'nbytes': nbytes}
+
+
+def enable() -> None:
+    """
+    Record the calls of FileHandler.sync as phases, with the number of files and the source bytes
+
+    Called by the constructors of the instrumented classes; it does nothing unless PYGFS_TIMING is set.
+    """
+    global _file_handler_sync
+    if not TIMING_ENABLED or _file_handler_sync is not None:
+        return
+    _file_handler_sync = FileHandler.sync
+
+    @functools.wraps(_file_handler_sync)
+    def _timed_sync(self):
+        with phase('FileHandler.sync', **_file_handler_extra(self)):
+            return _file_handler_sync(self)
+
+    FileHandler.sync = _timed_sync
@@ -0,0 +1,158 @@
+import errno
+import fcntl
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import List, Tuple
+
+from wxflow import logit, WorkflowException
+
+logger = getLogger(__name__.split('.')[-1])
+
+# ioctl request to clone (reflink) a file on filesystems that support it (e.g. XFS, Btrfs)
+FICLONE = 0x40049409
+
+
+@logit(logger)
+def build_transfer_plan(*copy_lists: List[List[str]]) -> List[Tuple[str, str]]:
+    """
+    Combine lists of [src, dest] pairs into a single transfer plan.
+    Duplicate entries are dropped; a destination requested from two different sources is an error.
+
+    Parameters
+    ----------
+    copy_lists : List[List[str]]
+        lists of [src, dest] pairs, as given to FileHandler({'copy': ...})
+
+    Returns
+    -------
+    plan : List[Tuple[str, str]]
+        deduplicated list of (src, dest) pairs, in the order first requested
+    """
+    plan = {}
+    for copy_list in copy_lists:
+        for src, dest in copy_list:
+            dest = os.path.normpath(dest)
+            if dest in plan and plan[dest] != os.path.normpath(src):
+                raise WorkflowException(f"FATAL ERROR: {dest} is requested from both {plan[dest]} and {src}")
+            plan[dest] = os.path.normpath(src)
+
+    return [(src, dest) for dest, src in plan.items()]
+
+
+def _same_device(src: str, dest: str) -> bool:
+    """
+    Return True if src and the directory of dest are on the same device
+    """
+    return os.stat(src).st_dev == os.stat(os.path.dirname(dest) or '.').st_dev
+
+
+def _reflink(src: str, dest: str) -> None:
+    """
+    Clone src to dest with the FICLONE ioctl, raising OSError if the filesystem does not support it
+    """
+    with open(src, 'rb') as f_src, open(dest, 'wb') as f_dest:
+        try:
+            fcntl.ioctl(f_dest.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            f_dest.close()
+            os.remove(dest)
+            raise
+    shutil.copystat(src, dest)
+
+
+def transfer_file(src: str, dest: str, link: bool = True) -> str:
+    """
+    Place src at dest, replacing dest if it exists.
+    When link is True and src and dest share a device, a hard link is made,
+    or a reflink if hard links are not permitted; otherwise the file is copied.
+
+    Returns
+    -------
+    method : str
+        how the file was transferred: 'link', 'reflink' or 'copy'
+    """
+    if not os.path.isfile(src):
+        raise FileNotFoundError(f"Source file '{src}' does not exist")
+
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    if os.path.lexists(dest):
+        if os.path.isfile(dest) and os.path.samefile(src, dest):
+            return 'link'
+        os.remove(dest)
+
+    if link and _same_device(src, dest):
+        try:
+            os.link(src, dest)
+            return 'link'
+        except OSError as ee:
+            if ee.errno not in (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP):
+                raise
+        try:
+            _reflink(src, dest)
+            return 'reflink'
+        except OSError:
+            pass
+
+    shutil.copy2(src, dest)
+    return 'copy'
+
+
+@logit(logger)
+def execute_transfer_plan(plan: List[Tuple[str, str]], link: bool = True, max_workers: int = None) -> None:
+    """
+    Execute a transfer plan built with build_transfer_plan.
+    Files are hard linked or reflinked where possible, the remaining copies run concurrently.
+    The sizes of the transferred files are verified afterwards.
+
+    Parameters
+    ----------
+    plan : List[Tuple[str, str]]
+        list of (src, dest) pairs
+    link : bool
+        allow hard links and reflinks when src and dest share a device
+    max_workers : int
+        maximum number of concurrent transfers, defaults to the number of processors
+    """
+    if not plan:
+        logger.warning("WARNING: No files were included in the transfer plan")
+        return
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(plan))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(transfer_file, src, dest, link) for src, dest in plan]
+        methods = [future.result() for future in futures]
+
+    for (src, dest), method in zip(plan, methods):
+        logger.debug(f"Transferred ({method}) {src} to {dest}")
+    logger.info(f"Transferred {len(plan)} files: " +
+                ", ".join(f"{methods.count(mm)} {mm}" for mm in ('link', 'reflink', 'copy')))
+
+    verify_transfer_plan(plan)
+
+
+@logit(logger)
+def verify_transfer_plan(plan: List[Tuple[str, str]]) -> None:
+    """
+    Check that every destination of a transfer plan exists with the size of its source
+
+    Parameters
+    ----------
+    plan : List[Tuple[str, str]]
+        list of (src, dest) pairs
+
+    Raises
+    ------
+    WorkflowException
+        if a destination is missing or its size differs from its source
+    """
+    errors = []
+    for src, dest in plan:
+        if not os.path.isfile(dest):
+            errors.append(f"{dest} does not exist")
+        elif os.path.getsize(dest) != os.path.getsize(src):
+            errors.append(f"{dest} has {os.path.getsize(dest)} bytes, {src} has {os.path.getsize(src)} bytes")
+
+    if errors:
+        raise WorkflowException("FATAL ERROR: Transfer verification failed:\n" + "\n".join(errors))
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
+import copy
 import os
 import socket
+from functools import lru_cache
 from pathlib import Path
 
 from wxflow import YAMLFile
@@ -33,50 +35,81 @@ class Host:
 
     @classmethod
     def detect(cls):
+        """
+        Return the name of the host.
+        The result is memoized, so the filesystem is probed at most once per process.
+        Setting WORKFLOW_HOST in the environment skips the probing altogether.
+        """
+        return _detect_host()
 
-        machine = 'NOTFOUND'
-        container = os.getenv('SINGULARITY_NAME', None)
-        pw_csp = os.getenv('PW_CSP', None)
-
-        if os.path.exists('/scratch1/NCEPDEV'):
-            machine = 'HERA'
-        elif os.path.exists('/work/noaa'):
-            machine = socket.gethostname().split("-", 1)[0].upper()
-        elif os.path.exists('/lfs5/HFIP'):
-            machine = 'JET'
-        elif os.path.exists('/lfs/f1'):
-            machine = 'WCOSS2'
-        elif os.path.exists('/data/prod'):
-            machine = 'S4'
-        elif os.path.exists('/gpfs/f5'):
-            machine = 'GAEA'
-        elif container is not None:
-            machine = 'CONTAINER'
-        elif pw_csp is not None:
-            if pw_csp.lower() not in ['azure', 'aws', 'google']:
-                raise ValueError(
-                    f'NOAA cloud service provider "{pw_csp}" is not supported.')
-            machine = f"{pw_csp.upper()}PW"
+    @property
+    def _get_info(self) -> dict:
+        """
+        Return a copy of the host information, read once per process from the host YAML
+        """
+        return copy.deepcopy(_load_host_info(self.machine))
+
+
+@lru_cache(maxsize=None)
+def _detect_host() -> str:
+    """
+    Detect the host by probing its filesystems, unless WORKFLOW_HOST is set
+    """
 
+    machine = os.getenv('WORKFLOW_HOST', 'NOTFOUND').upper()
+    if machine != 'NOTFOUND':
         if machine not in Host.SUPPORTED_HOSTS:
-            raise NotImplementedError(f'This machine is not a supported host.\n' +
+            raise NotImplementedError(f'WORKFLOW_HOST="{machine}" is not a supported host.\n' +
                                       'Currently supported hosts are:\n' +
                                       f'{" | ".join(Host.SUPPORTED_HOSTS)}')
-
         return machine
 
-    @property
-    def _get_info(self) -> dict:
+    container = os.getenv('SINGULARITY_NAME', None)
+    pw_csp = os.getenv('PW_CSP', None)
+
+    if os.path.exists('/scratch1/NCEPDEV'):
+        machine = 'HERA'
+    elif os.path.exists('/work/noaa'):
+        machine = socket.gethostname().split("-", 1)[0].upper()
+    elif os.path.exists('/lfs5/HFIP'):
+        machine = 'JET'
+    elif os.path.exists('/lfs/f1'):
+        machine = 'WCOSS2'
+    elif os.path.exists('/data/prod'):
+        machine = 'S4'
+    elif os.path.exists('/gpfs/f5'):
+        machine = 'GAEA'
+    elif container is not None:
+        machine = 'CONTAINER'
+    elif pw_csp is not None:
+        if pw_csp.lower() not in ['azure', 'aws', 'google']:
+            raise ValueError(
+                f'NOAA cloud service provider "{pw_csp}" is not supported.')
+        machine = f"{pw_csp.upper()}PW"
+
+    if machine not in Host.SUPPORTED_HOSTS:
+        raise NotImplementedError(f'This machine is not a supported host.\n' +
+                                  'Currently supported hosts are:\n' +
+                                  f'{" | ".join(Host.SUPPORTED_HOSTS)}')
+
+    return machine
+
+
+@lru_cache(maxsize=None)
+def _load_host_info(machine: str) -> YAMLFile:
+    """
+    Read the host information from the host YAML
+    """
 
-        hostfile = Path(os.path.join(os.path.dirname(__file__),
-                        f'hosts/{self.machine.lower()}.yaml'))
-        try:
-            info = YAMLFile(path=hostfile)
-        except FileNotFoundError:
-            raise FileNotFoundError(f'{hostfile} does not exist!')
-        except IOError:
-            raise IOError(f'Unable to read from {hostfile}')
-        except Exception:
-            raise Exception(f'unable to get information for {self.machine}')
-
-        return info
+    hostfile = Path(os.path.join(os.path.dirname(__file__),
+                    f'hosts/{machine.lower()}.yaml'))
+    try:
+        info = YAMLFile(path=hostfile)
+    except FileNotFoundError:
+        raise FileNotFoundError(f'{hostfile} does not exist!')
+    except IOError:
+        raise IOError(f'Unable to read from {hostfile}')
+    except Exception:
+        raise Exception(f'unable to get information for {machine}')
+
+    return info
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+
+"""
+Cycle-level performance report of a global-workflow experiment
+
+Combines the jobs of the Rocoto database (run durations, tries and, where rocoto_viewer.py
+collected scheduler accounting, queue times) with the task dependencies of the Rocoto XML
+and the per-phase timing records of the python tasks (${ROTDIR}/logs/<cycle>/*.timing.jsonl)
+into an HTML report and CSV files with:
+    - the critical path of each cycle
+    - per-task runtime and queue time percentiles
+    - per-phase wall time percentiles
+    - regressions against a baseline (other cycles and/or another experiment)
+
+    perf_report.py EXPDIR --cycles 2024010100 2024010518 --output report
+    perf_report.py EXPDIR --cycles 2024010100 2024010518 --baseline OLD_EXPDIR --output report
+"""
+
+import csv
+import html
+import json
+import os
+import re
+import sqlite3
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from datetime import datetime, timezone
+from glob import glob
+from typing import Any, Dict, List, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+import numpy as np
+
+__all__ = ['Experiment', 'critical_path', 'task_stats', 'phase_stats', 'regressions']
+
+
+def task_group(taskname: str) -> str:
+    """
+    Return the name of a task with its member, forecast hour and segment numbers replaced by #,
+    e.g. gefs_atmos_prod_mem#_f# for gefs_atmos_prod_mem001_f006
+    """
+    return re.sub(r'_(mem|f|seg)\d+', r'_\1#', taskname)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    """
+    Return the count, median, 90th percentile and maximum of values
+    """
+    if not values:
+        return {'n': 0, 'p50': None, 'p90': None, 'max': None}
+    array = np.asarray(values, dtype=float)
+    return {'n': int(array.size),
+            'p50': round(float(np.percentile(array, 50)), 1),
+            'p90': round(float(np.percentile(array, 90)), 1),
+            'max': round(float(array.max()), 1)}
+
+
+def _to_seconds(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Experiment:
+    """
+    Jobs, dependencies and timing records of an experiment
+    """
+
+    def __init__(self, expdir: str) -> None:
+        self.expdir = os.path.abspath(expdir)
+        workflow_files = sorted(glob(os.path.join(self.expdir, '*.xml')))
+        database_files = sorted(ff for ff in glob(os.path.join(self.expdir, '*.db')) if not ff.endswith('_accounting.db'))
+        if not workflow_files or not database_files:
+            raise FileNotFoundError(f'{self.expdir} does not contain a Rocoto XML and database')
+        self.workflow_file = workflow_files[0]
+        self.database_file = database_files[0]
+        self.entities = self._entities(self.workflow_file)
+        self.dependencies = self._dependencies(self.workflow_file)
+
+    @staticmethod
+    def _entities(workflow_file: str) -> Dict[str, str]:
+        """
+        Return the ENTITY values declared in the DOCTYPE of the workflow
+        """
+        with open(workflow_file) as fh:
+            header = fh.read().split(']>')[0]
+        return dict(re.findall(r'<!ENTITY\s+(\w+)\s+"([^"]*)"\s*>', header))
+
+    @staticmethod
+    def _dependencies(workflow_file: str) -> Dict[str, Any]:
+        """
+        Return the dependency tree of each task within its cycle, with the metatasks expanded
+
+        A tree is ('and' | 'or', [subtrees]) or ('task', name); dependencies on other cycles,
+        data and time are dropped.
+        """
+        root = ET.parse(workflow_file).getroot()
+        metatasks = {}
+        raw = {}
+
+        def substitute(text, variables):
+            for name, value in variables.items():
+                text = text.replace(f'#{name}#', value)
+            return text
+
+        def expand(element, variables):
+            tasks = []
+            for child in element:
+                if child.tag == 'metatask':
+                    names = [var.attrib['name'] for var in child.findall('var')]
+                    values = [var.text.split() for var in child.findall('var')]
+                    members = []
+                    for ii in range(min(len(vv) for vv in values) if values else 0):
+                        members += expand(child, {**variables, **{nn: vv[ii] for nn, vv in zip(names, values)}})
+                    metatasks[substitute(child.attrib.get('name', ''), variables)] = members
+                    tasks += members
+                elif child.tag == 'task':
+                    name = substitute(child.attrib['name'], variables)
+                    raw[name] = (child.find('dependency'), dict(variables))
+                    tasks.append(name)
+            return tasks
+
+        def tree(element, variables):
+            if element.tag in ('taskdep', 'metataskdep'):
+                offset = element.attrib.get('cycle_offset', '')
+                if offset.strip('-+0:'):
+                    return None
+                if element.tag == 'taskdep':
+                    return ('task', substitute(element.attrib['task'], variables))
+                name = substitute(element.attrib['metatask'], variables)
+                return ('and', [('task', task) for task in metatasks.get(name, [])])
+            if element.tag in ('dependency', 'and', 'or', 'nand', 'nor'):
+                children = [tt for tt in (tree(child, variables) for child in element) if tt is not None]
+                if not children:
+                    return None
+                return ('or' if element.tag in ('or', 'nor') else 'and', children)
+            return None
+
+        expand(root, {})
+        return {name: (tree(dependency, variables) if dependency is not None else None)
+                for name, (dependency, variables) in raw.items()}
+
+    @property
+    def rotdir(self) -> str:
+        return self.entities.get('ROTDIR', '')
+
+    def jobs(self, first_cycle: datetime, last_cycle: datetime) -> List[Dict[str, Any]]:
+        """
+        Return the jobs of the cycles between first_cycle and last_cycle, with their queue time
+        from the accounting cache of rocoto_viewer.py when there is one
+        """
+        first = int(first_cycle.replace(tzinfo=timezone.utc).timestamp())
+        last = int(last_cycle.replace(tzinfo=timezone.utc).timestamp())
+        with sqlite3.connect(f'file:{self.database_file}?mode=ro', uri=True) as connection:
+            rows = connection.execute("SELECT jobid, taskname, cycle, state, tries, duration FROM jobs "
+                                      "WHERE cycle BETWEEN ? AND ?", (first, last)).fetchall()
+
+        qtimes = {}
+        cache_file = f'{os.path.splitext(self.database_file)[0]}_accounting.db'
+        if os.path.isfile(cache_file):
+            with sqlite3.connect(f'file:{cache_file}?mode=ro', uri=True) as cache:
+                qtimes = {str(jobid): _to_seconds(qtime) for jobid, qtime in cache.execute("SELECT jobid, qtime FROM accounting")}
+
+        return [{'jobid': jobid, 'taskname': taskname,
+                 'cycle': datetime.fromtimestamp(cycle, tz=timezone.utc).strftime('%Y%m%d%H'),
+                 'state': state, 'tries': tries, 'runtime': _to_seconds(duration),
+                 'qtime': qtimes.get(str(jobid))}
+                for jobid, taskname, cycle, state, tries, duration in rows]
+
+    def timings(self, cycles: List[str]) -> List[Dict[str, Any]]:
+        """
+        Return the timing records of the python tasks of the cycles
+        """
+        records = []
+        for cycle in cycles:
+            for timing_file in sorted(glob(os.path.join(self.rotdir, 'logs', cycle, '*.timing.jsonl'))):
+                with open(timing_file) as fh:
+                    for line in fh:
+                        try:
+                            records.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            continue
+        return records
+
+
+def critical_path(jobs: List[Dict[str, Any]], dependencies: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Return the critical path of a cycle: the chain of dependent tasks with the longest
+    queue plus run time, all tasks of a dependency being required for "and" and the first
+    of them for "or"; tasks that did not run in the cycle are taken as satisfied for "and"
+    and as never satisfied for "or"
+
+    Parameters
+    ----------
+    jobs : List[Dict[str, Any]]
+        jobs of the cycle
+    dependencies : Dict[str, Any]
+        dependency tree of each task, from Experiment
+
+    Returns
+    -------
+    path : List[Dict[str, Any]]
+        the jobs of the path in execution order, with their cumulative time
+    """
+    by_name = {job['taskname']: job for job in jobs}
+    finish = {}
+
+    def cost(job):
+        return (job['qtime'] or 0.) + (job['runtime'] or 0.)
+
+    def ready(node):
+        """time at which a dependency tree is satisfied and the task that satisfied it,
+        None for a task that did not run in the cycle"""
+        if node is None:
+            return 0., None
+        if node[0] == 'task':
+            if node[1] not in by_name:
+                return None
+            return finish_time(node[1]), node[1]
+        times = [tt for tt in (ready(child) for child in node[1]) if tt is not None]
+        if not times:
+            return 0., None
+        return (max if node[0] == 'and' else min)(times, key=lambda tt: tt[0])
+
+    def finish_time(name):
+        if name not in finish:
+            finish[name] = (0., None)  # guards against cycles in the graph
+            start, predecessor = ready(dependencies.get(name))
+            finish[name] = (start + cost(by_name[name]), predecessor)
+        return finish[name][0]
+
+    for name in by_name:
+        finish_time(name)
+    if not finish:
+        return []
+
+    path = []
+    name = max(finish, key=lambda nn: finish[nn][0])
+    while name is not None and len(path) <= len(finish):
+        job = by_name[name]
+        path.append({**job, 'cumulative': round(finish[name][0], 1)})
+        name = finish[name][1]
+    return path[::-1]
+
+
+def task_stats(jobs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Return the runtime and queue time percentiles of each task group over the jobs
+    """
+    groups = {}
+    for job in jobs:
+        group = groups.setdefault(task_group(job['taskname']), {'runtime': [], 'qtime': [], 'tries': [], 'failed': 0})
+        if job['state'] == 'SUCCEEDED':
+            if job['runtime'] is not None:
+                group['runtime'].append(job['runtime'])
+            if job['qtime'] is not None:
+                group['qtime'].append(job['qtime'])
+        elif job['state'] in ('DEAD', 'FAILED', 'LOST'):
+            group['failed'] += 1
+        group['tries'].append(job['tries'] or 0)
+
+    return {name: {'runtime': _percentiles(group['runtime']),
+                   'qtime': _percentiles(group['qtime']),
+                   'mean_tries': round(float(np.mean(group['tries'])), 2) if group['tries'] else None,
+                   'failed': group['failed']}
+            for name, group in sorted(groups.items())}
+
+
+def phase_stats(records: List[Dict[str, Any]]) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+    """
+    Return the wall time and CPU time percentiles and the peak RSS of each phase of each job
+    """
+    groups = {}
+    for record in records:
+        if record.get('status') != 'ok':
+            continue
+        key = (record.get('run', ''), record.get('job', ''), record.get('phase', ''))
+        group = groups.setdefault(key, {'wall': [], 'cpu': [], 'rss': []})
+        group['wall'].append(record.get('wall_s', 0.))
+        group['cpu'].append(record.get('cpu_s', 0.) + record.get('child_cpu_s', 0.))
+        group['rss'].append(record.get('max_rss_kb', 0))
+
+    return {key: {'wall': _percentiles(group['wall']),
+                  'cpu': _percentiles(group['cpu']),
+                  'max_rss_kb': max(group['rss'])}
+            for key, group in sorted(groups.items())}
+
+
+def regressions(current: Dict[Any, float], baseline: Dict[Any, float],
+                threshold: float, min_seconds: float) -> List[Dict[str, Any]]:
+    """
+    Compare the median times of current and baseline
+
+    Returns
+    -------
+    rows : List[Dict[str, Any]]
+        one row per key found in both, flagged as a regression when the median grew by more
+        than threshold (a fraction) and by at least min_seconds, slowest first
+    """
+    rows = []
+    for key in sorted(set(current) & set(baseline), key=str):
+        new, old = current[key], baseline[key]
+        if new is None or old is None:
+            continue
+        ratio = new / old if old > 0 else float('inf')
+        rows.append({'name': key if isinstance(key, str) else ' '.join(key), 'baseline': old, 'current': new,
+                     'ratio': round(ratio, 3),
+                     'regression': ratio > 1. + threshold and new - old >= min_seconds})
+    return sorted(rows, key=lambda row: row['current'] - row['baseline'], reverse=True)
+
+
+def _write_csv(path: str, header: List[str], rows: List[List[Any]]) -> None:
+    with open(path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def _html_table(header: List[str], rows: List[List[Any]], flagged: Optional[List[bool]] = None) -> str:
+    strings = ['<table>', '<tr>' + ''.join(f'<th>{html.escape(str(hh))}</th>' for hh in header) + '</tr>']
+    for ii, row in enumerate(rows):
+        css = ' class="flag"' if flagged and flagged[ii] else ''
+        strings.append(f'<tr{css}>' + ''.join(f'<td>{html.escape("" if cc is None else str(cc))}</td>' for cc in row) + '</tr>')
+    strings.append('</table>')
+    return '\n'.join(strings)
+
+
+def write_report(output: str, title: str, paths: Dict[str, List[Dict[str, Any]]],
+                 tasks: Dict[str, Dict[str, Any]], phases: Dict[Tuple[str, str, str], Dict[str, Any]],
+                 task_regressions: List[Dict[str, Any]], phase_regressions: List[Dict[str, Any]]) -> None:
+    """
+    Write report.html, critical_path.csv, tasks.csv, phases.csv and regressions.csv to the output directory
+    """
+    os.makedirs(output, exist_ok=True)
+    sections = []
+
+    header = ['cycle', 'task', 'state', 'tries', 'qtime_s', 'runtime_s', 'cumulative_s']
+    rows = [[cycle, job['taskname'], job['state'], job['tries'], job['qtime'], job['runtime'], job['cumulative']]
+            for cycle, path in paths.items() for job in path]
+    _write_csv(os.path.join(output, 'critical_path.csv'), header, rows)
+    for cycle, path in paths.items():
+        total = path[-1]['cumulative'] if path else 0
+        sections.append(f'<h2>Critical path of {cycle} ({total:.0f} s)</h2>')
+        sections.append(_html_table(header[1:], [row[1:] for row in rows if row[0] == cycle]))
+
+    header = ['task', 'jobs', 'runtime_p50_s', 'runtime_p90_s', 'runtime_max_s', 'qtime_p50_s', 'qtime_p90_s', 'mean_tries', 'failed']
+    rows = [[name, stats['runtime']['n'], stats['runtime']['p50'], stats['runtime']['p90'], stats['runtime']['max'],
+             stats['qtime']['p50'], stats['qtime']['p90'], stats['mean_tries'], stats['failed']]
+            for name, stats in tasks.items()]
+    _write_csv(os.path.join(output, 'tasks.csv'), header, rows)
+    sections.append('<h2>Tasks</h2>')
+    sections.append(_html_table(header, rows))
+
+    header = ['run', 'job', 'phase', 'calls', 'wall_p50_s', 'wall_p90_s', 'wall_max_s', 'cpu_p50_s', 'max_rss_kb']
+    rows = [[*key, stats['wall']['n'], stats['wall']['p50'], stats['wall']['p90'], stats['wall']['max'],
+             stats['cpu']['p50'], stats['max_rss_kb']]
+            for key, stats in phases.items()]
+    _write_csv(os.path.join(output, 'phases.csv'), header, rows)
+    if rows:
+        sections.append('<h2>Phases of the python tasks</h2>')
+        sections.append(_html_table(header, rows))
+
+    header = ['kind', 'name', 'baseline_p50_s', 'current_p50_s', 'ratio', 'regression']
+    rows = ([['task', row['name'], row['baseline'], row['current'], row['ratio'], row['regression']] for row in task_regressions] +
+            [['phase', row['name'], row['baseline'], row['current'], row['ratio'], row['regression']] for row in phase_regressions])
+    _write_csv(os.path.join(output, 'regressions.csv'), header, rows)
+    if rows:
+        nflags = sum(row[-1] for row in rows)
+        sections.insert(0, _html_table(header, rows, [row[-1] for row in rows]))
+        sections.insert(0, f'<h2>Regressions against the baseline ({nflags} flagged)</h2>')
+
+    with open(os.path.join(output, 'report.html'), 'w') as fh:
+        fh.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+                 f'<title>{html.escape(title)}</title>'
+                 '<style>body{font-family:sans-serif} table{border-collapse:collapse;margin-bottom:2em}'
+                 'td,th{border:1px solid #ccc;padding:2px 6px;text-align:right} td:first-child,th:first-child{text-align:left}'
+                 'tr.flag{background:#fdd}</style></head><body>\n'
+                 f'<h1>{html.escape(title)}</h1>\n' + '\n'.join(sections) + '\n</body></html>\n')
+
+
+def _cycle_range(cycles: List[str]) -> Tuple[datetime, datetime]:
+    return tuple(datetime.strptime(cc, '%Y%m%d%H') for cc in cycles)
+
+
+def _medians(tasks: Dict[str, Dict[str, Any]], phases: Dict[Tuple[str, str, str], Dict[str, Any]]):
+    return ({name: stats['runtime']['p50'] for name, stats in tasks.items()},
+            {key: stats['wall']['p50'] for key, stats in phases.items()})
+
+
+def input_args(*argv):
+    """
+    Method to collect user arguments for `perf_report.py`
+    """
+
+    parser = ArgumentParser(description=__doc__.split('\n\n')[1].split('\n')[0],
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('expdir', help='experiment directory with the Rocoto XML and database', type=str)
+    parser.add_argument('--cycles', help='first and last cycles (YYYYMMDDHH)', type=str, nargs=2, required=True)
+    parser.add_argument('--output', help='output directory', type=str, default='perf_report')
+    parser.add_argument('--baseline', help='experiment directory of the baseline, the same experiment by default',
+                        type=str, default=None)
+    parser.add_argument('--baseline_cycles', help='first and last cycles of the baseline, the same cycles by default',
+                        type=str, nargs=2, default=None)
+    parser.add_argument('--threshold', help='relative growth of the median time flagged as a regression',
+                        type=float, default=0.2)
+    parser.add_argument('--min_seconds', help='minimum growth of the median time flagged as a regression',
+                        type=float, default=30.)
+
+    return parser.parse_args(argv[0][0] if len(argv[0]) else None)
+
+
+def main(*argv):
+
+    user_inputs = input_args(argv)
+
+    experiment = Experiment(user_inputs.expdir)
+    jobs = experiment.jobs(*_cycle_range(user_inputs.cycles))
+    cycles = sorted({job['cycle'] for job in jobs})
+
+    paths = {cycle: critical_path([job for job in jobs if job['cycle'] == cycle], experiment.dependencies)
+             for cycle in cycles}
+    tasks = task_stats(jobs)
+    phases = phase_stats(experiment.timings(cycles))
+
+    task_regressions, phase_regressions = [], []
+    if user_inputs.baseline is not None or user_inputs.baseline_cycles is not None:
+        baseline = Experiment(user_inputs.baseline) if user_inputs.baseline else experiment
+        baseline_jobs = baseline.jobs(*_cycle_range(user_inputs.baseline_cycles or user_inputs.cycles))
+        baseline_cycles = sorted({job['cycle'] for job in baseline_jobs})
+        current_tasks, current_phases = _medians(tasks, phases)
+        baseline_tasks, baseline_phases = _medians(task_stats(baseline_jobs), phase_stats(baseline.timings(baseline_cycles)))
+        task_regressions = regressions(current_tasks, baseline_tasks, user_inputs.threshold, user_inputs.min_seconds)
+        phase_regressions = regressions(current_phases, baseline_phases, user_inputs.threshold, user_inputs.min_seconds)
+
+    title = f'{os.path.basename(experiment.expdir)} {user_inputs.cycles[0]}-{user_inputs.cycles[1]}'
+    write_report(user_inputs.output, title, paths, tasks, phases, task_regressions, phase_regressions)
+    nflags = sum(row['regression'] for row in task_regressions + phase_regressions)
+    print(f'{len(jobs)} jobs of {len(cycles)} cycles, {nflags} regressions: {os.path.join(user_inputs.output, "report.html")}')
+
+
+if __name__ == '__main__':
+
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+"""
+Runtime history and resource right-sizing advisor for the global-workflow
+
+Harvests the job records of past experiments (Rocoto databases and, where
+rocoto_viewer.py collected it, scheduler accounting) into a history database,
+and derives per-task, per-resolution walltime recommendations from the observed
+runtime distributions.  The recommendations are written to a YAML file that
+Tasks.get_resource reads when RESOURCE_RECOMMENDATIONS is set in config.base.
+
+    resource_advisor.py harvest --history history.db EXPDIR [EXPDIR ...]
+    resource_advisor.py recommend --history history.db --output recommendations.yaml
+"""
+
+import math
+import os
+import re
+import sqlite3
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from functools import lru_cache
+from glob import glob
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from wxflow import parse_yaml, save_as_yaml
+
+__all__ = ['resource_key', 'harvest', 'recommend', 'load_recommendations', 'get_recommendation']
+
+RUNS = ['gdas', 'gfs', 'enkfgdas', 'enkfgfs', 'gefs', 'sfs']
+
+# Rocoto task names that differ from the config.resources section of the task
+RESOURCE_ALIASES = {'atmos_prod': 'atmos_products',
+                    'atmanlprod': 'atmos_products',
+                    'ocean_prod': 'oceanice_products',
+                    'ice_prod': 'oceanice_products',
+                    'atmanlupp': 'upp',
+                    'atmupp': 'upp',
+                    'goesupp': 'upp',
+                    'fbwind': 'awips',
+                    'gempakgrb2spec': 'gempak',
+                    'wave_init': 'waveinit',
+                    'wave_post_grid': 'wavepostsbs',
+                    'wave_post_bndpnt': 'wavepostbndpnt',
+                    'wave_post_bndpnt_bull': 'wavepostbndpntbll',
+                    'wave_post_pnt': 'wavepostpnt'}
+
+# Prefixes of Rocoto task names, for tasks whose names carry a metatask variable
+RESOURCE_PREFIXES = [('awips_', 'awips'), ('gempak', 'gempak'), ('npoess', 'npoess'), ('metp', 'metp')]
+
+HISTORY_SCHEMA = """CREATE TABLE IF NOT EXISTS jobs
+    (source TEXT, taskname TEXT, cycle INTEGER, run TEXT, resource TEXT, resolution TEXT,
+     state TEXT, exit_status INTEGER, tries INTEGER, duration INTEGER, cores INTEGER,
+     cputime INTEGER, PRIMARY KEY (source, taskname, cycle))"""
+
+
+def resource_key(taskname: str) -> Tuple[str, str]:
+    """
+    Return the RUN and the config.resources section of a Rocoto task name,
+    e.g. ('gfs', 'atmos_products') for gfs_atmos_prod_f006
+    """
+    run, _, name = taskname.partition('_')
+    if run not in RUNS or not name:
+        # e.g. the gefs arch task
+        run, name = '', taskname
+
+    member = re.search(r'_mem(\d+)', name)
+    name = re.sub(r'_(seg|mem|f)\d+', '', name)
+    name = re.sub(r'_fhr\w*$', '', name)
+
+    if name == 'fcst' and (run.startswith('enkf') or (member and int(member.group(1)) > 0)):
+        return run, 'efcs'
+    if name in RESOURCE_ALIASES:
+        return run, RESOURCE_ALIASES[name]
+    for prefix, resource in RESOURCE_PREFIXES:
+        if name.startswith(prefix):
+            return run, resource
+    # group suffixes, e.g. ecen000 or earc00
+    return run, re.sub(r'\d+$', '', name)
+
+
+def _read_config_base(expdir: str) -> Dict[str, str]:
+    """
+    Return the simple "export KEY=value" settings of the config.base of an experiment
+    """
+    config = {}
+    config_base = os.path.join(expdir, 'config.base')
+    if os.path.isfile(config_base):
+        with open(config_base) as fh:
+            for line in fh:
+                match = re.match(r'\s*export\s+(\w+)="?([^"#\s]*)"?', line)
+                if match:
+                    config[match.group(1)] = match.group(2)
+    return config
+
+
+def _accounting(database_file: str) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """
+    Return the (runtime, cputime) in seconds of each job ID from the accounting cache
+    written by rocoto_viewer.py --perfmetrics=true, if there is one
+    """
+    def seconds(value):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+    cache_file = f'{os.path.splitext(database_file)[0]}_accounting.db'
+    if not os.path.isfile(cache_file):
+        return {}
+    with sqlite3.connect(f'file:{cache_file}?mode=ro', uri=True) as cache:
+        return {str(jobid): (seconds(runtime), seconds(cputime))
+                for jobid, runtime, cputime in cache.execute("SELECT jobid, runtime, cputime FROM accounting")}
+
+
+def harvest(history_file: str, expdir: str) -> int:
+    """
+    Add the jobs of the Rocoto databases of an experiment to the history database
+
+    Parameters
+    ----------
+    history_file : str
+        path of the history database, created if needed
+    expdir : str
+        experiment directory, with config.base and the Rocoto database(s)
+
+    Returns
+    -------
+    njobs : int
+        number of job records added or updated
+    """
+    config = _read_config_base(expdir)
+    database_files = [ff for ff in glob(os.path.join(expdir, '*.db')) if not ff.endswith('_accounting.db')]
+
+    records = []
+    for database_file in database_files:
+        accounting = _accounting(database_file)
+        with sqlite3.connect(f'file:{database_file}?mode=ro', uri=True) as connection:
+            rows = connection.execute("SELECT jobid, taskname, cycle, state, exit_status, tries, duration, cores FROM jobs").fetchall()
+        for jobid, taskname, cycle, state, exit_status, tries, duration, cores in rows:
+            run, resource = resource_key(taskname)
+            resolution = config.get('CASE_ENS' if run.startswith('enkf') else 'CASE', '')
+            runtime, cputime = accounting.get(str(jobid), (None, None))
+            records.append((os.path.abspath(database_file), taskname, cycle, run, resource, resolution,
+                            state, exit_status, tries, runtime or duration, cores, cputime))
+
+    with sqlite3.connect(history_file) as history:
+        history.execute(HISTORY_SCHEMA)
+        history.executemany("INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+    return len(records)
+
+
+def _walltime(seconds: float, granularity: int = 300) -> str:
+    """
+    Return a walltime string HH:MM:SS, rounded up to the granularity in seconds
+    """
+    seconds = int(math.ceil(seconds / granularity) * granularity)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def recommend(history_file: str, percentile: float = 95., margin: float = 1.25,
+              min_samples: int = 5, max_walltime: Optional[str] = None) -> Dict:
+    """
+    Derive walltime recommendations from the history database
+
+    The walltime covers the given percentile of the successful runtimes, times the margin.
+    Runtimes of jobs that failed are lower bounds of the time the task needs
+    (the job may have hit its walltime), so the walltime also covers the longest of them.
+    The walltime is never lowered below the runtime needed: when it exceeds max_walltime,
+    the recommendation is flagged for the resources of the task to be revisited by hand
+    (spreading the same MPI tasks over more nodes would not make the task run faster).
+
+    Parameters
+    ----------
+    history_file : str
+        path of the history database
+    percentile : float
+        percentile of the successful runtimes to cover
+    margin : float
+        factor applied to the runtime covered
+    min_samples : int
+        minimum number of successful jobs for a recommendation
+    max_walltime : str
+        longest walltime of the queue, HH:MM:SS; walltimes exceeding it are flagged
+
+    Returns
+    -------
+    recommendations : Dict
+        {run: {resolution: {resource: {walltime, exceeds_max_walltime, samples, failures, p50, p95}}}}
+    """
+    max_seconds = None
+    if max_walltime:
+        hh, mm, ss = (int(vv) for vv in max_walltime.split(':'))
+        max_seconds = hh * 3600 + mm * 60 + ss
+
+    with sqlite3.connect(f'file:{history_file}?mode=ro', uri=True) as history:
+        rows = history.execute("SELECT run, resolution, resource, state, duration FROM jobs "
+                               "WHERE duration IS NOT NULL AND duration > 0").fetchall()
+
+    durations = {}
+    for run, resolution, resource, state, duration in rows:
+        key = (run, resolution, resource)
+        durations.setdefault(key, {'SUCCEEDED': [], 'failed': []})
+        durations[key]['SUCCEEDED' if state == 'SUCCEEDED' else 'failed'].append(duration)
+
+    recommendations = {}
+    for (run, resolution, resource), found in sorted(durations.items()):
+        succeeded = np.array(found['SUCCEEDED'], dtype=float)
+        if succeeded.size < min_samples:
+            continue
+        needed = max(np.percentile(succeeded, percentile), max(found['failed'], default=0)) * margin
+        recommendations.setdefault(run, {}).setdefault(resolution, {})[resource] = {
+            'walltime': _walltime(needed),
+            'exceeds_max_walltime': bool(max_seconds and needed > max_seconds),
+            'samples': int(succeeded.size),
+            'failures': len(found['failed']),
+            'p50': int(np.percentile(succeeded, 50)),
+            'p95': int(np.percentile(succeeded, 95))}
+    return recommendations
+
+
+@lru_cache(maxsize=None)
+def load_recommendations(recommendations_file: str) -> Dict:
+    """
+    Read a recommendations file written by resource_advisor.py recommend
+    """
+    return parse_yaml(recommendations_file)
+
+
+def get_recommendation(recommendations_file: str, run: str, resolution: str, resource: str) -> Optional[Dict]:
+    """
+    Return the recommendation for a task, or None if there is none
+    """
+    if not recommendations_file or not os.path.isfile(recommendations_file):
+        return None
+    return load_recommendations(recommendations_file).get(run, {}).get(resolution, {}).get(resource, None)
+
+
+def input_args(*argv):
+    """
+    Method to collect user arguments for `resource_advisor.py`
+    """
+
+    parser = ArgumentParser(description=__doc__.split('\n\n')[0].strip(),
+                            formatter_class=ArgumentDefaultsHelpFormatter)
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    harvest_parser = subparsers.add_parser('harvest', help='add the jobs of experiments to the history database',
+                                           formatter_class=ArgumentDefaultsHelpFormatter)
+    harvest_parser.add_argument('--history', help='history database', type=str, required=True)
+    harvest_parser.add_argument('expdirs', help='experiment directories', type=str, nargs='+')
+
+    recommend_parser = subparsers.add_parser('recommend', help='write resource recommendations',
+                                             formatter_class=ArgumentDefaultsHelpFormatter)
+    recommend_parser.add_argument('--history', help='history database', type=str, required=True)
+    recommend_parser.add_argument('--output', help='recommendations YAML file', type=str, required=True)
+    recommend_parser.add_argument('--percentile', help='percentile of the successful runtimes to cover',
+                                  type=float, default=95.)
+    recommend_parser.add_argument('--margin', help='factor applied to the runtime covered', type=float, default=1.25)
+    recommend_parser.add_argument('--min_samples', help='minimum number of successful jobs per task',
+                                  type=int, default=5)
+    recommend_parser.add_argument('--max_walltime', help='longest walltime of the queue (HH:MM:SS); '
+                                  'tasks needing more are flagged', type=str, default=None)
+
+    return parser.parse_args(argv[0][0] if len(argv[0]) else None)
+
+
+def main(*argv):
+
+    user_inputs = input_args(argv)
+
+    if user_inputs.mode == 'harvest':
+        for expdir in user_inputs.expdirs:
+            njobs = harvest(user_inputs.history, expdir)
+            print(f'{expdir}: harvested {njobs} jobs')
+
+    elif user_inputs.mode == 'recommend':
+        recommendations = recommend(user_inputs.history, user_inputs.percentile, user_inputs.margin,
+                                    user_inputs.min_samples, user_inputs.max_walltime)
+        save_as_yaml(recommendations, user_inputs.output)
+        print(f'{"run":<10} {"case":<6} {"task":<24} {"walltime":>9} {"p50":>7} {"p95":>7} {"jobs":>5} {"failed":>6}')
+        for run, resolutions in recommendations.items():
+            for resolution, resources in resolutions.items():
+                for resource, rec in resources.items():
+                    exceeds = f'  exceeds {user_inputs.max_walltime}' if rec['exceeds_max_walltime'] else ''
+                    print(f'{run:<10} {resolution:<6} {resource:<24} {rec["walltime"]:>9} '
+                          f'{rec["p50"]:>7} {rec["p95"]:>7} {rec["samples"]:>5} {rec["failures"]:>6}{exceeds}')
+
+
+if __name__ == '__main__':
+
+    main()
@@ -266,16 +266,32 @@ class GEFSTasks(Tasks):
 
         resources = self.get_resource('atmos_ensstat')
 
+        fhrs = self._get_forecast_hours('gefs', self._configs['atmos_ensstat'])
+
+        # when replaying, atmos component does not have fhr 0, therefore remove 0 from fhrs
+        is_replay = self._configs['atmos_ensstat']['REPLAY_ICS']
+        if is_replay and 0 in fhrs:
+            fhrs.remove(0)
+
+        fhr_groups = self._get_forecast_hour_groups(fhrs, self._configs['atmos_ensstat'])
+        fhr_var_dict = self._get_forecast_hour_group_vars(fhr_groups)
+
+        # depend on the products of every hour of the group; shorter groups repeat their last hour
+        group_size = max(len(group) for group in fhr_groups)
+        for ii in range(group_size):
+            fhr_var_dict[f'fhr_dep{ii}'] = ' '.join([f"{group[min(ii, len(group) - 1)]:03d}" for group in fhr_groups])
+
         deps = []
         for member in range(0, self.nmem + 1):
-            task = f'gefs_atmos_prod_mem{member:03d}_f#fhr#'
-            dep_dict = {'type': 'task', 'name': task}
-            deps.append(rocoto.add_dependency(dep_dict))
+            for ii in range(group_size):
+                task = f'gefs_atmos_prod_mem{member:03d}_f#fhr_dep{ii}#'
+                dep_dict = {'type': 'task', 'name': task}
+                deps.append(rocoto.add_dependency(dep_dict))
 
         dependencies = rocoto.create_dependency(dep_condition='and', dep=deps)
 
         postenvars = self.envars.copy()
-        postenvar_dict = {'FHR3': '#fhr#'}
+        postenvar_dict = {'FHR3': '#fhr#', 'FHRLST': '#fhrlst#'}
         for key, value in postenvar_dict.items():
             postenvars.append(rocoto.create_envar(name=key, value=str(value)))
 
@@ -290,15 +306,6 @@ class GEFSTasks(Tasks):
                      'log': f'{self.rotdir}/logs/@Y@m@d@H/{task_name}.log',
                      'maxtries': '&MAXTRIES;'}
 
-        fhrs = self._get_forecast_hours('gefs', self._configs['atmos_ensstat'])
-
-        # when replaying, atmos component does not have fhr 0, therefore remove 0 from fhrs
-        is_replay = self._configs['atmos_ensstat']['REPLAY_ICS']
-        if is_replay and 0 in fhrs:
-            fhrs.remove(0)
-
-        fhr_var_dict = {'fhr': ' '.join([f"{fhr:03d}" for fhr in fhrs])}
-
         fhr_metatask_dict = {'task_name': f'gefs_atmos_ensstat',
                              'task_dict': task_dict,
                              'var_dict': fhr_var_dict}
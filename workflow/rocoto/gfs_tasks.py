@@ -1070,6 +1070,7 @@ class GFSTasks(Tasks):
 
         postenvars = self.envars.copy()
         postenvar_dict = {'FHR3': '#fhr#',
+                          'FHRLST': '#fhrlst#',
                           'UPP_RUN': upp_run}
         for key, value in postenvar_dict.items():
             postenvars.append(rocoto.create_envar(name=key, value=str(value)))
@@ -1102,7 +1103,8 @@ class GFSTasks(Tasks):
                      }
 
         fhrs = self._get_forecast_hours(self.run, self._configs['upp'])
-        fhr_var_dict = {'fhr': ' '.join([f"{fhr:03d}" for fhr in fhrs])}
+        fhr_groups = self._get_forecast_hour_groups(fhrs, self._configs['upp'])
+        fhr_var_dict = self._get_forecast_hour_group_vars(fhr_groups)
 
         metatask_dict = {'task_name': f'{self.run}_{task_id}',
                          'task_dict': task_dict,
@@ -1129,7 +1131,7 @@ class GFSTasks(Tasks):
                                    'history_file_tmpl': f'{self.run}.t@Hz.master.grb2f#fhr#'},
                          'ocean': {'config': 'oceanice_products',
                                    'history_path_tmpl': 'COM_OCEAN_HISTORY_TMPL',
-                                   'history_file_tmpl': f'{self.run}.ocean.t@Hz.6hr_avg.f#fhr_next#.nc'},
+                                   'history_file_tmpl': f'{self.run}.ocean.t@Hz.6hr_avg.f#fhr#.nc'},
                          'ice': {'config': 'oceanice_products',
                                  'history_path_tmpl': 'COM_ICE_HISTORY_TMPL',
                                  'history_file_tmpl': f'{self.run}.ice.t@Hz.6hr_avg.f#fhr#.nc'}}
@@ -1140,26 +1142,16 @@ class GFSTasks(Tasks):
         history_file_tmpl = component_dict['history_file_tmpl']
 
         postenvars = self.envars.copy()
-        postenvar_dict = {'FHR3': '#fhr#', 'COMPONENT': component}
+        postenvar_dict = {'FHR3': '#fhr#', 'FHRLST': '#fhrlst#', 'COMPONENT': component}
         for key, value in postenvar_dict.items():
             postenvars.append(rocoto.create_envar(name=key, value=str(value)))
 
-        history_path = self._template_to_rocoto_cycstring(self._base[history_path_tmpl])
-        deps = []
-        data = f'{history_path}/{history_file_tmpl}'
-        dep_dict = {'type': 'data', 'data': data, 'age': 120}
-        deps.append(rocoto.add_dependency(dep_dict))
-        dep_dict = {'type': 'metatask', 'name': f'{self.run}_fcst'}
-        deps.append(rocoto.add_dependency(dep_dict))
-        dependencies = rocoto.create_dependency(dep=deps, dep_condition='or')
-
         cycledef = 'gdas_half,gdas' if self.run in ['gdas'] else self.run
         resources = self.get_resource(component_dict['config'])
 
         task_name = f'{self.run}_{component}_prod_f#fhr#'
         task_dict = {'task_name': task_name,
                      'resources': resources,
-                     'dependency': dependencies,
                      'envars': postenvars,
                      'cycledef': cycledef,
                      'command': f"{self.HOMEgfs}/jobs/rocoto/{config}.sh",
@@ -1174,11 +1166,28 @@ class GFSTasks(Tasks):
         if component in ['ocean', 'ice'] and 0 in fhrs:
             fhrs.remove(0)
 
-        fhr_var_dict = {'fhr': ' '.join([f"{fhr:03d}" for fhr in fhrs])}
+        fhr_groups = self._get_forecast_hour_groups(fhrs, self._configs[config])
+        fhr_var_dict = self._get_forecast_hour_group_vars(fhr_groups)
 
+        # the history file of every hour of the group, the ocean file being named after the next hour
         if component in ['ocean']:
-            fhrs_next = fhrs[1:] + [fhrs[-1] + (fhrs[-1] - fhrs[-2])]
-            fhr_var_dict['fhr_next'] = ' '.join([f"{fhr:03d}" for fhr in fhrs_next])
+            fhrs_next = dict(zip(fhrs, fhrs[1:] + [fhrs[-1] + (fhrs[-1] - fhrs[-2])]))
+            fhr_groups = [[fhrs_next[fhr] for fhr in group] for group in fhr_groups]
+        dep_var_dict = self._get_forecast_hour_group_dep_vars(fhr_groups)
+        fhr_var_dict.update(dep_var_dict)
+
+        history_path = self._template_to_rocoto_cycstring(self._base[history_path_tmpl])
+        data_deps = []
+        for dep_var in dep_var_dict:
+            data = f'{history_path}/{history_file_tmpl}'.replace('#fhr#', f'#{dep_var}#')
+            dep_dict = {'type': 'data', 'data': data, 'age': 120}
+            data_deps.append(rocoto.add_dependency(dep_dict))
+        deps = [rocoto.create_dependency(dep=data_deps, dep_condition='and')]
+        dep_dict = {'type': 'metatask', 'name': f'{self.run}_fcst'}
+        deps.append(rocoto.add_dependency(dep_dict))
+        dependencies = rocoto.create_dependency(dep=deps, dep_condition='or')
+        task_dict['dependency'] = dependencies
+
         metatask_dict = {'task_name': f'{self.run}_{component}_prod',
                          'task_dict': task_dict,
                          'var_dict': fhr_var_dict}
@@ -1195,7 +1204,7 @@ class GFSTasks(Tasks):
         dependencies = rocoto.create_dependency(dep=deps)
 
         wave_post_envars = self.envars.copy()
-        postenvar_dict = {'FHR3': '#fhr#'}
+        postenvar_dict = {'FHR3': '#fhr#', 'FHRLST': '#fhrlst#'}
         for key, value in postenvar_dict.items():
             wave_post_envars.append(rocoto.create_envar(name=key, value=str(value)))
 
@@ -1213,8 +1222,9 @@ class GFSTasks(Tasks):
                      }
 
         fhrs = self._get_forecast_hours('gfs', self._configs['wavepostsbs'], 'wave')
+        fhr_groups = self._get_forecast_hour_groups(fhrs, self._configs['wavepostsbs'])
 
-        fhr_metatask_dict = {'fhr': ' '.join([f"{fhr:03d}" for fhr in fhrs])}
+        fhr_metatask_dict = self._get_forecast_hour_group_vars(fhr_groups)
         metatask_dict = {'task_name': f'{self.run}_wavepostsbs',
                          'task_dict': task_dict,
                          'var_dict': fhr_metatask_dict}
@@ -1511,13 +1521,8 @@ class GFSTasks(Tasks):
 
     def gempak(self):
 
-        deps = []
-        dep_dict = {'type': 'task', 'name': f'{self.run}_atmos_prod_f#fhr#'}
-        deps.append(rocoto.add_dependency(dep_dict))
-        dependencies = rocoto.create_dependency(dep=deps)
-
         gempak_vars = self.envars.copy()
-        gempak_dict = {'FHR3': '#fhr#'}
+        gempak_dict = {'FHR3': '#fhr#', 'FHRLST': '#fhrlst#'}
         for key, value in gempak_dict.items():
             gempak_vars.append(rocoto.create_envar(name=key, value=str(value)))
 
@@ -1525,7 +1530,6 @@ class GFSTasks(Tasks):
         task_name = f'{self.run}_gempak_f#fhr#'
         task_dict = {'task_name': task_name,
                      'resources': resources,
-                     'dependency': dependencies,
                      'envars': gempak_vars,
                      'cycledef': self.run.replace('enkf', ''),
                      'command': f'{self.HOMEgfs}/jobs/rocoto/gempak.sh',
@@ -1535,7 +1539,20 @@ class GFSTasks(Tasks):
                      }
 
         fhrs = self._get_forecast_hours(self.run, self._configs['gempak'])
-        fhr_var_dict = {'fhr': ' '.join([f"{fhr:03d}" for fhr in fhrs])}
+        fhr_groups = self._get_forecast_hour_groups(fhrs, self._configs['gempak'])
+        fhr_var_dict = self._get_forecast_hour_group_vars(fhr_groups)
+
+        # depend on every atmos_prod task processing an hour of the group
+        prod_config = self._configs['atmos_products']
+        prod_groups = self._get_forecast_hour_groups(self._get_forecast_hours(self.run, prod_config), prod_config)
+        dep_var_dict = self._get_forecast_hour_group_dep_vars(fhr_groups, prod_groups)
+        fhr_var_dict.update(dep_var_dict)
+
+        deps = []
+        for dep_var in dep_var_dict:
+            dep_dict = {'type': 'task', 'name': f'{self.run}_atmos_prod_f#{dep_var}#'}
+            deps.append(rocoto.add_dependency(dep_dict))
+        task_dict['dependency'] = rocoto.create_dependency(dep=deps, dep_condition='and')
 
         fhr_metatask_dict = {'task_name': f'{self.run}_gempak',
                              'task_dict': task_dict,
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, Iterator
 
 '''
     MODULE:
@@ -48,10 +48,36 @@ def create_task(task_dict: Dict[str, Any]) -> List[str]:
 
     """
 
+    return ''.join(_iter_task_lines(task_dict))
+
+
+def _iter_task_lines(task_dict: Dict[str, Any], indent: str = '') -> Iterator[str]:
+    """
+    Yield the lines of XML for a rocoto task or metatask
+
+    Nested metatasks are indented as their lines are produced, so the XML
+    of inner tasks is never joined and re-split.
+
+    Parameters
+    ----------
+    task_dict: dict
+        Dictionary of task definitions, see create_task
+    indent: str
+        Indentation prepended to every non-empty line
+
+    Yields
+    ------
+    str
+        Lines of XML, including their trailing newline
+    """
+
     inner_task_dict = task_dict.pop('task_dict', None)
 
     if inner_task_dict is None:
-        strings = _create_innermost_task(task_dict)
+        for string in _create_innermost_task(task_dict):
+            # entries such as dependencies may span several lines
+            for line in string.splitlines(True):
+                yield line if line == '\n' else f'{indent}{line}'
 
     else:
         # There is a nested task_dict, so this is a metatask
@@ -59,26 +85,22 @@ def create_task(task_dict: Dict[str, Any]) -> List[str]:
         metataskmode = 'serial' if task_dict.get('is_serial', False) else 'parallel'
         var_dict = task_dict.get('var_dict', None)
 
-        strings = [f'<metatask name="{metataskname}" mode="{metataskmode}">\n',
-                   '\n']
-
         if var_dict is None:
             msg = f'Task {metataskname} has a nested task dict, but has no var_dict'
             raise KeyError(msg)
 
+        yield f'{indent}<metatask name="{metataskname}" mode="{metataskmode}">\n'
+        yield '\n'
+
         for key in var_dict.keys():
             value = str(var_dict[key])
-            strings.append(f'\t<var name="{key}">{value}</var>\n')
+            yield f'{indent}\t<var name="{key}">{value}</var>\n'
 
-        strings.append('\n')
+        yield '\n'
         task_dict.update(inner_task_dict)
-        tasklines = create_task(task_dict).splitlines(True)
-        for tl in tasklines:
-            strings.append(f'{tl}') if tl == '\n' else strings.append(f'\t{tl}')
-        strings.append('\n')
-        strings.append('</metatask>\n')
-
-    return ''.join(strings)
+        yield from _iter_task_lines(task_dict, indent=f'{indent}\t')
+        yield '\n'
+        yield f'{indent}</metatask>\n'
 
 
 def _create_innermost_task(task_dict: Dict[str, Any]) -> List[str]:
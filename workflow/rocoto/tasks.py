@@ -3,6 +3,7 @@
 import numpy as np
 from applications.applications import AppConfig
 import rocoto.rocoto as rocoto
+from resource_advisor import get_recommendation
 from wxflow import Template, TemplateConstants, to_timedelta
 from typing import List
 
@@ -176,6 +177,46 @@ class Tasks:
 
         return fhrs
 
+    @staticmethod
+    def _get_forecast_hour_groups(fhrs: List[int], config) -> List[List[int]]:
+        """
+        Pack consecutive forecast hours into groups of NFHRS_PER_GROUP hours (default 1)
+        so that a single task processes all the hours of a group
+        """
+        nfhrs_per_group = max(1, int(config.get('NFHRS_PER_GROUP', 1)))
+        return [fhrs[ii:ii + nfhrs_per_group] for ii in range(0, len(fhrs), nfhrs_per_group)]
+
+    @staticmethod
+    def _get_forecast_hour_group_vars(fhr_groups: List[List[int]]) -> dict:
+        """
+        Return the metatask variables for groups of forecast hours:
+          fhr: last forecast hour of each group, used in task names and dependencies
+          fhrlst: forecast hours of each group, e.g. f000_f001_f002
+        """
+        return {'fhr': ' '.join([f"{fhrs[-1]:03d}" for fhrs in fhr_groups]),
+                'fhrlst': ' '.join(['_'.join([f"f{fhr:03d}" for fhr in fhrs]) for fhrs in fhr_groups])}
+
+    @staticmethod
+    def _get_forecast_hour_group_dep_vars(fhr_groups: List[List[int]], upstream_groups: List[List[int]] = None,
+                                          var: str = 'fhr_dep') -> dict:
+        """
+        Return the metatask variables <var>0, <var>1, ... naming the dependencies of groups of forecast hours:
+          without upstream_groups, every forecast hour of each group
+          with upstream_groups, every upstream task (by the last forecast hour of its group)
+          processing a forecast hour of each group, since upstream groups run concurrently
+        Groups with fewer dependencies repeat their last one.
+        """
+        upstream_task_fhr = {fhr: group[-1] for group in (upstream_groups or [[fhr] for fhrs in fhr_groups for fhr in fhrs])
+                             for fhr in group}
+        missing = [fhr for fhrs in fhr_groups for fhr in fhrs if fhr not in upstream_task_fhr]
+        if missing:
+            raise KeyError(f"Forecast hours {missing} are not processed by any upstream task")
+
+        dep_fhrs = [sorted({upstream_task_fhr[fhr] for fhr in fhrs}) for fhrs in fhr_groups]
+        ndeps = max(len(fhrs) for fhrs in dep_fhrs)
+        return {f'{var}{ii}': ' '.join([f"{fhrs[min(ii, len(fhrs) - 1)]:03d}" for fhrs in dep_fhrs])
+                for ii in range(ndeps)}
+
     def get_resource(self, task_name):
         """
         Given a task name (task_name) and its configuration (task_names),
@@ -198,6 +239,17 @@ class Tasks:
 
         threads = task_config[f'threads_per_task']
 
+        # Optionally take the walltime from the resource advisor
+        case = self._base['CASE_ENS'] if self.run.startswith('enkf') else self._base['CASE']
+        recommendation = get_recommendation(self._base.get('RESOURCE_RECOMMENDATIONS', ''), self.run, case, task_name)
+        if recommendation is not None:
+            if recommendation.get('exceeds_max_walltime', False):
+                # the queue would reject the job, keep the static walltime
+                print(f"WARNING: recommended walltime {recommendation['walltime']} of {self.run} {task_name} "
+                      f"exceeds the queue limit, keeping {walltime}; revisit its resources")
+            else:
+                walltime = recommendation['walltime']
+
         # Memory is not required
         memory = task_config.get(f'memory', None)
 
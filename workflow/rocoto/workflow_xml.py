@@ -4,9 +4,10 @@ import os
 from distutils.spawn import find_executable
 from datetime import datetime
 from collections import OrderedDict
-from typing import Dict
+from io import StringIO
+from typing import Dict, IO
 from applications.applications import AppConfig
-from rocoto.workflow_tasks import get_wf_tasks
+from rocoto.workflow_tasks import iter_wf_tasks
 from wxflow import to_timedelta
 import rocoto.rocoto as rocoto
 from abc import ABC, abstractmethod
@@ -28,12 +29,8 @@ class RocotoXML(ABC):
         self.definitions = self._get_definitions()
         self.header = self._get_workflow_header()
         self.cycledefs = self.get_cycledefs()
-        task_list = get_wf_tasks(app_config)
-        self.tasks = '\n'.join(task_list)
         self.footer = self._get_workflow_footer()
 
-        self.xml = self._assemble_xml()
-
     @staticmethod
     def _get_preamble():
         """
@@ -111,16 +108,31 @@ class RocotoXML(ABC):
 
         return '\n</workflow>\n'
 
-    def _assemble_xml(self) -> str:
+    @property
+    def xml(self) -> str:
+        """
+        The complete XML as a single string; prefer write() for large workflows
+        """
 
-        strings = [self.preamble,
-                   self.definitions,
-                   self.header,
-                   self.cycledefs,
-                   self.tasks,
-                   self.footer]
+        with StringIO() as fh:
+            self._stream_xml(fh)
+            return fh.getvalue()
 
-        return ''.join(strings)
+    def _stream_xml(self, fh: IO[str]) -> None:
+        """
+        Write the XML to an open file, writing each task as soon as it is created
+        """
+
+        for string in [self.preamble, self.definitions, self.header, self.cycledefs]:
+            fh.write(string)
+
+        # tasks are separated by an empty line
+        for ii, task in enumerate(iter_wf_tasks(self._app_config)):
+            if ii > 0:
+                fh.write('\n')
+            fh.write(task)
+
+        fh.write(self.footer)
 
     def write(self, xml_file: str = None, crontab_file: str = None):
         self._write_xml(xml_file=xml_file)
@@ -134,8 +146,17 @@ class RocotoXML(ABC):
         if xml_file is None:
             xml_file = f"{expdir}/{pslot}.xml"
 
-        with open(xml_file, 'w') as fh:
-            fh.write(self.xml)
+        # write to a temporary file first, so an error while creating the tasks
+        # does not leave a truncated XML behind
+        tmp_file = f"{xml_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as fh:
+                self._stream_xml(fh)
+        except Exception:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        os.replace(tmp_file, xml_file)
 
     def _write_crontab(self, crontab_file: str = None, cronint: int = 5) -> None:
         """
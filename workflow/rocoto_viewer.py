@@ -45,6 +45,8 @@ from datetime import datetime, timedelta
 import re
 import traceback
 import pickle
+import json
+import shutil
 
 import sqlite3
 import collections
@@ -74,8 +76,14 @@ use_performance_metrics = False
 job_name_length_max = 50
 default_column_length_master = 125
 stat_read_time_delay = 3 * 60
+# seconds between checks of the database modification time
+stat_poll_delay = 15
+# seconds to block on the rocotostat queue while the first status is loading
+stat_queue_timeout = 0.25
 header_string = ''
-format_string = "jobid slots submit_time start_time cpu_used run_time delimiter=';'"
+format_string = "jobid slots submit_time start_time cpu_used run_time stat delimiter=';'"
+# states of the jobs in the Rocoto database after which their accounting records are final
+ROCOTO_FINAL_STATES = ('SUCCEEDED', 'FAILED', 'DEAD', 'LOST', 'EXPIRED')
 
 ccs_html = '''
 <html>
@@ -331,6 +339,7 @@ Mandatory arguments:
 Optional arguments:
   --listtasks             --- print out a list of all tasks
   --html=filename.html    --- creates an HTML document of status
+  --perfmetrics=true      --- show slots, queue, CPU and run times from the scheduler accounting
   --help                  --- print this usage message''')
 
     if message is not None:
@@ -338,27 +347,6 @@ Optional arguments:
     sys.exit(-1)
 
 
-def augment_SQLite3(filename):
-    connection = sqlite3.connect(filename)
-    c = connection.cursor()
-    # qinfo=q = c.execute("DROP TABLE IF EXISTS jobs_augment;")
-    c.execute("PRAGMA table_info(jobs_augment)").fetchall()
-    if any('qtime' in element for element in qinfo):
-        c.close()
-        return 'is_already_augmented'
-    else:
-        sql_create_augment_table = "CREATE TABLE jobs_augment AS SELECT * FROM jobs;"
-        c.execute(sql_create_augment_table)
-        c.execute("alter table jobs_augment add column qtime integer;")
-        c.execute("alter table jobs_augment add column cputime integer;")
-        c.execute("alter table jobs_augment add column runtime integer;")
-        c.execute("alter table jobs_augment add column slots integer;")
-        connection.commit()
-
-    c.close()
-    return 'now_augmented'
-
-
 def isSQLite3(filename):
     try:
         file = open(filename, 'rb')
@@ -408,8 +396,8 @@ def get_arguments():
             database_file = v
         elif k in ('-f', '--checkfile'):
             save_checkfile_path = v
-        # elif k in ('--perfmetrics'):
-        #    perfmetrics_on = v
+        elif k in ('--perfmetrics'):
+            perfmetrics_on = v
         elif k in ('--listtasks'):
             global list_tasks
             list_tasks = True
@@ -431,8 +419,8 @@ def get_arguments():
 
     if perfmetrics_on is None:
         use_performance_metrics = False
-#    elif perfmetrics_on.lower() == 'true':
-#        use_performance_metrics = True
+    elif perfmetrics_on.lower() == 'true':
+        use_performance_metrics = True
     elif perfmetrics_on.lower() == 'false':
         use_performance_metrics = False
     elif perfmetrics_on is not None:
@@ -487,88 +475,244 @@ def get_entity_values(workflow_file):
     return entity_values
 
 
+def database_mtime(database_file):
+    """
+    Return the latest modification time of the Rocoto database and its
+    write-ahead log or rollback journal, or None if the database does not exist
+    """
+    mtimes = []
+    for suffix in ('', '-wal', '-journal'):
+        try:
+            mtimes.append(os.stat(database_file + suffix).st_mtime_ns)
+        except OSError:
+            pass
+    return max(mtimes, default=None)
+
+
 def timedelta_total_seconds(timedelta):
     return (
         timedelta.microseconds + 0.0 + (timedelta.seconds + timedelta.days * 24 * 3600) * 10 ** 6) / 10 ** 6
 
 
-def get_aug_perf_values(username):
-    global html_ouput
-    global format_keys
+def _seconds(value) -> str:
+    """
+    Format a number of seconds for display, '-' if unknown
+    """
+    return '-' if value is None else str(int(value))
+
+
+def _clock_to_seconds(clock: str):
+    """
+    Convert a [D-]HH:MM:SS[.mmm] or MM:SS[.mmm] duration to seconds, None if it cannot be parsed
+    """
     try:
-        which_bjobs = syscall(['which', 'bjobs'])
-    except Exception:
+        days, _, clock = clock.strip().rpartition('-')
+        parts = [float(part) for part in clock.split(':')]
+    except ValueError:
         return None
-    bjobs = collections.defaultdict(dict)
-    aug_perf = collections.defaultdict(dict)
-    bjobs_line = syscall([which_bjobs, '-a', '-o', format_string, '-u', username])
-    if 'No job found' in bjobs_line:
+    seconds = 0.
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds + (int(days) * 86400 if days else 0)
+
+
+class AccountingCollector:
+    """
+    Base class of the scheduler accounting backends for the performance metrics
+
+    A backend queries the scheduler for a batch of job IDs and returns, for each job it knows,
+    a record of slots, queue time, CPU time and run time (in seconds), and whether the job
+    is final, i.e. its record will not change anymore.
+    """
+
+    command = None
+    batch_size = 500
+
+    def __init__(self, executable: str) -> None:
+        self.executable = executable
+
+    @classmethod
+    def detect(cls):
+        """
+        Return the collector of the first scheduler whose accounting command is available, or None
+        """
+        for backend in (SlurmAccounting, PBSAccounting, LSFAccounting):
+            executable = shutil.which(backend.command)
+            if executable is not None:
+                return backend(executable)
         return None
-    bjobs_lines = bjobs_line.split('\n')
-    for line_number, line in enumerate(bjobs_lines):
-        split_line = line.split(';')
-        if line_number == 0:
-            format_keys = split_line
-            continue
-        for i, value in enumerate(split_line):
-            if i == 0:
-                key = value
+
+    def collect(self, jobids: list) -> dict:
+        """
+        Query the scheduler for the given job IDs, in batches
+        """
+        records = {}
+        jobids = list(jobids)
+        for ii in range(0, len(jobids), self.batch_size):
+            try:
+                records.update(self.query(jobids[ii:ii + self.batch_size]))
+            except (subprocess.CalledProcessError, OSError, ValueError):
+                pass
+        return records
+
+    def query(self, jobids: list) -> dict:
+        raise NotImplementedError
+
+    @staticmethod
+    def record(slots, qtime, cputime, runtime, final: bool) -> dict:
+        return {'slots': str(slots) if slots else '-', 'qtime': _seconds(qtime),
+                'cputime': _seconds(cputime), 'runtime': _seconds(runtime), 'final': final}
+
+
+class SlurmAccounting(AccountingCollector):
+    """
+    Accounting from the Slurm sacct command
+    """
+
+    command = 'sacct'
+    active_states = ('PENDING', 'RUNNING', 'REQUEUED', 'RESIZING', 'SUSPENDED', 'CONFIGURING', 'COMPLETING')
+
+    def query(self, jobids: list) -> dict:
+        output = syscall([self.executable, '-n', '-P', '-X', '-j', ','.join(jobids),
+                          '-o', 'JobIDRaw,State,Submit,Start,AllocCPUS,TotalCPU,ElapsedRaw'])
+        records = {}
+        for line in output.splitlines():
+            jobid, state, submit, start, slots, cputime, elapsed = line.split('|')
+            try:
+                submit_time = datetime.fromisoformat(submit)
+            except ValueError:
+                submit_time = None
+            try:
+                start_time = datetime.fromisoformat(start)
+            except ValueError:
+                start_time = None
+            if submit_time is None:
+                qtime = None
             else:
-                if format_keys[i] in ('RUN_TIME', 'CPU_USED'):
-                    value_list = value.split()
-                    if len(value_list) > 1:
-                        value = value_list[0]
-                bjobs[key][format_keys[i]] = value
-    sub_time_string = ''
-    year = str(datetime.now().year) + ' '
-    sub_time = None
-    bstart_time = None
-    for jobid, keys in bjobs.items():
-        # debug.write(jobid+'\n')
-        for key in keys:
-            # debug.write('   '+key+":"+bjobs[jobid][key]+'\n')
+                qtime = ((start_time or datetime.now()) - submit_time).total_seconds()
+            records[jobid] = self.record(slots, qtime, _clock_to_seconds(cputime),
+                                         int(elapsed) if elapsed.isdigit() else None,
+                                         state.split()[0] not in self.active_states)
+        return records
+
+
+class PBSAccounting(AccountingCollector):
+    """
+    Accounting from the PBS Pro qstat command, including finished jobs
+    """
+
+    command = 'qstat'
+    time_format = '%a %b %d %H:%M:%S %Y'
+
+    def query(self, jobids: list) -> dict:
+        # qstat exits with an error if any of the jobs is unknown, its output is still valid
+        result = subprocess.run([self.executable, '-x', '-f', '-F', 'json'] + jobids,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, encoding='utf-8')
+        jobs = json.loads(result.stdout or '{}').get('Jobs', {})
+        # Rocoto may record the job ID without the server name
+        requested = {jobid.split('.')[0]: jobid for jobid in jobids}
+        records = {}
+        for pbs_jobid, job in jobs.items():
+            jobid = requested.get(pbs_jobid.split('.')[0], pbs_jobid)
             try:
-                int_key = int(bjobs[jobid][key].strip())
-                str_key = str(int_key)
-            except Exception:
-                str_key = bjobs[jobid][key].strip()
+                queued = datetime.strptime(job['qtime'], self.time_format)
+            except (KeyError, ValueError):
+                queued = None
+            try:
+                started = datetime.strptime(job['stime'], self.time_format)
+            except (KeyError, ValueError):
+                started = None
+            qtime = None if queued is None else ((started or datetime.now()) - queued).total_seconds()
+            used = job.get('resources_used', {})
+            records[jobid] = self.record(job.get('Resource_List', {}).get('ncpus'), qtime,
+                                         _clock_to_seconds(used.get('cput', '')),
+                                         _clock_to_seconds(used.get('walltime', '')),
+                                         job.get('job_state') in ('F', 'X'))
+        return records
+
+
+class LSFAccounting(AccountingCollector):
+    """
+    Accounting from the LSF bjobs command
+    """
 
-            if key == 'SUBMIT_TIME':
-                sub_time_string = str_key
-                try:
-                    sub_time = datetime.strptime(year + sub_time_string, '%Y %b %d %H:%M')
-                except Exception:
-                    sub_time = None
+    command = 'bjobs'
+
+    @staticmethod
+    def _parse_time(value: str):
+        # bjobs omits the year, assume the most recent occurrence of the date
+        value = value.strip().rstrip(' LEX')
+        try:
+            now = datetime.now()
+            parsed = datetime.strptime(f'{now.year} {value}', '%Y %b %d %H:%M')
+        except ValueError:
+            return None
+        return parsed.replace(year=now.year - 1) if parsed > now else parsed
+
+    def query(self, jobids: list) -> dict:
+        output = syscall([self.executable, '-a', '-noheader', '-o', format_string] + jobids)
+        records = {}
+        for line in output.splitlines():
+            fields = line.split(';')
+            if len(fields) != 7:
                 continue
-            elif key == 'START_TIME':
-                bstart_time_string = str_key
-                try:
-                    bstart_time = datetime.strptime(year + bstart_time_string, '%Y %b %d %H:%M')
-                except Exception:
-                    bstart_time = None
-                continue
-            elif key == 'RUN_TIME':
-                aug_perf[jobid]['runtime'] = str_key
-            elif key == 'CPU_USED':
-                aug_perf[jobid]['cputime'] = str_key
-            elif key == 'SLOTS':
-                aug_perf[jobid]['slots'] = str_key
-
-        if bstart_time_string == sub_time_string:
-            aug_perf[jobid]['qtime'] = '0'
-        elif sub_time is not None and bstart_time is None:
+            jobid, slots, submit, start, cputime, runtime, state = [field.strip() for field in fields]
+            submit_time = self._parse_time(submit)
+            start_time = self._parse_time(start)
+            qtime = None if submit_time is None else ((start_time or datetime.now()) - submit_time).total_seconds()
             try:
-                aug_perf[jobid]['qtime'] = str(int((datetime.now() - sub_time).total_seconds()))
-            except AttributeError:
-                aug_perf[jobid]['qtime'] = str(int(timedelta_total_seconds(datetime.now() - sub_time)))
-
-        elif sub_time is not None and bstart_time is not None:
+                cputime = float(cputime.split()[0])
+            except (IndexError, ValueError):
+                cputime = None
             try:
-                aug_perf[jobid]['qtime'] = str(int((bstart_time - sub_time).total_seconds()))
-            except AttributeError:
-                aug_perf[jobid]['qtime'] = str(int(timedelta_total_seconds(bstart_time - sub_time)))
-        else:
-            aug_perf[jobid]['qtime'] = '-'
+                runtime = float(runtime.split()[0])
+            except (IndexError, ValueError):
+                runtime = None
+            records[jobid] = self.record(slots, qtime, cputime, runtime, state in ('DONE', 'EXIT'))
+        return records
+
+
+def get_aug_perf_values(database_file):
+    """
+    Return the performance metrics (slots, qtime, cputime, runtime) of the jobs of the experiment
+
+    Records of finished jobs are cached in an SQLite database next to the Rocoto database,
+    so the scheduler is only queried for the jobs that are not final yet. Jobs that Rocoto
+    considers finished but the scheduler does not know anymore (e.g. purged records) are
+    cached without metrics, so that they are not queried again.
+    """
+    collector = AccountingCollector.detect()
+    if collector is None:
+        return None
+
+    connection = sqlite3.connect(f'file:{database_file}?mode=ro', uri=True)
+    try:
+        jobs = connection.execute("SELECT jobid, state FROM jobs WHERE jobid IS NOT NULL").fetchall()
+    finally:
+        connection.close()
+    finished = {str(jobid) for jobid, state in jobs if state in ROCOTO_FINAL_STATES}
+
+    cache_file = f'{os.path.splitext(database_file)[0]}_accounting.db'
+    cache = sqlite3.connect(cache_file)
+    try:
+        with cache:
+            cache.execute("CREATE TABLE IF NOT EXISTS accounting "
+                          "(jobid TEXT PRIMARY KEY, slots TEXT, qtime TEXT, cputime TEXT, runtime TEXT)")
+            aug_perf = {row[0]: dict(zip(('slots', 'qtime', 'cputime', 'runtime'), row[1:]))
+                        for row in cache.execute("SELECT jobid, slots, qtime, cputime, runtime FROM accounting")}
+
+            pending = {str(jobid) for jobid, _ in jobs} - set(aug_perf)
+            records = collector.collect(sorted(pending))
+            unknown = AccountingCollector.record(None, None, None, None, True)
+            records.update({jobid: unknown for jobid in pending & finished if jobid not in records})
+            cache.executemany("INSERT OR REPLACE INTO accounting VALUES (?, ?, ?, ?, ?)",
+                              [(jobid, rr['slots'], rr['qtime'], rr['cputime'], rr['runtime'])
+                               for jobid, rr in records.items() if rr['final']])
+    finally:
+        cache.close()
+
+    for jobid, record in records.items():
+        aug_perf[jobid] = {key: record[key] for key in ('slots', 'qtime', 'cputime', 'runtime')}
 
     return aug_perf
 
@@ -1030,41 +1174,17 @@ def get_rocoto_stat(params, queue_stat):
         tasks_ordered, metatask_list, cycledef_group_cycles = get_tasklist(workflow_file)
 
     if use_performance_metrics:
-        aug_perf = get_aug_perf_values(get_user)
+        aug_perf = get_aug_perf_values(database_file) or {}
     else:
         aug_perf = None
 
     info = collections.defaultdict(list)
     cycles = set()
 
-    connection = sqlite3.connect(database_file)
+    # the Rocoto database is only read, so that the viewer does not change its modification time
+    connection = sqlite3.connect(f'file:{database_file}?mode=ro', uri=True)
     c = connection.cursor()
 
-    if use_performance_metrics:
-        c.execute("DROP TABLE IF EXISTS jobs_augment_tmp;")
-        sql_create_augment_table = "CREATE TABLE jobs_augment_tmp AS SELECT * FROM jobs;"
-        c.execute(sql_create_augment_table)
-        c.execute("alter table jobs_augment_tmp add column qtime integer;")
-        c.execute("alter table jobs_augment_tmp add column cputime integer;")
-        c.execute("alter table jobs_augment_tmp add column runtime integer;")
-        c.execute("alter table jobs_augment_tmp add column slots integer;")
-
-        sq_command = ''
-        column_updates = ('qtime', 'cputime', 'runtime', 'slots')
-        for column in column_updates:
-            sq_command += f"{column}=(SELECT jobs_augment.{column} FROM jobs_augment WHERE jobs_augment.id=jobs_augment_tmp.id)" + ','
-        sq_command = ';'.join(sq_command.rsplit(',', 1))
-        sq_command = 'UPDATE jobs_augment_tmp SET ' + sq_command
-        c.execute(sq_command)
-
-        sq_command = 'UPDATE jobs_augment_tmp SET'
-        for perf_jobid, perf_values in aug_perf.items():
-            for name, each_value in perf_values.items():
-                c.execute(f"{sq_command} {name} = '{each_value}' WHERE jobs_augment_tmp.jobid = {perf_jobid}")
-
-        c.execute("DROP TABLE IF EXISTS jobs_augment;")
-        c.execute("ALTER TABLE jobs_augment_tmp RENAME TO jobs_augment;")
-
     cycledifitions = []
     q = c.execute('SELECT id, groupname, cycledef FROM cycledef')
     for row in q:
@@ -1078,10 +1198,11 @@ def get_rocoto_stat(params, queue_stat):
         cycles.add(cycle)
         cycle_done_stat[cycle] = done
 
+    q = c.execute('SELECT id,jobid,taskname,cycle,state,exit_status,duration,tries FROM jobs')
     if use_performance_metrics:
-        q = c.execute('SELECT id,jobid,taskname,cycle,state,exit_status,duration,tries,qtime,cputime,runtime,slots FROM jobs_augment')
-    else:
-        q = c.execute('SELECT id,jobid,taskname,cycle,state,exit_status,duration,tries FROM jobs')
+        # the performance metrics come from the accounting cache, by job ID
+        q = [row + tuple(aug_perf.get(str(row[1]), {}).get(key) or '-' for key in ('qtime', 'cputime', 'runtime', 'slots'))
+             for row in q]
 
     q_get = []
     entered_jobids = []
@@ -1109,8 +1230,8 @@ def get_rocoto_stat(params, queue_stat):
 
     q_get.sort(key=lambda x: x[2])
 
-    connection.commit()
     c.close()
+    connection.close()
 
     for row in q_get:
         if use_performance_metrics:
@@ -1296,7 +1417,6 @@ def main(screen):
 
     global use_performance_metrics
     if use_performance_metrics:
-        augment_SQLite3(database_file)
         header_string += '  SLOTS   QTIME    CPU    RUN\n'
         header_string_under += '=============================\n'
         header_string += header_string_under
@@ -1412,12 +1532,13 @@ def main(screen):
     if not html_output:
         screen.refresh()
     rocoto_stat_params = ''
-    step = 0.0
     i = 0
     dots = ('.    ', '..   ', '...  ', '.... ', '.....', ' ....', '  ...', '    .')
     dot_stat = 0
     dot_check = 0
     current_time = time()
+    loaded_db_mtime = None
+    force_refresh = False
 
     if save_checkfile_path is not None and os.path.isfile(save_checkfile_path):
         with open(save_checkfile_path) as savefile:
@@ -1445,6 +1566,7 @@ def main(screen):
         sys.exit(0)
 
     if save_checkfile_path is None or (save_checkfile_path is not None and not os.path.isfile(save_checkfile_path)):
+        loaded_db_mtime = database_mtime(database_file)
         params = (workflow_file, database_file, tasks_ordered, metatask_list, cycledef_group_cycles)
         if use_multiprocessing:
             process_get_rocoto_stat = Process(target=get_rocoto_stat, args=[params, queue_stat])
@@ -1475,20 +1597,17 @@ def main(screen):
                 print()
                 print(f'Your terminal is only {mcols} characters must be at least {default_column_length} to display workflow status')
                 sys.exit(-1)
-            step += 0.001
-            if step > 100:
-                step = 0.0
+            # block on the queue rather than polling it, animating the dots on each timeout
+            try:
+                rocoto_stat_params = queue_stat.get(timeout=stat_queue_timeout)
+            except queue.Empty:
+                if not process_get_rocoto_stat.is_alive():
+                    sys.exit(1)
                 i = (0 if i == len(dots) - 1 else i + 1)
                 curses.curs_set(0)
                 screen.addstr(mlines - 1, 19, dots[i], curses.A_BOLD)
                 screen.refresh()
-            try:
-                rocoto_stat_params = queue_stat.get_nowait()
-            except queue.Empty:
-                if process_get_rocoto_stat.is_alive():
-                    pass
-                else:
-                    sys.exit(1)
+                continue
 
             if len(rocoto_stat_params) != 0:
                 (rocoto_stat, tasks_ordered, metatask_list, cycledef_group_cycles) = rocoto_stat_params
@@ -2449,14 +2568,21 @@ def main(screen):
                     update_pad = True
             elif event == ord('l'):
                 start_time -= stat_read_time_delay
+                force_refresh = True
             elif event == ord('h'):
                 update_pad = True
                 help_screen(screen)
                 screen.clear()
             current_time = time()
             diff = current_time - start_time
-            if diff > stat_read_time_delay and not loading_stat:
+            if diff > stat_poll_delay and not loading_stat:
                 start_time = current_time
+                # only re-read the database when rocotorun has changed it
+                current_db_mtime = database_mtime(database_file)
+                if current_db_mtime == loaded_db_mtime and not force_refresh:
+                    continue
+                loaded_db_mtime = current_db_mtime
+                force_refresh = False
                 if not use_multiprocessing:
                     params = (workflow_file, database_file, tasks_ordered, metatask_list, cycledef_group_cycles)
                     (rocoto_stat, tasks_ordered, metatask_list, cycledef_group_cycles) = get_rocoto_stat(params, Queue())